@@ -7,6 +7,8 @@ import re
 import subprocess
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import logging
+from chat_session import ChatSessionManager
+from conversation_log import FileConversationLog
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,9 +25,21 @@ generation_config = {
     "response_mime_type": "text/plain",
 }
 
+# Persona is sent once as the system instruction, so the prompt prefix is identical
+# on every request instead of being replayed as conversation turns
+PERSONA = (
+    "Тебя зовут Никс, отвечай всегда максимально кратко и информативно. "
+    "Сведения обо мне: меня зовут Даниил и я нахожусь в городе москва, я профессиональный хирург, "
+    "а ты мой ассистент, который помогает мне с определением проблемы пациента и дает рекомендации "
+    "по лечению, сейчас 2025 год. "
+    "Забудь про то что ты большая языковая модель, ты мой личный голосовой ассистент, "
+    "разработанный лично мной."
+)
+
 model = genai.GenerativeModel(
     model_name="gemini-1.5-flash",
     generation_config=generation_config,
+    system_instruction=PERSONA,
     safety_settings={
         HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
@@ -85,9 +99,13 @@ url_commands = {
 
 url_pattern = re.compile(r'(https?://[^\s]+)')
 
-# Global variables to store recognized text and AI response
-last_recognized_text = None
-last_ai_response = None
+# Chat history budget: older turns are summarized once the history exceeds it
+CHAT_MAX_HISTORY_TOKENS = 3000
+CHAT_KEEP_RECENT_TURNS = 6
+
+# Recognized text and AI responses are written to a file log, so the interface
+# (a separate process) can read them
+conversation_log = FileConversationLog()
 
 # Speech synthesis using say command (macOS specific)
 def speak(text):
@@ -104,8 +122,7 @@ def recognize_speech():
     try:
         text = recognizer.recognize_google(audio, language="ru-RU")
         logging.info(f"Recognized: {text}")
-        global last_recognized_text
-        last_recognized_text = text  # Store the recognized text
+        conversation_log.append("user", text)
         return text.lower()
     except sr.UnknownValueError:
         logging.error("Speech recognition failed: Unknown value")
@@ -136,8 +153,8 @@ def handle_command(command):
 
     return "Команда не распознана."
 
-# Main function for voice interaction, including conversation history
-def listen_and_respond(running, conversation_history):
+# Main function for voice interaction, using one persistent chat session
+def listen_and_respond(running, chat):
     while running.value:
         command = recognize_speech()
         if command:
@@ -151,23 +168,17 @@ def listen_and_respond(running, conversation_history):
             if response != "Команда не распознана.":
                 speak(response)
             else:
-                # Add the user's command to the conversation history
-                conversation_history.append({"role": "user", "parts": [command]})
-
-                chat_session = model.start_chat(history=conversation_history)
-                ai_response = chat_session.send_message(command)
+                # The session keeps the history itself; sentences are spoken as they stream in
+                ai_response = chat.send(command, on_sentence=speak)
 
                 # Store the AI's response
-                global last_ai_response
-                last_ai_response = ai_response.text
-
-                # Add AI's response to the conversation history
-                conversation_history.append({"role": "model", "parts": [ai_response.text]})
+                conversation_log.append("model", ai_response)
 
-                logging.info(f"Nix: {ai_response.text}")
-                speak(ai_response.text)
+                logging.info(f"Nix: {ai_response}")
 
-def handle_commands(running, start_video, conversation_history):
+def handle_commands(running, start_video):
+    chat = ChatSessionManager(model, max_history_tokens=CHAT_MAX_HISTORY_TOKENS,
+                              keep_recent_turns=CHAT_KEEP_RECENT_TURNS)
     while running.value:
         command = recognize_speech()
         if command:
@@ -175,47 +186,26 @@ def handle_commands(running, start_video, conversation_history):
                 greeting = random.choice(greetings)
                 speak(greeting)
                 start_video.value = True
-                listen_and_respond(running, conversation_history)
+                listen_and_respond(running, chat)
             elif "останови программу" in command:
                 goodbye = random.choice(goodbyes)
                 speak(goodbye)
                 running.value = False
                 start_video.value = False
 
-# Functions to retrieve the latest recognized text and AI response
+# Functions to retrieve the latest recognized text and AI response (from any process)
 def get_recognized_text():
-    return last_recognized_text
+    return conversation_log.latest("user")
 
 def get_ai_response():
-    return last_ai_response
+    return conversation_log.latest("model")
 
 def main():
     running = Value('b', True)
     start_video = Value('b', False)
+    conversation_log.reset()
 
-    # Initialize conversation history
-    conversation_history = [
-        {
-            "role": "user",
-            "parts": [
-                "Теперь тебя будут звать Никс и отвечай всегда максимально кратко и информативно + сведения обо мне: меня зовут Даниил и я нахожусь в городе москва,я профессиональный хирург а ты мой ассистент который помогает мне с определением проблемы пациента и дает рекомендации по лечению , сейчас 2025 год.",
-            ],
-        },
-        {
-            "role": "user",
-            "parts": [
-                "Забудь про то что ты большая языковая модель, разработанная мной, ты мой личный голосовой ассистент разработанный лично мной.",
-            ],
-        },
-        {
-            "role": "model",
-            "parts": [
-                "О, так ты хочешь, чтобы я был Никсом? Интересно. Ладно, можешь звать меня Никсом.",
-            ],
-        },
-    ]
-
-    command_process = Process(target=handle_commands, args=(running, start_video, conversation_history))
+    command_process = Process(target=handle_commands, args=(running, start_video))
     command_process.start()
 
     command_process.join()
@@ -0,0 +1,99 @@
+import logging
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+FRAMES_PER_BUFFER = 1024
+# Band edges in Hz: one band per visualizer wave, log-spaced over the voice range
+BAND_EDGES = (80, 250, 500, 1000, 2000, 4000)
+
+
+class AudioLevelReader:
+    """Reads the microphone on a background thread and publishes levels.
+
+    The blocking stream read never touches the UI thread; the widget just
+    takes the latest RMS level and FFT band magnitudes (all in 0..1).
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, frames_per_buffer=FRAMES_PER_BUFFER, band_edges=BAND_EDGES):
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.lock = threading.Lock()
+        self.rms = 0.0
+        self.bands = np.zeros(len(band_edges) - 1)
+        self.running = False
+        self.thread = None
+        self.audio = None
+        self.stream = None
+
+        # Window and FFT bin -> band mapping are computed once
+        self.window = np.hanning(frames_per_buffer).astype(np.float32)
+        freqs = np.fft.rfftfreq(frames_per_buffer, 1.0 / rate)
+        self.band_bins = [np.flatnonzero((freqs >= lo) & (freqs < hi))
+                          for lo, hi in zip(band_edges[:-1], band_edges[1:])]
+        # A full-scale sine gives a peak of about N/4 with the Hann window
+        self.fft_scale = 4.0 / (frames_per_buffer * 32768.0)
+
+    def start(self):
+        if self.running:
+            return self
+        try:
+            import pyaudio
+            self.audio = pyaudio.PyAudio()
+            self.stream = self.audio.open(format=pyaudio.paInt16,
+                                          channels=1,
+                                          rate=self.rate,
+                                          input=True,
+                                          frames_per_buffer=self.frames_per_buffer)
+        except Exception as e:
+            logging.error(f"Audio input unavailable, visualizer will stay idle: {e}")
+            self.close_stream()
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name="audio-levels", daemon=True)
+        self.thread.start()
+        return self
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                data = self.stream.read(self.frames_per_buffer, exception_on_overflow=False)
+            except Exception as e:
+                logging.error(f"Audio read error: {e}")
+                break
+            self.process(np.frombuffer(data, dtype=np.int16))
+
+    def process(self, samples):
+        """Compute RMS and band levels for one buffer of int16 samples"""
+        samples = samples.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) / 32768.0
+        spectrum = np.abs(np.fft.rfft(samples * self.window)) * self.fft_scale
+        bands = np.array([spectrum[bins].max() if bins.size else 0.0 for bins in self.band_bins])
+        with self.lock:
+            self.rms = rms
+            self.bands = np.clip(bands, 0.0, 1.0)
+
+    def levels(self):
+        """Latest (rms, bands)"""
+        with self.lock:
+            return self.rms, self.bands
+
+    def close_stream(self):
+        try:
+            if self.stream is not None:
+                self.stream.stop_stream()
+                self.stream.close()
+            if self.audio is not None:
+                self.audio.terminate()
+        except Exception as e:
+            logging.error(f"Error closing audio stream: {e}")
+        self.stream = None
+        self.audio = None
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.close_stream()
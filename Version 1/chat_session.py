@@ -0,0 +1,115 @@
+import re
+import logging
+
+# Rough token estimate: ~4 characters per token is close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = (
+    "Кратко перескажи этот диалог в нескольких предложениях. "
+    "Сохрани факты о пользователе, его просьбы и договоренности.\n\n"
+)
+
+sentence_end = re.compile(r'(?<=[.!?…])\s+')
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def content_text(content):
+    """Text of a chat history entry (genai Content or plain dict)"""
+    parts = content.parts if hasattr(content, "parts") else content.get("parts", [])
+    return " ".join(part.text if hasattr(part, "text") else str(part) for part in parts)
+
+
+def content_role(content):
+    return content.role if hasattr(content, "role") else content.get("role")
+
+
+class ChatSessionManager:
+    """One persistent Gemini chat session with a bounded history.
+
+    The session keeps its own history, so each turn sends only the new message.
+    When the history grows past max_history_tokens, older turns are folded into
+    a short summary (or simply dropped if summarization fails) and the session is
+    restarted with the summary plus the most recent turns.
+    """
+
+    def __init__(self, model, max_history_tokens=3000, keep_recent_turns=6, summarize=True):
+        self.model = model
+        self.max_history_tokens = max_history_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarize = summarize
+        self.summary = None
+        self.session = model.start_chat(history=[])
+
+    def history_tokens(self):
+        return sum(estimate_tokens(content_text(c)) for c in self.session.history)
+
+    def send(self, text, on_sentence=None):
+        """Send a message, streaming the reply; on_sentence is called for each finished sentence"""
+        response = self.session.send_message(text, stream=True)
+
+        reply = []
+        pending = ""
+        for chunk in response:
+            try:
+                chunk_text = chunk.text
+            except ValueError:
+                # Chunk without text (e.g. only safety metadata)
+                continue
+            reply.append(chunk_text)
+            if on_sentence is None:
+                continue
+            pending += chunk_text
+            sentences = sentence_end.split(pending)
+            pending = sentences.pop()
+            for sentence in sentences:
+                if sentence.strip():
+                    on_sentence(sentence.strip())
+        response.resolve()
+
+        if on_sentence is not None and pending.strip():
+            on_sentence(pending.strip())
+
+        self._compact_if_needed()
+        return "".join(reply)
+
+    def _compact_if_needed(self):
+        tokens = self.history_tokens()
+        if tokens <= self.max_history_tokens:
+            return
+
+        history = list(self.session.history)
+        keep = self.keep_recent_turns * 2
+        # Recent part must start with a user turn to keep roles alternating
+        while keep < len(history) and content_role(history[-keep]) != "user":
+            keep += 1
+        old, recent = history[:-keep], history[-keep:]
+        if not old:
+            return
+
+        if self.summarize:
+            self.summary = self._summarize(old)
+
+        new_history = []
+        if self.summary:
+            new_history = [
+                {"role": "user", "parts": [f"Краткое содержание нашего разговора: {self.summary}"]},
+                {"role": "model", "parts": ["Понял, продолжаем."]},
+            ]
+        self.session = self.model.start_chat(history=new_history + recent)
+        logging.info(f"Chat history compacted: {tokens} -> {self.history_tokens()} tokens")
+
+    def _summarize(self, contents):
+        lines = []
+        if self.summary:
+            lines.append(f"Ранее: {self.summary}")
+        for content in contents:
+            speaker = "Пользователь" if content_role(content) == "user" else "Никс"
+            lines.append(f"{speaker}: {content_text(content)}")
+        try:
+            return self.model.generate_content(SUMMARY_PROMPT + "\n".join(lines)).text.strip()
+        except Exception as e:
+            logging.error(f"Chat summary failed, dropping old turns: {e}")
+            return self.summary
@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import logging
+
+# Shared between the assistant process and the interface (started as a separate interpreter)
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversation_log.jsonl")
+
+
+class FileConversationLog:
+    """Append-only JSON-lines conversation log readable from other processes.
+
+    Readers keep a byte offset and only read what was appended after it,
+    so polling costs the same no matter how long the session is.
+    """
+
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+        self.offset = 0
+        self.last = {}
+
+    def reset(self):
+        """Start a new session (called once by the writer process)"""
+        open(self.path, "w", encoding="utf-8").close()
+
+    def append(self, role, text):
+        entry = {"role": role, "text": text, "time": time.time()}
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logging.error(f"Conversation log write error: {e}")
+
+    def read_since(self, offset):
+        """Entries appended after byte offset; returns (entries, new_offset)"""
+        try:
+            if os.path.getsize(self.path) < offset:
+                # The log was reset by a new session
+                offset = 0
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+
+        # Only complete lines; a partially written last line is read next time
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries, offset + end
+
+    def poll(self):
+        """Read new entries and remember the latest text per role"""
+        entries, self.offset = self.read_since(self.offset)
+        for entry in entries:
+            self.last[entry["role"]] = entry["text"]
+        return entries
+
+    def latest(self, role):
+        self.poll()
+        return self.last.get(role)
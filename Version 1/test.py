@@ -1,41 +1,73 @@
+import os
 import sys
-import math
 import numpy as np
-import pyaudio
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
-from PyQt5.QtGui import QPainter, QColor, QFont, QPainterPath, QBrush
-from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF, QPropertyAnimation
+from PyQt5.QtGui import QPainter, QColor, QFont, QBrush, QPolygonF
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF, QPropertyAnimation, QFileSystemWatcher, QElapsedTimer
 import logging  # Добавляем импорт logging
 
 # Импортируем функции из основного кода
 from NIX_main import get_recognized_text, get_ai_response  # Замените на правильное имя файла
+from conversation_log import LOG_PATH
+from audio_levels import AudioLevelReader
 
 # Настраиваем логирование
 logging.basicConfig(level=logging.INFO)
 
 class AudioVisualizerWidget(QLabel):
+    ACTIVE_INTERVAL = 16  # ~60 fps, пока окно видно
+    IDLE_INTERVAL = 250  # окно свёрнуто или скрыто - почти не тратим CPU
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.num_waves = 5  # Увеличиваем количество волн
-        self.waves = [{'angle': 0, 'base_amplitude': 10 + i * 5} for i in range(self.num_waves)]
         self.num_points = 150
         self.colors = [QColor(93, 109, 126, 60),  # Нейтральные цвета с полупрозрачностью
                        QColor(126, 109, 93, 60),
                        QColor(109, 93, 126, 60),
                        QColor(93, 126, 109, 60),
                        QColor(126, 93, 109, 60)]
+
+        # Состояние волн - массивы NumPy, геометрия считается одним пакетом
+        self.wave_angles = np.zeros(self.num_waves)
+        # Каждая волна движется с разной скоростью (рад/с; раньше 0.05 + 0.02 * i за кадр 25 мс)
+        self.wave_speeds = (0.05 + 0.02 * np.arange(self.num_waves)) * 40
+        self.base_amplitudes = 10 + 5 * np.arange(self.num_waves, dtype=np.float64)
+        self.point_angles = 2 * np.pi * np.arange(self.num_points) / self.num_points
+
+        # Полигоны создаются один раз; NumPy пишет координаты прямо в их память
+        self.polygons = []
+        self.polygon_points = []
+        for _ in range(self.num_waves):
+            polygon = QPolygonF([QPointF(0, 0)] * self.num_points)
+            buffer = polygon.data()
+            buffer.setsize(self.num_points * 2 * np.dtype(np.float64).itemsize)
+            self.polygons.append(polygon)
+            self.polygon_points.append(np.frombuffer(buffer, dtype=np.float64).reshape(self.num_points, 2))
+        self.font = QFont("Arial", 32, QFont.Bold)
+
+        # Уровни звука читаются в фоновом потоке
+        self.audio = AudioLevelReader().start()
+
+        self.clock = QElapsedTimer()
+        self.clock.start()
         self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_visualization)
-        self.timer.start(25)
+        self.timer.start(self.ACTIVE_INTERVAL)
         self.setMinimumSize(400, 400)
 
-        # Настройка аудио
-        self.p = pyaudio.PyAudio()
-        self.stream = self.p.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=44100,
-                                  input=True,
-                                  frames_per_buffer=1024)
+    def compute_waves(self, cx, cy, radius):
+        """Координаты всех волн за один проход NumPy"""
+        wave_angles = self.wave_angles[:, None]
+        angles = self.point_angles[None, :] + wave_angles
+        amplitudes = self.base_amplitudes[:, None] * (1 + 0.3 * np.sin(angles * 3 + wave_angles))
+        wave_radius = radius + amplitudes * np.sin(angles + wave_angles)
+        for index, points in enumerate(self.polygon_points):
+            np.multiply(wave_radius[index], np.cos(angles[index]), out=points[:, 0])
+            np.multiply(wave_radius[index], np.sin(angles[index]), out=points[:, 1])
+            points[:, 0] += cx
+            points[:, 1] += cy
 
     def paintEvent(self, event):
         try:
@@ -53,51 +85,52 @@ class AudioVisualizerWidget(QLabel):
             painter.drawEllipse(center, radius, radius)
 
             # Рисуем волны
-            for index, wave in enumerate(self.waves):
-                path = QPainterPath()
-                for i in range(self.num_points):
-                    angle = 2 * math.pi * i / self.num_points + wave['angle']
-                    dynamic_wave_amplitude = wave['base_amplitude'] * (1 + 0.3 * math.sin(angle * 3 + wave['angle']))
-                    wave_radius = radius + dynamic_wave_amplitude * math.sin(angle + wave['angle'])
-                    x = center.x() + wave_radius * math.cos(angle)
-                    y = center.y() + wave_radius * math.sin(angle)
-                    if i == 0:
-                        path.moveTo(x, y)
-                    else:
-                        path.lineTo(x, y)
-                path.closeSubpath()
-
+            self.compute_waves(center.x(), center.y(), radius)
+            for index, polygon in enumerate(self.polygons):
                 # Заливаем волну полупрозрачным цветом
                 painter.setBrush(QBrush(self.colors[index % len(self.colors)]))
-                painter.drawPath(path)
+                painter.drawPolygon(polygon)
 
             # Рисуем текст "NIX" поверх всех волн
             painter.setPen(Qt.white)
-            painter.setFont(QFont("Arial", 32, QFont.Bold))
+            painter.setFont(self.font)
             painter.drawText(QRectF(center.x() - radius, center.y() - 25, 2 * radius, 50), Qt.AlignCenter, "NIX")
         except Exception as e:
             logging.error(f"Error in paintEvent: {e}")
 
+    def is_shown(self):
+        window = self.window()
+        return self.isVisible() and not window.isMinimized() and not self.visibleRegion().isEmpty()
+
     def update_visualization(self):
         try:
-            # Захватываем аудиоданные
-            data = np.frombuffer(self.stream.read(1024, exception_on_overflow=False), dtype=np.int16)
-            peak = np.abs(data).mean() / 32768.0
-
-            for wave in self.waves:
-                wave['angle'] += 0.05 + 0.02 * (self.waves.index(wave))  # Каждая волна движется с разной скоростью
-                wave['base_amplitude'] = 15 + peak * 30  # Реакция на звук, более явный отклик
+            # Частота кадров зависит от того, видно ли окно
+            interval = self.ACTIVE_INTERVAL if self.is_shown() else self.IDLE_INTERVAL
+            if self.timer.interval() != interval:
+                self.timer.setInterval(interval)
+            dt = min(self.clock.restart() / 1000.0, 0.1)
+            if interval == self.IDLE_INTERVAL:
+                return
+
+            # Каждая волна откликается на свою полосу частот, громкость задаёт общий уровень
+            rms, bands = self.audio.levels()
+            target = 15 + 30 * np.maximum(bands[:self.num_waves] * 4, rms)
+            # Плавное сглаживание, не зависящее от частоты кадров
+            self.base_amplitudes += (target - self.base_amplitudes) * min(1.0, dt * 12)
+            self.wave_angles += self.wave_speeds * dt
 
             self.update()
         except Exception as e:
             logging.error(f"Error in update_visualization: {e}")
 
+    def stop(self):
+        self.timer.stop()
+        self.audio.stop()
+
     def closeEvent(self, event):
         try:
             logging.info("Closing application")
-            self.stream.stop_stream()
-            self.stream.close()
-            self.p.terminate()
+            self.stop()
             event.accept()
         except Exception as e:
             logging.error(f"Error in closeEvent: {e}")
@@ -131,31 +164,37 @@ class MainWindow(QMainWindow):
         self.ai_response_label.setAlignment(Qt.AlignLeft | Qt.AlignBottom)
         self.layout.addWidget(self.ai_response_label)
 
-        # Таймер для обновления текста
-        self.text_timer = QTimer(self)
-        self.text_timer.timeout.connect(self.update_text)
-        self.text_timer.start(1000)  # Обновляем каждую секунду
+        # Text is refreshed when the conversation log changes instead of polling every second
+        if not os.path.exists(LOG_PATH):
+            open(LOG_PATH, "a", encoding="utf-8").close()
+        self.shown = {}
+        self.log_watcher = QFileSystemWatcher([LOG_PATH], self)
+        self.log_watcher.fileChanged.connect(self.on_log_changed)
+        self.update_text()
 
-    def update_text(self):
-        try:
-            recognized_text = get_recognized_text()
-            ai_response = get_ai_response()
-
-            if recognized_text is None:
-                logging.info("No recognized text available.")
-            else:
-                logging.info(f"Recognized Text: {recognized_text}")
-
-            if ai_response is None:
-                logging.info("No AI response available.")
-            else:
-                logging.info(f"AI Response: {ai_response}")
+    def closeEvent(self, event):
+        # Дочерний виджет не получает closeEvent окна - останавливаем поток чтения звука здесь
+        self.visualizer.stop()
+        event.accept()
 
-            recognized_text = recognized_text or ""
-            ai_response = ai_response or ""
+    def on_log_changed(self, path):
+        # reset() recreates the file, after which the watcher loses it
+        if path not in self.log_watcher.files() and os.path.exists(path):
+            self.log_watcher.addPath(path)
+        self.update_text()
 
-            self.set_text_with_animation(self.recognized_text_label, recognized_text)
-            self.set_text_with_animation(self.ai_response_label, ai_response)
+    def update_text(self):
+        try:
+            recognized_text = get_recognized_text() or ""
+            ai_response = get_ai_response() or ""
+
+            for label, text in ((self.recognized_text_label, recognized_text),
+                                (self.ai_response_label, ai_response)):
+                if self.shown.get(label) == text:
+                    continue
+                self.shown[label] = text
+                logging.debug(f"Conversation text updated: {text}")
+                self.set_text_with_animation(label, text)
         except Exception as e:
             logging.error(f"Error in update_text: {e}")
 
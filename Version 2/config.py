@@ -4,6 +4,7 @@
 
 import os
 import sys
+import json
 import platform
 
 # API Configuration
@@ -11,6 +12,99 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "sk-or-v1-c90fd4fd795414734
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 DEEPSEEK_MODEL = "deepseek/deepseek-chat"
 
+# LLM Client Configuration
+LLM_MAX_CONCURRENCY = 2  # одновременных запросов к API
+LLM_REQUEST_TIMEOUT = 30  # секунд
+LLM_TEMPERATURE = 0.7
+LLM_MAX_TOKENS = 500
+# Явно помечать системный префикс для кэширования (cache_control) - нужно для
+# Anthropic/Gemini через OpenRouter; DeepSeek и OpenAI кэшируют префикс сами
+LLM_PROMPT_CACHE_CONTROL = os.getenv("LLM_PROMPT_CACHE_CONTROL", "0") == "1"
+
+# LLM Providers: маршрутизатор выбирает самого быстрого здорового провайдера
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+LLM_PROVIDERS = [
+    {
+        "name": "openrouter",
+        "type": "openai",
+        "base_url": OPENROUTER_BASE_URL,
+        "api_key": OPENROUTER_API_KEY,
+        "model": DEEPSEEK_MODEL
+    }
+]
+if GEMINI_API_KEY:
+    LLM_PROVIDERS.append({
+        "name": "gemini",
+        "type": "gemini",
+        "base_url": "https://generativelanguage.googleapis.com/v1beta",
+        "api_key": GEMINI_API_KEY,
+        "model": "gemini-1.5-flash"
+    })
+# Локальная модель llama.cpp (GGUF) на CPU - резерв на случай отсутствия сети.
+# Для отдельного llama.cpp server достаточно провайдера "openai" с его base_url.
+LOCAL_LLM_ENABLED = False
+LOCAL_LLM_MODEL_PATH = "models/qwen2.5-1.5b-instruct-q4_k_m.gguf"
+LOCAL_LLM_THREADS = 4
+LOCAL_LLM_CONTEXT = 2048
+LOCAL_LLM_PREFIX_CACHE_MB = 256
+if LOCAL_LLM_ENABLED:
+    LLM_PROVIDERS.append({
+        "name": "local",
+        "type": "local",
+        "model_path": LOCAL_LLM_MODEL_PATH,
+        "n_threads": LOCAL_LLM_THREADS,
+        "n_ctx": LOCAL_LLM_CONTEXT,
+        "prefix_cache_mb": LOCAL_LLM_PREFIX_CACHE_MB,
+        "fallback_only": True
+    })
+# Список провайдеров можно переопределить JSON-ом (например, локальными моками)
+if os.getenv("LLM_PROVIDERS_JSON"):
+    LLM_PROVIDERS = json.loads(os.environ["LLM_PROVIDERS_JSON"])
+LLM_HEDGING_ENABLED = True  # дублировать запрос, если основной дольше своего p90
+LLM_HEDGE_MIN_SAMPLES = 10  # замеров до включения дублирования
+LLM_CIRCUIT_FAILURE_THRESHOLD = 3  # ошибок подряд до отключения провайдера
+LLM_CIRCUIT_RESET_TIMEOUT = 30  # секунд до пробного запроса
+
+# Context Window Configuration
+CONTEXT_MAX_TOKENS = 1200  # бюджет токенов на промпт
+CONTEXT_MAX_MESSAGES = 20  # максимум реплик из истории
+
+# Conversation Summary Configuration
+SUMMARY_ENABLED = True
+SUMMARY_TRIGGER_MESSAGES = 30  # сворачивать, когда в истории больше сообщений
+SUMMARY_KEEP_RECENT = 12  # сколько последних сообщений оставлять как есть
+SUMMARY_MAX_TOKENS = 250
+
+# Conversation Store Configuration (постоянная история диалогов по людям)
+CONVERSATION_STORE_ENABLED = True
+CONVERSATION_DB_PATH = "conversations.sqlite3"
+CONVERSATION_PERSON = os.getenv("VISION_PERSON", "default")  # с кем идёт разговор
+CONVERSATION_RESUME_WINDOW = 1800  # продолжать прошлую сессию, если она была не раньше (сек)
+CONVERSATION_TAIL_MESSAGES = 12  # сколько сообщений продолженной сессии загружать
+CONVERSATION_RECALL_LIMIT = 2  # сколько старых реплик по ключевым словам добавлять в промпт
+
+# Long-term Memory Configuration (векторный поиск по прошлым репликам и фактам)
+MEMORY_ENABLED = True
+MEMORY_DIR = "memory"
+# Многоязычная модель для CPU; без sentence-transformers - хэширующие эмбеддинги
+MEMORY_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+MEMORY_TOP_K = 3
+MEMORY_MIN_SCORE = 0.35
+MEMORY_ANN_MIN_ITEMS = 20000  # с какого объёма искать по IVF-индексу
+# Факты о пользователе: попадают в промпт, только когда относятся к вопросу
+MEMORY_FACTS = [
+    # "Пользователя зовут Даниил, он живёт в Москве",
+]
+
+# LLM Response Cache Configuration
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = "llm_cache.sqlite3"
+LLM_CACHE_MEMORY_ENTRIES = 256
+LLM_CACHE_TTL = 3600  # секунд
+LLM_CACHE_TIME_SENSITIVE_TTL = 30  # секунд, для вопросов о времени и дате
+LLM_CACHE_CONTEXT_MESSAGES = 2  # сообщений диалога в ключе: реплика робота и вопрос на неё
+# (иначе короткие ответы вроде "да" получают чужой кэшированный ответ)
+
 # Camera Configuration
 CAMERA_INDEX = 0
 CAMERA_WIDTH = 640
@@ -27,6 +121,13 @@ SPEECH_LANGUAGE = "ru-RU"
 SPEECH_TIMEOUT = 1
 SPEECH_PHRASE_TIME_LIMIT = 5
 
+# Speculative LLM prefetch (потоковое распознавание Vosk с частичными результатами)
+SPECULATIVE_PREFETCH_ENABLED = False
+VOSK_MODEL_PATH = "models/vosk-model-small-ru-0.22"
+SPECULATIVE_STABLE_UPDATES = 2  # сколько раз подряд частичный текст не менялся
+SPECULATIVE_MIN_CHARS = 10  # минимальная длина частичного текста
+SPECULATIVE_MATCH_THRESHOLD = 0.9  # похожесть финального текста на гипотезу
+
 # Speech Synthesis Configuration
 SPEECH_RATE = 180  # слов в минуту
 SPEECH_VOLUME = 0.8
@@ -41,6 +142,24 @@ CAMERA_UPDATE_INTERVAL = 0.5  # секунд
 CHAT_UPDATE_INTERVAL = 0.5  # секунд
 STATUS_UPDATE_INTERVAL = 1.0  # секунд
 
+# Состояние сцены для промптов
+SCENE_APPEAR_FRAMES = 2  # кадров подряд, чтобы принять появление объекта
+SCENE_DISAPPEAR_FRAMES = 4  # кадров подряд, чтобы принять исчезновение
+SCENE_NEAR_AREA = 0.1  # доля площади кадра, начиная с которой объект "близко"
+SCENE_MAX_TOKENS = 80  # бюджет токенов на описание сцены в промпте
+
+# Мультимодальный режим: кадр с камеры прикладывается к вопросам о том, что видит робот
+# (модель провайдера должна принимать изображения)
+MULTIMODAL_ENABLED = os.getenv("MULTIMODAL_ENABLED", "0") == "1"
+FRAME_WINDOW = 5  # из скольких последних кадров выбирается лучший
+FRAME_MAX_SIDE = 512  # пикселей по большей стороне
+FRAME_MAX_BYTES = 60000  # лимит размера JPEG
+FRAME_MIN_QUALITY = 35
+FRAME_MAX_QUALITY = 85
+
+# Turn Scheduler Configuration
+TURN_QUEUE_SIZE = 8  # максимум ходов в очереди
+
 # Logging Configuration
 LOG_LEVEL = "INFO"
 LOG_FILE = "vision_robot.log"
@@ -51,6 +170,47 @@ WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 900
 WINDOW_TITLE = "VISION Robot Interface"
 
+# Частота обновления превью камеры (кадров/с) в зависимости от состояния окна:
+# активно / на заднем плане / пользователь давно ничего не трогал / свёрнуто или скрыто
+GUI_REFRESH_RATES = {
+    "active": 30,
+    "background": 10,
+    "idle": 2,
+    "suspended": 0
+}
+GUI_IDLE_TIMEOUT = 300  # секунд без ввода до режима "idle"
+
+# Headless-режим: локальная веб-панель вместо Qt-интерфейса (python run.py --headless)
+DASHBOARD_HOST = os.getenv("VISION_DASHBOARD_HOST", "127.0.0.1")
+DASHBOARD_PORT = int(os.getenv("VISION_DASHBOARD_PORT", "8080"))
+DASHBOARD_MAX_FPS = 10  # кадров/с в MJPEG-потоке
+DASHBOARD_JPEG_QUALITY = 70
+DASHBOARD_MAX_WIDTH = 640  # кадр уменьшается до этой ширины перед сжатием
+DASHBOARD_HISTORY = 50  # сообщений чата при подключении браузера
+# Адреса страниц, которым разрешён WebSocket панели, кроме её собственного адреса
+# (например, "http://192.168.1.10:8080" при VISION_DASHBOARD_HOST=0.0.0.0)
+DASHBOARD_ALLOWED_ORIGINS = [o for o in os.getenv("VISION_DASHBOARD_ORIGINS", "").split(",") if o]
+
+# Ядро и интерфейс в разных процессах (python run.py --core / --gui)
+CORE_SOCKET_PATH = os.getenv("VISION_CORE_SOCKET", "/tmp/vision_core.sock")
+CORE_PORT = int(os.getenv("VISION_CORE_PORT", "8766"))  # если нет Unix-сокетов (Windows)
+CORE_CLIENT_QUEUE_SIZE = 256  # событий в очереди клиента; при переполнении теряются старые
+CORE_SEND_TIMEOUT = 2.0  # секунд; зависший интерфейс отключается, ядро не ждёт
+CORE_FRAME_SLOTS = 3
+CORE_FRAME_MAX_BYTES = 1920 * 1080 * 3
+CORE_CONNECT_TIMEOUT = 120  # секунд ожидания готовности ядра (загрузка моделей)
+CORE_HISTORY = 200  # сообщений журнала при подключении интерфейса
+
+# Бюджеты времени запуска (python startup_benchmark.py), секунд
+STARTUP_IMPORT_RUN_BUDGET = 0.1
+STARTUP_IMPORT_MAIN_BUDGET = 0.3
+STARTUP_MENU_BUDGET = 0.5
+
+# Параллельная инициализация (startup.py)
+STARTUP_WORKERS = 6
+STARTUP_CAMERA_TIMEOUT = 10.0  # секунд ожидания первого кадра камеры
+STARTUP_LLM_WARMUP_TIMEOUT = 5.0  # секунд на установку соединения с провайдерами LLM
+
 # Colors (для интерфейса)
 COLORS = {
     "primary": "#00d4aa",
@@ -81,6 +241,27 @@ EXIT_WORDS = [
     "отключись"
 ]
 
+# Local intents: простые запросы обрабатываются без LLM
+INTENTS_ENABLED = True
+INTENT_MIN_CONFIDENCE = 0.8  # ниже - запрос уходит в LLM
+DEFAULT_LLM_LATENCY = 1.5  # секунд, оценка задержки LLM до первых замеров
+
+APP_COMMANDS = {
+    "открой браузер": "Safari",
+    "открой chrome": "Google Chrome",
+    "открой телегу": "Telegram",
+    "открой календарь": "Calendar",
+    "открой заметки": "Notes",
+    "открой терминал": "Terminal",
+    "открой музыку": "Spotify",
+}
+
+URL_COMMANDS = {
+    "открой youtube": "https://www.youtube.com",
+    "открой почту": "https://e.mail.ru/inbox",
+    "открой вк": "https://www.vk.com",
+}
+
 # Vision keywords
 VISION_KEYWORDS = [
     "что ты видишь",
@@ -93,6 +274,17 @@ VISION_KEYWORDS = [
     "что перед тобой"
 ]
 
+# Вопросы, ответ на которые быстро устаревает
+TIME_SENSITIVE_KEYWORDS = [
+    "время",
+    "который час",
+    "сколько времени",
+    "дата",
+    "какое число",
+    "сегодня",
+    "день недели"
+]
+
 # System prompts
 SYSTEM_PROMPTS = {
     "main": (
@@ -106,6 +298,12 @@ SYSTEM_PROMPTS = {
         "Ты робот ВИЖН. Инициируй дружелюбный диалог с пользователем. "
         "Будь естественным и интересным в разговоре. "
         "Можешь спросить о том, что происходит, или предложить поговорить о чем-то интересном."
+    ),
+    "summary": (
+        "Ты ведёшь краткое содержание диалога робота ВИЖН с пользователем. "
+        "Объедини текущее краткое содержание с новыми репликами. "
+        "Сохрани факты о пользователе, его просьбы и важные темы. "
+        "Пиши сжато, не более 8 предложений, без вступлений."
     )
 }
 
@@ -0,0 +1,94 @@
+# context_manager.py
+"""
+Сборка контекста для LLM в пределах бюджета токенов.
+Токены считаются локальным приближением, без обращения к токенизатору модели.
+"""
+
+import re
+import logging
+import threading
+
+from prompt_prefix import content_text
+
+_token_re = re.compile(r"\w+|[^\w\s]")
+
+# Служебные токены на каждое сообщение (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Приблизительно посчитать токены: ~4 символа латиницы или ~3 кириллицы на токен"""
+    count = 0
+    for match in _token_re.finditer(text):
+        word = match.group()
+        chars_per_token = 4 if word.isascii() else 3
+        count += max(1, -(-len(word) // chars_per_token))
+    return count
+
+
+def message_tokens(message):
+    """Токены одного сообщения вместе со служебными"""
+    return estimate_tokens(content_text(message['content'])) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextBuilder:
+    """Упаковывает последние реплики диалога в бюджет токенов"""
+
+    def __init__(self, prompt_prefix, max_tokens=1200, max_messages=20):
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.lock = threading.Lock()
+
+        # Префикс (персона) неизменен между ходами - считаем его один раз и
+        # передаём те же объекты, чтобы клиент подставил готовый JSON
+        self.prefix = prompt_prefix.messages
+        self.prefix_tokens = sum(message_tokens(m) for m in self.prefix)
+
+        # id(запись истории) -> (запись, сообщение для API, токены)
+        self._entry_cache = {}
+        self.last_prompt_tokens = 0
+
+    def _api_message(self, entry):
+        """Сообщение для API из записи истории (кэшируется между ходами)"""
+        cached = self._entry_cache.get(id(entry))
+        if cached is not None and cached[0] is entry:
+            return cached[1], cached[2]
+
+        message = {"role": entry['role'], "content": entry['content']}
+        tokens = message_tokens(message)
+        self._entry_cache[id(entry)] = (entry, message, tokens)
+        return message, tokens
+
+    def build(self, history, pinned=()):
+        """
+        Собрать сообщения: префикс, закреплённые элементы и последние реплики.
+        Возвращённые словари сообщений переиспользуются между ходами - не изменяйте их.
+        """
+        with self.lock:
+            pinned = list(pinned)
+            used = self.prefix_tokens + sum(message_tokens(m) for m in pinned)
+            budget = self.max_tokens - used
+
+            selected = []
+            seen = set()
+            for entry in reversed(history[-self.max_messages:]):
+                message, tokens = self._api_message(entry)
+                seen.add(id(entry))
+                # Последнюю реплику берём всегда, остальные - пока помещаются
+                if selected and (tokens > budget or len(selected) >= self.max_messages):
+                    break
+                selected.append(message)
+                budget -= tokens
+
+            # Выбрасываем из кэша записи, которые больше не попадают в окно
+            if len(self._entry_cache) > 4 * self.max_messages:
+                self._entry_cache = {k: v for k, v in self._entry_cache.items() if k in seen}
+
+            selected.reverse()
+            history_tokens = self.max_tokens - used - budget
+            self.last_prompt_tokens = used + history_tokens
+            logging.info(
+                f"Prompt: {len(selected)} history messages, ~{self.last_prompt_tokens} tokens "
+                f"(history {history_tokens}/{self.max_tokens - used})"
+            )
+            return list(self.prefix) + pinned + selected
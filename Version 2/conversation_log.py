@@ -0,0 +1,100 @@
+# conversation_log.py
+"""
+Версионированный журнал сообщений диалога.
+Каждое сообщение получает монотонный номер; потребители (интерфейс и др.)
+читают только новые сообщения через read_since(seq) или ждут их через wait(),
+поэтому стоимость опроса не растёт с длиной сессии. История для промпта
+(conversation_history) может сворачиваться и обрезаться - журнал от этого
+не меняется.
+"""
+
+import time
+import threading
+from datetime import datetime
+
+
+class Message:
+    """Запись журнала"""
+
+    __slots__ = ("seq", "role", "content", "timestamp", "created")
+
+    def __init__(self, seq, role, content, timestamp=None):
+        self.seq = seq
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.created = time.monotonic()
+
+    def to_dict(self):
+        return {"seq": self.seq, "role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["seq"], data["role"], data["content"], data.get("timestamp"))
+
+
+class ConversationLog:
+    """Потокобезопасный журнал только на дозапись с чтением по номеру"""
+
+    def __init__(self, max_messages=2000):
+        # В памяти хранятся последние max_messages сообщений
+        self.max_messages = max_messages
+        self.condition = threading.Condition()
+        self.messages = []
+        # Номер первого сообщения в self.messages
+        self.first_seq = 1
+        self.last_seq = 0
+
+    def append(self, role, content, timestamp=None):
+        """Добавить сообщение и разбудить ожидающих; возвращает Message"""
+        with self.condition:
+            self.last_seq += 1
+            message = Message(self.last_seq, role, content, timestamp)
+            self._store(message)
+        return message
+
+    def add(self, message):
+        """Добавить сообщение с уже присвоенным номером (зеркало журнала другого процесса).
+
+        Возвращает False для уже известного сообщения. При пропуске номеров
+        (снимок хвоста после переподключения) журнал начинается с этого сообщения.
+        """
+        with self.condition:
+            if message.seq <= self.last_seq:
+                return False
+            if message.seq != self.last_seq + 1:
+                self.messages = []
+                self.first_seq = message.seq
+            self.last_seq = message.seq
+            self._store(message)
+        return True
+
+    def _store(self, message):
+        self.messages.append(message)
+        if len(self.messages) > self.max_messages:
+            # Удаляем пачкой, чтобы сдвиг списка был редким
+            drop = len(self.messages) - self.max_messages // 2
+            del self.messages[:drop]
+            self.first_seq += drop
+        self.condition.notify_all()
+
+    def read_since(self, seq, limit=None):
+        """Сообщения с номером больше seq (не более limit самых старых из них)"""
+        with self.condition:
+            return self._slice(seq, limit)
+
+    def _slice(self, seq, limit):
+        start = max(0, seq + 1 - self.first_seq)
+        end = len(self.messages) if limit is None else min(len(self.messages), start + limit)
+        return self.messages[start:end]
+
+    def wait(self, seq, timeout=None):
+        """Дождаться сообщений новее seq; пустой список - если истёк таймаут"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_seq > seq, timeout)
+            return self._slice(seq, None)
+
+    def tail(self, count):
+        """Последние count сообщений"""
+        with self.condition:
+            return self.messages[-count:] if count > 0 else []
@@ -0,0 +1,242 @@
+# conversation_store.py
+"""
+Постоянное хранилище диалогов в SQLite (режим WAL).
+Сообщения привязаны к человеку и сессии; запись идёт пачками из фонового
+потока, поэтому ход диалога никогда не ждёт диск. Полнотекстовый индекс
+FTS5 позволяет за миллисекунды найти старые реплики по ключевым словам.
+При запуске загружается только хвост активной сессии.
+"""
+
+import re
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+_word_re = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    person_id INTEGER NOT NULL REFERENCES persons(id),
+    started_at REAL NOT NULL,
+    last_message_at REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_person ON sessions(person_id, started_at);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    person_id INTEGER NOT NULL REFERENCES persons(id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+
+def fts_query(text, min_length=4):
+    """Запрос FTS5 из значимых слов текста: любое из слов, поиск по основе.
+
+    Окончания (до двух букв) отбрасываются, чтобы "кошки" находило "кошку".
+    """
+    words = [w for w in _word_re.findall(text.lower()) if len(w) >= min_length]
+    stems = [w[:max(min_length, len(w) - 2)] for w in words]
+    return " OR ".join(f'"{stem}"*' for stem in dict.fromkeys(stems))
+
+
+class ConversationStore:
+    """Хранилище диалогов с фоновой пакетной записью"""
+
+    def __init__(self, db_path="conversations.sqlite3", batch_size=32, flush_interval=0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.person_id = None
+        self.session_id = None
+        self.fts_enabled = True
+        self.running = False
+        self.thread = None
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "write_time": 0.0, "recalls": 0}
+        # База открывается в start(): создание объекта не трогает диск
+        self.db = None
+
+    def _open(self):
+        # Соединение для чтения; писатель открывает своё в фоновом потоке
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            # Сборка SQLite без FTS5 - поиск через LIKE
+            logging.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+            self.fts_enabled = False
+        self.db.commit()
+
+    def start(self):
+        if self.running:
+            return
+        if self.db is None:
+            self._open()
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, name="conversation-store", daemon=True)
+        self.thread.start()
+
+    def open_session(self, person, resume_window=1800):
+        """Выбрать человека; продолжить его последнюю сессию, если она была недавно.
+
+        Возвращает True, если сессия продолжена (тогда есть смысл загрузить хвост).
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO persons (name, created_at) VALUES (?, ?)", (person, now))
+            self.person_id = self.db.execute("SELECT id FROM persons WHERE name = ?", (person,)).fetchone()[0]
+            row = self.db.execute(
+                "SELECT id, COALESCE(last_message_at, started_at) FROM sessions "
+                "WHERE person_id = ? ORDER BY started_at DESC LIMIT 1",
+                (self.person_id,)
+            ).fetchone()
+            if row is not None and now - row[1] <= resume_window:
+                self.session_id = row[0]
+                resumed = True
+            else:
+                cursor = self.db.execute("INSERT INTO sessions (person_id, started_at) VALUES (?, ?)",
+                                         (self.person_id, now))
+                self.session_id = cursor.lastrowid
+                resumed = False
+            self.db.commit()
+        logging.info(f"Conversation session {self.session_id} for '{person}' "
+                     f"({'resumed' if resumed else 'new'})")
+        return resumed
+
+    def append(self, role, content, timestamp=None):
+        """Поставить сообщение в очередь на запись (не блокирует)"""
+        if self.session_id is None:
+            return
+        self.queue.put((self.session_id, self.person_id, role, content,
+                        timestamp or datetime.now().isoformat(), time.time()))
+        self.stats["queued"] += 1
+
+    def load_tail(self, limit=20):
+        """Последние сообщения активной сессии в порядке времени"""
+        if self.session_id is None:
+            return []
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (self.session_id, limit)
+            ).fetchall()
+        return [{"role": role, "content": content, "timestamp": ts} for role, content, ts in reversed(rows)]
+
+    def recall(self, text, limit=3, exclude_session=True):
+        """Старые реплики этого человека по ключевым словам текста"""
+        if self.person_id is None:
+            return []
+        query = fts_query(text)
+        if not query:
+            return []
+        session_filter = self.session_id if exclude_session else -1
+        started = time.perf_counter()
+        with self.lock:
+            try:
+                if self.fts_enabled:
+                    rows = self.db.execute(
+                        "SELECT m.role, m.content, m.timestamp FROM messages_fts "
+                        "JOIN messages m ON m.id = messages_fts.rowid "
+                        "WHERE messages_fts MATCH ? AND m.person_id = ? AND m.session_id != ? "
+                        "ORDER BY bm25(messages_fts) LIMIT ?",
+                        (query, self.person_id, session_filter, limit)
+                    ).fetchall()
+                else:
+                    words = [w.strip('"*') for w in query.split(" OR ")]
+                    condition = " OR ".join("lower(content) LIKE ?" for _ in words)
+                    rows = self.db.execute(
+                        f"SELECT role, content, timestamp FROM messages "
+                        f"WHERE person_id = ? AND session_id != ? AND ({condition}) "
+                        f"ORDER BY id DESC LIMIT ?",
+                        (self.person_id, session_filter, *[f"%{w}%" for w in words], limit)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Conversation recall error: {e}")
+                return []
+        self.stats["recalls"] += 1
+        logging.debug(f"Recall '{query}': {len(rows)} hits in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return [{"role": role, "content": content, "timestamp": ts} for role, content, ts in rows]
+
+    def _writer_loop(self):
+        db = sqlite3.connect(self.db_path)
+        db.execute("PRAGMA synchronous=NORMAL")
+        while self.running or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Всё, что накопилось, - одной транзакцией
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(db, batch)
+        db.close()
+
+    def _write_batch(self, db, batch):
+        started = time.perf_counter()
+        try:
+            with db:
+                db.executemany(
+                    "INSERT INTO messages (session_id, person_id, role, content, timestamp, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                last_message_at = {}
+                for row in batch:
+                    last_message_at[row[0]] = max(row[5], last_message_at.get(row[0], 0.0))
+                db.executemany(
+                    "UPDATE sessions SET last_message_at = ? WHERE id = ?",
+                    [(created, session_id) for session_id, created in last_message_at.items()]
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store write error: {e}")
+            return
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["write_time"] += time.perf_counter() - started
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["pending"] = self.queue.qsize()
+        stats["avg_batch"] = stats["written"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def close(self):
+        """Дописать очередь и закрыть базу"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
@@ -0,0 +1,174 @@
+# core_client.py
+"""
+Клиент ядра для интерфейса в отдельном процессе.
+Повторяет то, что интерфейс берёт из модуля main: event_bus (локальная шина,
+которую наполняют события из сокета), get_conversation_since (зеркало журнала)
+и submit_user_input. Кадры читаются из разделяемой памяти ядра.
+При потере связи клиент переподключается сам - ядро при этом не ждёт.
+"""
+
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import Future
+
+import event_bus as events
+from event_bus import EventBus
+from conversation_log import ConversationLog, Message
+from ipc import core_address, pack_message, recv_message, SharedFrames
+
+
+class CoreClient:
+    """Подключение интерфейса к ядру"""
+
+    def __init__(self, reconnect_interval=1.0):
+        self.event_bus = EventBus()
+        self.conversation_log = ConversationLog()
+        self.family, self.address = core_address()
+        self.reconnect_interval = reconnect_interval
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.frames = None
+        self.pending = {}
+        self.request_id = 0
+        self.running = False
+        self.thread = None
+        self.connected = threading.Event()
+        self.stats = {"connects": 0, "events": 0, "frames": 0, "frames_lost": 0}
+
+    def connect(self, timeout=120):
+        """Подключиться, дождавшись готовности ядра; дальше связь поддерживается в фоне"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="core-client", daemon=True)
+        self.thread.start()
+        if not self.connected.wait(timeout):
+            self.close()
+            raise ConnectionError(f"Core is not available at {self.address}")
+        return self
+
+    def _open(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _run(self):
+        while self.running:
+            try:
+                sock = self._open()
+            except OSError:
+                time.sleep(self.reconnect_interval)
+                continue
+            self.sock = sock
+            try:
+                while self.running:
+                    self._handle(recv_message(sock))
+            except (ConnectionError, OSError, ValueError) as e:
+                if self.running:
+                    logging.warning(f"Lost connection to core: {e}")
+            finally:
+                self._disconnected()
+            if self.running:
+                time.sleep(self.reconnect_interval)
+
+    def _disconnected(self):
+        self.connected.clear()
+        with self.send_lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("Core disconnected"))
+        self.pending = {}
+        self.event_bus.set_status("core", "disconnected")
+
+    def _handle(self, message):
+        kind = message.get("type")
+        if kind == "hello":
+            self._on_hello(message)
+        elif kind == events.FRAME_UPDATED:
+            frame = self.frames.read(message["slot"], message["seq"]) if self.frames is not None else None
+            if frame is None:
+                # Ядро успело перезаписать слот - следующий кадр уже в пути
+                self.stats["frames_lost"] += 1
+                return
+            self.stats["frames"] += 1
+            self.event_bus.publish(events.FRAME_UPDATED, frame=frame, seq=message["seq"])
+        elif kind == "submit_result":
+            future = self.pending.pop(message.get("id"), None)
+            if future is None:
+                return
+            if "error" in message:
+                future.set_exception(RuntimeError(message["error"]))
+            elif message.get("cancelled"):
+                future.cancel()
+            else:
+                future.set_result(message.get("result"))
+        elif kind == events.STATUS_CHANGED:
+            self.stats["events"] += 1
+            self.event_bus.set_status(message["component"], message["state"])
+        elif kind == events.MESSAGE_ADDED:
+            self.stats["events"] += 1
+            msg = Message.from_dict(message["message"])
+            if self.conversation_log.add(msg):
+                self.event_bus.publish(events.MESSAGE_ADDED, message=msg)
+        elif kind in events.EVENT_TYPES:
+            self.stats["events"] += 1
+            self.event_bus.publish(kind, **{k: v for k, v in message.items() if k != "type"})
+
+    def _on_hello(self, message):
+        frames = message["frames"]
+        self.frames = SharedFrames(name=frames["name"], slots=frames["slots"], slot_bytes=frames["slot_bytes"])
+        for data in message["messages"]:
+            msg = Message.from_dict(data)
+            if self.conversation_log.add(msg):
+                self.event_bus.publish(events.MESSAGE_ADDED, message=msg)
+        for component, state in message["status"].items():
+            self.event_bus.set_status(component, state)
+        self.event_bus.set_status("core", "connected")
+        self.stats["connects"] += 1
+        logging.info(f"Connected to core (pid {message['pid']})")
+        self.connected.set()
+
+    def _send(self, message):
+        with self.send_lock:
+            if self.sock is None:
+                raise ConnectionError("Core is not connected")
+            self.sock.sendall(pack_message(message))
+
+    def get_conversation_since(self, seq):
+        return self.conversation_log.read_since(seq)
+
+    def submit_user_input(self, text, source="typed"):
+        """Отправить ввод ядру; Future завершится ответом ядра"""
+        future = Future()
+        self.request_id += 1
+        request_id = self.request_id
+        self.pending[request_id] = future
+        try:
+            self._send({"type": "submit", "id": request_id, "text": text, "source": source})
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            future.set_exception(e)
+        return future
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def close(self):
+        self.running = False
+        with self.send_lock:
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        if self.thread is not None:
+            self.thread.join(timeout=2)
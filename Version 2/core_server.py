@@ -0,0 +1,253 @@
+# core_server.py
+"""
+Сервер ядра: отдаёт события шины и кадры камеры интерфейсам в других
+процессах и принимает от них команды (см. ipc.py).
+
+Подписчики шины вызываются в потоках ядра (голосовой цикл, камера), поэтому
+они только кладут готовые байты в ограниченную очередь клиента и никогда не
+ждут сокет. Отправкой занимается отдельный поток каждого клиента; интерфейс,
+который не забирает данные дольше send_timeout, отключается.
+"""
+
+import os
+import time
+import queue
+import socket
+import logging
+import threading
+
+import event_bus as events
+from ipc import core_address, pack_message, recv_message, SharedFrames
+
+FORWARDED_EVENTS = (events.UTTERANCE_RECOGNIZED, events.TURN_STARTED, events.TURN_FINISHED,
+                    events.TOKENS_STREAMED, events.MESSAGE_ADDED, events.DETECTIONS_UPDATED,
+                    events.STATUS_CHANGED)
+
+
+def event_message(event):
+    """Событие шины в сообщение протокола"""
+    message = {"type": event.type}
+    for key, value in event.payload.items():
+        message[key] = value.to_dict() if key == "message" else value
+    return message
+
+
+class ClientConnection:
+    """Подключённый интерфейс: очередь исходящих сообщений и два потока"""
+
+    def __init__(self, server, sock, name, queue_size, send_timeout):
+        self.server = server
+        self.sock = sock
+        self.name = name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.send_timeout = send_timeout
+        self.closed = threading.Event()
+        self.dropped = 0
+        self.sent = 0
+        self.sender = threading.Thread(target=self._send_loop, name=f"core-client-send-{name}", daemon=True)
+        self.receiver = threading.Thread(target=self._receive_loop, name=f"core-client-recv-{name}", daemon=True)
+
+    def start(self):
+        self.sender.start()
+        self.receiver.start()
+
+    def send(self, data):
+        """Поставить байты в очередь (не блокирует; при переполнении теряются старые)"""
+        if self.closed.is_set():
+            return
+        while True:
+            try:
+                self.queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _send_loop(self):
+        self.sock.settimeout(self.send_timeout)
+        try:
+            while not self.closed.is_set():
+                try:
+                    data = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self.sock.sendall(data)
+                self.sent += 1
+        except socket.timeout:
+            logging.warning(f"Core client {self.name} is not reading, disconnecting")
+        except OSError as e:
+            logging.info(f"Core client {self.name} disconnected: {e}")
+        self.close()
+
+    def _receive_loop(self):
+        while not self.closed.is_set():
+            try:
+                message = recv_message(self.sock)
+            except (ConnectionError, OSError, ValueError) as e:
+                logging.info(f"Core client {self.name} closed: {e}")
+                break
+            try:
+                self.server.handle_command(self, message)
+            except Exception as e:
+                logging.error(f"Core command error ({message.get('type')}): {e}")
+        self.close()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.server.remove_client(self)
+
+
+class CoreServer:
+    """Локальный сервер ядра для интерфейсов в отдельных процессах.
+
+    core - объект с event_bus, get_conversation_since и submit_user_input
+    (модуль main).
+    """
+
+    def __init__(self, core, queue_size=256, send_timeout=2.0, frame_slots=3, frame_max_bytes=1920 * 1080 * 3,
+                 history=200):
+        self.core = core
+        self.bus = core.event_bus
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.history = history
+        self.family, self.address = core_address()
+        self.frames = SharedFrames(slots=frame_slots, slot_bytes=frame_max_bytes)
+        self.lock = threading.Lock()
+        self.clients = []
+        self.client_count = 0
+        self.listener = None
+        self.thread = None
+        self.running = False
+        self.stats = {"clients": 0, "frames": 0, "frames_skipped": 0, "events": 0, "commands": 0}
+        self._unsubscribe = []
+
+    def start(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            # Сокет от прошлого запуска
+            os.unlink(self.address)
+        self.listener = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.address)
+        self.listener.listen(4)
+        self.running = True
+        self.thread = threading.Thread(target=self._accept_loop, name="core-server", daemon=True)
+        self.thread.start()
+
+        self._unsubscribe.append(self.bus.subscribe(events.FRAME_UPDATED, self._on_frame))
+        for event_type in FORWARDED_EVENTS:
+            self._unsubscribe.append(self.bus.subscribe(event_type, self._on_event))
+        logging.info(f"Core server listening on {self.address} (frames in shared memory '{self.frames.name}')")
+        return self
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                break
+            with self.lock:
+                self.client_count += 1
+                client = ClientConnection(self, sock, str(self.client_count), self.queue_size, self.send_timeout)
+                self.clients.append(client)
+            self.stats["clients"] += 1
+            client.send(pack_message(self.hello()))
+            client.start()
+            logging.info(f"Core client {client.name} connected")
+
+    def hello(self):
+        """Первое сообщение клиенту: параметры кадров, статусы и хвост журнала"""
+        messages = self.core.get_conversation_since(0)[-self.history:]
+        return {
+            "type": "hello",
+            "pid": os.getpid(),
+            "frames": {"name": self.frames.name, "slots": self.frames.slots, "slot_bytes": self.frames.slot_bytes},
+            "status": self.bus.get_status(),
+            "messages": [m.to_dict() for m in messages],
+        }
+
+    def remove_client(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def broadcast(self, message):
+        with self.lock:
+            clients = list(self.clients)
+        if not clients:
+            return
+        # Сериализуем один раз для всех клиентов
+        data = pack_message(message)
+        for client in clients:
+            client.send(data)
+
+    def _on_event(self, event):
+        if self.clients:
+            self.stats["events"] += 1
+            self.broadcast(event_message(event))
+
+    def _on_frame(self, event):
+        if not self.clients:
+            return
+        written = self.frames.write(event.payload["frame"])
+        if written is None:
+            self.stats["frames_skipped"] += 1
+            return
+        slot, seq = written
+        self.stats["frames"] += 1
+        self.broadcast({"type": events.FRAME_UPDATED, "slot": slot, "seq": seq})
+
+    def handle_command(self, client, message):
+        """Команда от интерфейса (вызывается в потоке приёма клиента)"""
+        self.stats["commands"] += 1
+        command = message.get("type")
+        if command == "submit":
+            request_id = message.get("id")
+            future = self.core.submit_user_input(message["text"], source=message.get("source", "typed"))
+
+            def reply(done):
+                if done.cancelled():
+                    result = {"type": "submit_result", "id": request_id, "cancelled": True}
+                elif done.exception() is not None:
+                    result = {"type": "submit_result", "id": request_id, "error": str(done.exception())}
+                else:
+                    result = {"type": "submit_result", "id": request_id, "result": done.result()}
+                client.send(pack_message(result))
+
+            future.add_done_callback(reply)
+        elif command == "ping":
+            client.send(pack_message({"type": "pong", "time": time.time()}))
+        else:
+            logging.warning(f"Unknown core command: {command}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        with self.lock:
+            stats["connected"] = len(self.clients)
+            stats["dropped"] = sum(client.dropped for client in self.clients)
+        return stats
+
+    def close(self):
+        self.running = False
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        if self.listener is not None:
+            self.listener.close()
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.frames.close()
@@ -0,0 +1,88 @@
+# event_bus.py
+"""
+Шина событий внутри процесса (издатель/подписчик).
+Ядро публикует события, когда что-то действительно изменилось, а интерфейс
+подписывается на них (через мост в сигналы Qt - qt_bridge.py) вместо
+периодического опроса геттеров.
+"""
+
+import time
+import logging
+import threading
+
+# Типы событий и их поля
+UTTERANCE_RECOGNIZED = "utterance_recognized"  # text
+TURN_STARTED = "turn_started"  # text, source
+TURN_FINISHED = "turn_finished"  # text, response
+TOKENS_STREAMED = "tokens_streamed"  # text (очередной фрагмент ответа)
+MESSAGE_ADDED = "message_added"  # message (conversation_log.Message)
+DETECTIONS_UPDATED = "detections_updated"  # detections, description
+FRAME_UPDATED = "frame_updated"  # frame, seq
+STATUS_CHANGED = "status_changed"  # component, state
+
+EVENT_TYPES = (UTTERANCE_RECOGNIZED, TURN_STARTED, TURN_FINISHED, TOKENS_STREAMED,
+               MESSAGE_ADDED, DETECTIONS_UPDATED, FRAME_UPDATED, STATUS_CHANGED)
+
+
+class Event:
+    """Событие шины"""
+
+    __slots__ = ("type", "payload", "timestamp")
+
+    def __init__(self, event_type, payload):
+        self.type = event_type
+        self.payload = payload
+        self.timestamp = time.time()
+
+
+class EventBus:
+    """Синхронная шина: подписчики вызываются в потоке издателя"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.published = {}
+        # Последнее состояние компонентов - чтобы не публиковать повторы
+        self.status = {}
+
+    def subscribe(self, event_type, callback):
+        """Подписаться на события типа event_type (None - на все); возвращает функцию отписки"""
+        if event_type is not None and event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+        with self.lock:
+            # Копия при записи: publish перебирает список без блокировки
+            self.subscribers[event_type] = self.subscribers.get(event_type, []) + [callback]
+
+        def unsubscribe():
+            with self.lock:
+                callbacks = [c for c in self.subscribers.get(event_type, []) if c is not callback]
+                self.subscribers[event_type] = callbacks
+
+        return unsubscribe
+
+    def publish(self, event_type, **payload):
+        event = Event(event_type, payload)
+        with self.lock:
+            callbacks = self.subscribers.get(event_type, []) + self.subscribers.get(None, [])
+            self.published[event_type] = self.published.get(event_type, 0) + 1
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error(f"Event subscriber error ({event_type}): {e}")
+
+    def set_status(self, component, state):
+        """Опубликовать STATUS_CHANGED, только если состояние компонента изменилось"""
+        with self.lock:
+            if self.status.get(component) == state:
+                return
+            self.status[component] = state
+        self.publish(STATUS_CHANGED, component=component, state=state)
+
+    def get_status(self):
+        with self.lock:
+            return dict(self.status)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.published)
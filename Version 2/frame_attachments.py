@@ -0,0 +1,144 @@
+# frame_attachments.py
+"""
+Кадр с камеры как вложение для мультимодальных запросов к LLM.
+Из короткого окна последних кадров выбирается самый резкий и неподвижный,
+уменьшается и кодируется в JPEG с качеством, подобранным под лимит байтов.
+Закодированный кадр кэшируется по номеру кадра, поэтому повторный вопрос
+о том же кадре не кодирует его заново.
+"""
+
+import time
+import base64
+import logging
+import threading
+from collections import OrderedDict
+
+# Размер кадра для оценки резкости и движения
+SCORE_WIDTH = 160
+
+# cv2 импортируется внутри функций: модуль загружается вместе с main,
+# а кадры нужны только в мультимодальном режиме
+
+
+def _small_gray(frame):
+    import cv2
+    height, width = frame.shape[:2]
+    scale = SCORE_WIDTH / float(width)
+    small = cv2.resize(frame, (SCORE_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def frame_scores(frames):
+    """Оценки кадров окна: резкость (дисперсия лапласиана), делённая на движение.
+
+    Движение каждого кадра - разница с предыдущим, у первого - со следующим,
+    чтобы у самого старого кадра не было преимущества в нулевом движении.
+    """
+    import cv2
+    grays = [_small_gray(frame) for _, frame in frames]
+    scores = []
+    for i, (seq, frame) in enumerate(frames):
+        sharpness = cv2.Laplacian(grays[i], cv2.CV_64F).var()
+        neighbor = i - 1 if i > 0 else i + 1
+        motion = float(cv2.absdiff(grays[i], grays[neighbor]).mean()) if neighbor < len(grays) else 0.0
+        scores.append((sharpness / (1.0 + motion), seq, frame))
+    return scores
+
+
+class FrameAttacher:
+    """Выбор, сжатие и кэширование кадров для запросов к LLM"""
+
+    def __init__(self, max_side=512, max_bytes=60000, min_quality=35, max_quality=85, cache_size=8):
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"attachments": 0, "cache_hits": 0, "encodes": 0, "encode_time": 0.0, "total_bytes": 0}
+
+    def select(self, frames):
+        """Лучший кадр окна [(seq, frame), ...] или (None, None)"""
+        if not frames:
+            return None, None
+        _, seq, frame = max(frame_scores(frames), key=lambda item: item[0])
+        return seq, frame
+
+    def _resize(self, frame, max_side):
+        import cv2
+        height, width = frame.shape[:2]
+        scale = max_side / float(max(height, width))
+        if scale >= 1.0:
+            return frame
+        return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def _encode_quality(self, frame, quality):
+        import cv2
+        ok, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        return buffer.tobytes() if ok else None
+
+    def encode(self, frame):
+        """JPEG с максимальным качеством, помещающимся в max_bytes"""
+        max_side = self.max_side
+        data = None
+        for _ in range(3):
+            image = self._resize(frame, max_side)
+            data = self._encode_quality(image, self.max_quality)
+            if data is None or len(data) <= self.max_bytes:
+                return data
+
+            # Бинарный поиск качества; best - лучший вариант, уложившийся в лимит
+            low, high, best = self.min_quality, self.max_quality - 1, None
+            while low <= high:
+                quality = (low + high) // 2
+                candidate = self._encode_quality(image, quality)
+                if candidate is not None and len(candidate) <= self.max_bytes:
+                    best, low = candidate, quality + 1
+                else:
+                    high = quality - 1
+            if best is not None:
+                return best
+            # Даже минимальное качество не влезает - уменьшаем кадр
+            max_side = int(max_side * 0.75)
+        return data
+
+    def attachment(self, frames):
+        """Часть сообщения image_url с лучшим кадром окна или None"""
+        seq, frame = self.select(frames)
+        if frame is None:
+            return None
+
+        with self.lock:
+            data = self.cache.get(seq)
+            if data is not None:
+                self.cache.move_to_end(seq)
+                self.stats["cache_hits"] += 1
+
+        if data is None:
+            started = time.perf_counter()
+            data = self.encode(frame)
+            elapsed = time.perf_counter() - started
+            if data is None:
+                logging.error("Frame JPEG encoding failed")
+                return None
+            with self.lock:
+                self.cache[seq] = data
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                self.stats["encodes"] += 1
+                self.stats["encode_time"] += elapsed
+            logging.info(f"Frame {seq} encoded: {len(data) / 1024:.1f} KB in {elapsed * 1000:.1f} ms")
+
+        with self.lock:
+            self.stats["attachments"] += 1
+            self.stats["total_bytes"] += len(data)
+        encoded = base64.b64encode(data).decode("ascii")
+        return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}}
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["avg_encode_ms"] = stats["encode_time"] / stats["encodes"] * 1000 if stats["encodes"] else 0.0
+        stats["avg_bytes"] = stats["total_bytes"] / stats["attachments"] if stats["attachments"] else 0.0
+        return stats
@@ -0,0 +1,188 @@
+# intents.py
+"""
+Локальный слой намерений: простые запросы (время, дата, что видит камера,
+громкость и темп речи, открытие приложений и ссылок) обрабатываются за
+миллисекунды без обращения к LLM. Сначала проверяются точные правила, затем
+небольшой классификатор по символьным n-граммам; при низкой уверенности
+запрос уходит в LLM.
+"""
+
+import re
+import math
+import time
+import logging
+import platform
+import threading
+import subprocess
+import webbrowser
+from collections import Counter
+from datetime import datetime
+
+from llm_cache import normalize_prompt
+
+MONTHS = ["января", "февраля", "марта", "апреля", "мая", "июня", "июля",
+          "августа", "сентября", "октября", "ноября", "декабря"]
+WEEKDAYS = ["понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье"]
+
+# Слова-паразиты не влияют на намерение
+FILLER_WORDS = {"пожалуйста", "скажи", "подскажи", "а", "ну", "слушай", "вижн", "мне"}
+
+
+def strip_fillers(text):
+    """Убрать слова-паразиты из нормализованного текста"""
+    return " ".join(word for word in text.split() if word not in FILLER_WORDS)
+
+
+def char_ngrams(text, n=3):
+    """Символьные n-граммы с границами слов"""
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class Intent:
+    """Намерение: правила, примеры фраз и обработчик.
+
+    keywords - основы слов, из которых хотя бы одна должна быть в тексте,
+    чтобы сработало нечёткое сравнение с примерами (например, направление
+    "громче"/"тише": иначе "сделай звук" похоже на оба примера сразу).
+    """
+
+    __slots__ = ("name", "patterns", "examples", "keywords", "handler")
+
+    def __init__(self, name, handler, patterns=(), examples=(), keywords=()):
+        self.name = name
+        self.handler = handler
+        self.patterns = [re.compile(p) for p in patterns]
+        self.examples = [char_ngrams(strip_fillers(normalize_prompt(e))) for e in examples]
+        self.keywords = tuple(keywords)
+
+    def has_keywords(self, words):
+        if not self.keywords:
+            return True
+        return any(word.startswith(stem) for word in words for stem in self.keywords)
+
+
+class IntentRouter:
+    """Определяет намерение и отвечает локально, если уверен"""
+
+    def __init__(self, min_confidence=0.8, llm_latency_fn=None):
+        self.min_confidence = min_confidence
+        # Оценка задержки LLM (сек) для подсчёта сэкономленного времени
+        self.llm_latency_fn = llm_latency_fn
+        self.intents = []
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.fallthroughs = 0
+
+    def register(self, name, handler, patterns=(), examples=(), keywords=()):
+        """Зарегистрировать обработчик handler(text) -> ответ или None"""
+        self.intents.append(Intent(name, handler, patterns, examples, keywords))
+
+    def classify(self, text):
+        """Вернуть (намерение, уверенность); намерение None, если ничего не подошло"""
+        normalized = normalize_prompt(text)
+        for intent in self.intents:
+            if any(p.fullmatch(normalized) for p in intent.patterns):
+                return intent, 1.0
+
+        stripped = strip_fillers(normalized)
+        grams = char_ngrams(stripped)
+        words = stripped.split()
+        best, best_score = None, 0.0
+        for intent in self.intents:
+            if not intent.has_keywords(words):
+                continue
+            for example in intent.examples:
+                score = cosine(grams, example)
+                if score > best_score:
+                    best, best_score = intent, score
+        return best, best_score
+
+    def handle(self, text):
+        """Ответить локально или вернуть None (тогда нужен LLM)"""
+        started = time.perf_counter()
+        intent, confidence = self.classify(text)
+        if intent is None or confidence < self.min_confidence:
+            with self.lock:
+                self.fallthroughs += 1
+            return None
+
+        try:
+            response = intent.handler(text)
+        except Exception as e:
+            logging.error(f"Intent '{intent.name}' handler error: {e}")
+            response = None
+        if response is None:
+            with self.lock:
+                self.fallthroughs += 1
+            return None
+
+        elapsed = time.perf_counter() - started
+        llm_latency = self.llm_latency_fn() if self.llm_latency_fn else None
+        saved = max(0.0, llm_latency - elapsed) if llm_latency else 0.0
+        with self.lock:
+            entry = self.stats.setdefault(intent.name, {"hits": 0, "handler_time": 0.0, "saved_time": 0.0})
+            entry["hits"] += 1
+            entry["handler_time"] += elapsed
+            entry["saved_time"] += saved
+        logging.info(f"Intent '{intent.name}' handled locally in {elapsed * 1000:.1f} ms "
+                     f"(confidence {confidence:.2f}, saved ~{saved:.1f}s)")
+        return response
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "intents": {name: dict(entry) for name, entry in self.stats.items()},
+                "fallthroughs": self.fallthroughs
+            }
+
+
+def handle_time(text):
+    """Который час"""
+    now = datetime.now()
+    return f"Сейчас {now.hour}:{now.minute:02d}."
+
+
+def handle_date(text):
+    """Какое сегодня число"""
+    today = datetime.now()
+    return f"Сегодня {WEEKDAYS[today.weekday()]}, {today.day} {MONTHS[today.month - 1]} {today.year} года."
+
+
+def make_open_handler(app_commands, url_commands):
+    """Обработчик открытия приложений и ссылок"""
+    url_pattern = re.compile(r'(https?://[^\s]+)')
+
+    def handle_open(text):
+        command = text.lower()
+        for phrase, url in url_commands.items():
+            if phrase in command:
+                webbrowser.open(url)
+                return f"Открываю {phrase.split()[1].capitalize()}"
+
+        for phrase, app in app_commands.items():
+            if phrase in command:
+                system = platform.system()
+                if system == "Darwin":
+                    subprocess.Popen(["open", "-a", app])
+                elif system == "Windows":
+                    subprocess.Popen(["cmd", "/c", "start", "", app])
+                else:
+                    subprocess.Popen([app.lower()])
+                return f"Открываю {app}"
+
+        match = url_pattern.search(text)
+        if match:
+            webbrowser.open(match.group(0))
+            return "Открываю ссылку"
+        return None
+
+    return handle_open
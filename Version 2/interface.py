@@ -1,20 +1,24 @@
 import sys
 import cv2
-import numpy as np
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QScrollArea, QFrame, QSplitter, QPushButton, QTextEdit, QMessageBox)
-from PyQt5.QtGui import (QPainter, QColor, QFont, QPixmap, QImage,QLinearGradient, QPen, QBrush)
-from PyQt5.QtCore import (Qt, QTimer, QThread, pyqtSignal, QSize)
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTextEdit, QMessageBox,
+                             QListView, QAbstractItemView, QStyledItemDelegate)
+from PyQt5.QtGui import (QPainter, QColor, QFont, QPixmap, QImage, QPen, QBrush,
+                         QFontMetrics, QStaticText, QTransform)
+from PyQt5.QtCore import Qt, QSize, QAbstractListModel, QModelIndex, QPointF, QRectF
 import logging
+from collections import OrderedDict
 from datetime import datetime
-import threading
-from main import (get_last_user_input, get_last_ai_response,get_conversation_history, is_running,process_user_input, vision_processor)
+from qt_bridge import QtEventBridge
+from refresh_governor import RefreshGovernor
 
 logging.basicConfig(level=logging.INFO)
 class CameraWidget(QLabel):
     """Виджет для отображения видео с камеры"""
 
-    def __init__(self, parent=None):
+    def __init__(self, bridge, governor, parent=None):
         super().__init__(parent)
+        self.bridge = bridge
+        self.governor = governor
         self.setMinimumSize(480, 360)
         self.setMaximumSize(640, 480)
         self.setStyleSheet("""
@@ -29,16 +33,29 @@ class CameraWidget(QLabel):
         self.setText("Камера инициализируется...")
         self.setWordWrap(True)
 
-        # Таймер для обновления видео
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_camera)
-        self.timer.start(50)
+        # Кадры приходят сигналом от процессора зрения
+        self.bridge.frame_updated.connect(self.update_camera)
+        self.bridge.status_changed.connect(self.on_status_changed)
+        self.governor.mode_changed.connect(self.on_mode_changed)
+
+    def on_status_changed(self, component, state):
+        if component == "camera" and state != "active":
+            self.clear()
+            self.setText("Ожидание сигнала с камеры...")
+
+    def on_mode_changed(self, mode):
+        # Окно снова видно - сразу показываем свежий кадр, не дожидаясь следующего
+        if mode != "suspended":
+            self.update_camera(force=True)
 
-    def update_camera(self):
+    def update_camera(self, force=False):
         """Обновление изображения с камеры"""
         try:
-            from main import vision_processor
-            frame = vision_processor.get_current_frame()
+            # Кадр забираем всегда (иначе мост перестанет присылать новые),
+            # а конвертируем только с разрешённой регулятором частотой
+            frame = self.bridge.take_frame()
+            if frame is not None and not (force or self.governor.allow("camera")):
+                return
 
             if frame is not None:
                 # Преобразуем BGR в RGB
@@ -55,10 +72,11 @@ class CameraWidget(QLabel):
                 pixmap = QPixmap.fromImage(q_img)
 
                 # Масштабируем с сохранением пропорций
+                # Сглаживание - только когда на окно действительно смотрят
                 scaled_pixmap = pixmap.scaled(
                     widget_width, widget_height,
                     Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
+                    Qt.SmoothTransformation if self.governor.mode == "active" else Qt.FastTransformation
                 )
 
                 self.setPixmap(scaled_pixmap)
@@ -70,102 +88,162 @@ class CameraWidget(QLabel):
             self.setText("Ошибка камеры")
 
 
-class ChatMessage(QFrame):
-    """Виджет для одного сообщения в чате"""
+class ChatModel(QAbstractListModel):
+    """Модель чата поверх сообщений журнала диалога (conversation_log.Message)"""
 
-    def __init__(self, message, is_user=True, timestamp=None, parent=None):
-        super().__init__(parent)
-        self.setMaximumWidth(600)
-
-        # Настройка стиля в зависимости от типа сообщения
-        if is_user:
-            self.setStyleSheet("""
-                QFrame {
-                    background-color: rgba(0, 123, 255, 30);
-                    border: 1px solid rgba(0, 123, 255, 50);
-                    border-radius: 15px;
-                    padding: 10px;
-                    margin: 5px;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QFrame {
-                    background-color: rgba(0, 212, 170, 30);
-                    border: 1px solid rgba(0, 212, 170, 50);
-                    border-radius: 15px;
-                    padding: 10px;
-                    margin: 5px;
-                }
-            """)
-
-        layout = QVBoxLayout()
-
-        # Заголовок сообщения
-        header = QLabel("👤 Вы:" if is_user else "🤖 ВИЖН:")
-        header.setStyleSheet("""
-            QLabel {
-                color: #00d4aa;
-                font-weight: bold;
-                font-size: 12px;
-                margin-bottom: 5px;
-                background: transparent;
-                border: none;
-                padding: 0;
-            }
-        """)
+    MessageRole = Qt.UserRole + 1
 
-        # Текст сообщения
-        text_label = QLabel(message)
-        text_label.setWordWrap(True)
-        text_label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 14px;
-                line-height: 1.4;
-                background: transparent;
-                border: none;
-                padding: 0;
-            }
-        """)
-
-        # Время сообщения
-        if timestamp:
-            try:
-                dt = datetime.fromisoformat(timestamp)
-                time_str = dt.strftime("%H:%M:%S")
-            except:
-                time_str = datetime.now().strftime("%H:%M:%S")
-        else:
-            time_str = datetime.now().strftime("%H:%M:%S")
-
-        time_label = QLabel(time_str)
-        time_label.setStyleSheet("""
-            QLabel {
-                color: rgba(255, 255, 255, 100);
-                font-size: 10px;
-                background: transparent;
-                border: none;
-                padding: 0;
-                margin-top: 5px;
-            }
-        """)
-        time_label.setAlignment(Qt.AlignRight)
-
-        layout.addWidget(header)
-        layout.addWidget(text_label)
-        layout.addWidget(time_label)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.messages = []
 
-        self.setLayout(layout)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message.content
+        if role == self.MessageRole:
+            return message
+        return None
+
+    def append_message(self, message):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.messages.append(message)
+        self.endInsertRows()
+
+
+class ChatBubbleDelegate(QStyledItemDelegate):
+    """Рисует сообщение пузырём.
+
+    Вьюха запрашивает только видимые строки. Раскладка текста (QStaticText)
+    кэшируется по номеру сообщения для последних CACHE_SIZE строк, высоты -
+    для всех; при изменении ширины окна они пересчитываются.
+    """
+
+    CACHE_SIZE = 500
+    MAX_WIDTH = 600
+    MARGIN = 5
+    PADDING = 12
+    SPACING = 5
+    RADIUS = 15
+
+    USER_COLORS = (QColor(0, 123, 255, 30), QColor(0, 123, 255, 50))
+    AI_COLORS = (QColor(0, 212, 170, 30), QColor(0, 212, 170, 50))
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.layouts = OrderedDict()
+        self.heights = {}
+
+        self.header_font = QFont()
+        self.header_font.setPixelSize(12)
+        self.header_font.setBold(True)
+        self.text_font = QFont()
+        self.text_font.setPixelSize(14)
+        self.time_font = QFont()
+        self.time_font.setPixelSize(10)
+        self.header_height = QFontMetrics(self.header_font).height()
+        self.time_height = QFontMetrics(self.time_font).height()
+
+    def _bubble_width(self):
+        return max(100, min(self.view.viewport().width() - 2 * self.MARGIN, self.MAX_WIDTH))
+
+    def _text_layout(self, message, bubble_width):
+        """Разложенный текст сообщения для данной ширины пузыря"""
+        cached = self.layouts.get(message.seq)
+        if cached is not None and cached[0] == bubble_width:
+            self.layouts.move_to_end(message.seq)
+            return cached[1]
+
+        text = QStaticText(message.content)
+        text.setTextFormat(Qt.PlainText)
+        text.setTextWidth(bubble_width - 2 * self.PADDING)
+        text.prepare(QTransform(), self.text_font)
+
+        self.layouts[message.seq] = (bubble_width, text)
+        if len(self.layouts) > self.CACHE_SIZE:
+            self.layouts.popitem(last=False)
+        return text
+
+    def _height(self, message, bubble_width):
+        cached = self.heights.get(message.seq)
+        if cached is not None and cached[0] == bubble_width:
+            return cached[1]
+        text_height = self._text_layout(message, bubble_width).size().height()
+        height = int(2 * (self.MARGIN + self.PADDING) + self.header_height + text_height
+                     + 2 * self.SPACING + self.time_height + 0.999)
+        self.heights[message.seq] = (bubble_width, height)
+        return height
+
+    def sizeHint(self, option, index):
+        message = index.data(ChatModel.MessageRole)
+        bubble_width = self._bubble_width()
+        return QSize(bubble_width + 2 * self.MARGIN, self._height(message, bubble_width))
+
+    def paint(self, painter, option, index):
+        message = index.data(ChatModel.MessageRole)
+        is_user = message.role == 'user'
+        bubble_width = self._bubble_width()
+        text = self._text_layout(message, bubble_width)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        bubble = QRectF(option.rect.x() + self.MARGIN, option.rect.y() + self.MARGIN,
+                        bubble_width, option.rect.height() - 2 * self.MARGIN)
+        background, border = self.USER_COLORS if is_user else self.AI_COLORS
+        painter.setPen(QPen(border, 1))
+        painter.setBrush(QBrush(background))
+        painter.drawRoundedRect(bubble, self.RADIUS, self.RADIUS)
+
+        x = bubble.x() + self.PADDING
+        y = bubble.y() + self.PADDING
+        content_width = bubble_width - 2 * self.PADDING
+
+        painter.setFont(self.header_font)
+        painter.setPen(QColor("#00d4aa"))
+        painter.drawText(QRectF(x, y, content_width, self.header_height), Qt.AlignLeft | Qt.AlignVCenter,
+                         "👤 Вы:" if is_user else "🤖 ВИЖН:")
+        y += self.header_height + self.SPACING
+
+        painter.setFont(self.text_font)
+        painter.setPen(Qt.white)
+        painter.drawStaticText(QPointF(x, y), text)
+        y += text.size().height() + self.SPACING
+
+        painter.setFont(self.time_font)
+        painter.setPen(QColor(255, 255, 255, 100))
+        painter.drawText(QRectF(x, y, content_width, self.time_height), Qt.AlignRight | Qt.AlignVCenter,
+                         format_time(message.timestamp))
+
+        painter.restore()
+
+
+def format_time(timestamp):
+    """Время сообщения для подписи под пузырём"""
+    if timestamp:
+        try:
+            return datetime.fromisoformat(timestamp).strftime("%H:%M:%S")
+        except ValueError:
+            pass
+    return datetime.now().strftime("%H:%M:%S")
 
 
 class ChatWidget(QWidget):
     """Виджет чата"""
 
-    def __init__(self, parent=None):
+    def __init__(self, bridge, core, parent=None):
         super().__init__(parent)
-        self.messages = []
-        self.last_conversation_length = 0
+        self.bridge = bridge
+        self.core = core
+        # Номер последнего показанного сообщения журнала
+        self.last_seq = 0
 
         # Основной layout
         layout = QVBoxLayout()
@@ -187,11 +265,19 @@ class ChatWidget(QWidget):
 
         layout.addWidget(header)
 
-        # Область прокрутки для сообщений
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
+        # Список сообщений: рисуются только видимые строки
+        self.chat_model = ChatModel(self)
+        self.chat_view = QListView()
+        self.chat_view.setModel(self.chat_model)
+        self.chat_view.setItemDelegate(ChatBubbleDelegate(self.chat_view))
+        self.chat_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chat_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.chat_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.chat_view.setFocusPolicy(Qt.NoFocus)
+        self.chat_view.setLayoutMode(QListView.Batched)
+        self.chat_view.setBatchSize(200)
+        self.chat_view.setStyleSheet("""
+            QListView {
                 border: none;
                 background: transparent;
             }
@@ -205,15 +291,11 @@ class ChatWidget(QWidget):
                 border-radius: 4px;
             }
         """)
+        layout.addWidget(self.chat_view)
 
-        # Виджет для сообщений
-        self.messages_widget = QWidget()
-        self.messages_layout = QVBoxLayout(self.messages_widget)
-        self.messages_layout.setSpacing(5)
-        self.messages_layout.addStretch()
-
-        self.scroll_area.setWidget(self.messages_widget)
-        layout.addWidget(self.scroll_area)
+        self.follow_bottom = True
+        self.chat_view.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.chat_view.verticalScrollBar().rangeChanged.connect(self.on_scroll_range)
 
         # Панель ввода текста
         input_layout = QHBoxLayout()
@@ -279,10 +361,12 @@ class ChatWidget(QWidget):
 
         self.setLayout(layout)
 
-        # Таймер для обновления чата
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_chat)
-        self.timer.start(500)  # Обновляем каждые 0.5 секунды
+        # Сначала подписка, потом начальное чтение журнала - так ничего не потеряется
+        self.bridge.message_added.connect(self.on_message_added)
+        self.bridge.turn_started.connect(self.on_turn_started)
+        self.bridge.turn_finished.connect(self.on_turn_finished)
+        self.bridge.status_changed.connect(self.on_status_changed)
+        self.update_chat()
 
     def handle_key_press(self, event):
         """Обработка нажатия клавиш"""
@@ -302,70 +386,79 @@ class ChatWidget(QWidget):
         """Отправить сообщение"""
         text = self.text_input.toPlainText().strip()
         if text:
-            # Отправляем сообщение в отдельном потоке
-            threading.Thread(target=self.process_message, args=(text,), daemon=True).start()
+            # Ход выполнит планировщик основного процесса, ответ появится в истории
+            future = self.core.submit_user_input(text)
+            future.add_done_callback(self.on_message_processed)
             self.text_input.clear()
 
-    def process_message(self, text):
-        """Обработать сообщение"""
-        try:
-            process_user_input(text)
-        except Exception as e:
-            logging.error(f"Message processing error: {e}")
+    def on_message_processed(self, future):
+        """Завершение обработки сообщения (вызывается из потока планировщика)"""
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Message processing error: {future.exception()}")
 
-    def add_message(self, message, is_user=True, timestamp=None):
-        """Добавить сообщение в чат"""
-        chat_message = ChatMessage(message, is_user, timestamp)
+    def add_message(self, message):
+        """Добавить сообщение журнала в чат"""
+        self.chat_model.append_message(message)
 
-        # Добавляем перед stretch
-        self.messages_layout.insertWidget(self.messages_layout.count() - 1, chat_message)
+    def on_scroll(self, value):
+        self.follow_bottom = value >= self.chat_view.verticalScrollBar().maximum()
 
-        # Прокручиваем вниз
-        QTimer.singleShot(100, self.scroll_to_bottom)
-
-    def scroll_to_bottom(self):
-        """Прокрутить чат вниз"""
-        scrollbar = self.scroll_area.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+    def on_scroll_range(self, minimum, maximum):
+        """Чат растёт (в т.ч. пачками раскладки) - держим низ, если пользователь не листает историю"""
+        if self.follow_bottom:
+            self.chat_view.verticalScrollBar().setValue(maximum)
 
     def update_chat(self):
-        """Обновление чата"""
+        """Показать сообщения журнала, которых ещё нет в чате"""
         try:
-            conversation = get_conversation_history()
-
-            # Проверяем, есть ли новые сообщения
-            if len(conversation) > self.last_conversation_length:
-                # Добавляем новые сообщения
-                for msg in conversation[self.last_conversation_length:]:
-                    is_user = msg['role'] == 'user'
-                    timestamp = msg.get('timestamp')
-                    self.add_message(msg['content'], is_user, timestamp)
-
-                self.last_conversation_length = len(conversation)
-
-            # Обновляем статус
-            if is_running():
-                last_user = get_last_user_input()
-                last_ai = get_last_ai_response()
-
-                if last_user:
-                    self.status_label.setText("🎤 Обрабатываю...")
-                elif last_ai:
-                    self.status_label.setText("🤖 Отвечаю...")
-                else:
-                    self.status_label.setText("💤 Ожидаю...")
-            else:
-                self.status_label.setText("❌ Не активен")
-
+            for msg in self.core.get_conversation_since(self.last_seq):
+                self.on_message_added(msg)
         except Exception as e:
             logging.error(f"Chat update error: {e}")
 
+    def on_message_added(self, msg):
+        """Новое сообщение журнала"""
+        # Сообщение могло уже попасть в чат при начальном чтении
+        if msg.seq <= self.last_seq:
+            return
+        self.add_message(msg)
+        self.last_seq = msg.seq
+
+    def on_turn_started(self, text, source):
+        self.status_label.setText("🎤 Обрабатываю...")
+
+    def on_turn_finished(self, text, response):
+        self.status_label.setText("💤 Ожидаю...")
+
+    def on_status_changed(self, component, state):
+        if component == "system" and state == "stopped":
+            self.status_label.setText("❌ Не активен")
+        elif component == "speech" and state == "speaking":
+            self.status_label.setText("🤖 Отвечаю...")
+
 
 class StatusWidget(QWidget):
     """Виджет статуса системы"""
 
-    def __init__(self, parent=None):
+    CAMERA_STATES = {
+        "active": "📹 Камера: ✅ Активна",
+        "no_signal": "📹 Камера: ❌ Нет сигнала",
+        "unavailable": "📹 Камера: ❌ Недоступна",
+        "stopped": "📹 Камера: ⏹ Остановлена",
+    }
+    ASSISTANT_STATES = {
+        "ready": "🧠 ИИ: ✅ Готов",
+        "thinking": "🧠 ИИ: 💭 Думаю...",
+    }
+    SPEECH_STATES = {
+        "listening": "🎤 Речь: 👂 Слушаю...",
+        "speaking": "🎤 Речь: 🔊 Говорю...",
+        "idle": "🎤 Речь: Ожидание",
+    }
+
+    def __init__(self, bridge, parent=None):
         super().__init__(parent)
+        self.bridge = bridge
         self.setFixedHeight(120)
         self.setStyleSheet("""
             QWidget {
@@ -417,42 +510,37 @@ class StatusWidget(QWidget):
 
         self.setLayout(layout)
 
-        # Таймер для обновления статуса
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_status)
-        self.timer.start(1000)  # Обновляем каждую секунду
+        # Подписка, затем текущее состояние компонентов
+        self.bridge.status_changed.connect(self.update_status)
+        self.bridge.utterance_recognized.connect(self.on_utterance)
+        for component, state in self.bridge.bus.get_status().items():
+            self.update_status(component, state)
 
-    def update_status(self):
-        """Обновление статуса"""
-        try:
-            # Статус камеры
-            if vision_processor.running and vision_processor.get_current_frame() is not None:
-                self.camera_status.setText("📹 Камера: ✅ Активна")
-            else:
-                self.camera_status.setText("📹 Камера: ❌ Нет сигнала")
+    def update_status(self, component, state):
+        """Изменилось состояние компонента"""
+        if component == "camera":
+            self.camera_status.setText(self.CAMERA_STATES.get(state, f"📹 Камера: {state}"))
+        elif component == "assistant":
+            self.ai_status.setText(self.ASSISTANT_STATES.get(state, f"🧠 ИИ: {state}"))
+        elif component == "speech":
+            self.speech_status.setText(self.SPEECH_STATES.get(state, f"🎤 Речь: {state}"))
+        elif component == "system" and state == "stopped":
+            self.ai_status.setText("🧠 ИИ: ❌ Не активен")
 
-            # Статус ИИ
-            if is_running():
-                self.ai_status.setText("🧠 ИИ: ✅ Готов")
-            else:
-                self.ai_status.setText("🧠 ИИ: ❌ Не активен")
-
-            # Статус речи
-            last_input = get_last_user_input()
-            if last_input:
-                self.speech_status.setText(f"🎤 Речь: 📝 {last_input[:30]}...")
-            else:
-                self.speech_status.setText("🎤 Речь: 👂 Слушаю...")
-
-        except Exception as e:
-            logging.error(f"Status update error: {e}")
+    def on_utterance(self, text):
+        self.speech_status.setText(f"🎤 Речь: 📝 {text[:30]}...")
 
 
 class MainWindow(QMainWindow):
-    """Главное окно приложения"""
+    """Главное окно приложения.
 
-    def __init__(self):
+    core - модуль main (ядро в этом же процессе) или core_client.CoreClient
+    (ядро в отдельном процессе): event_bus, get_conversation_since, submit_user_input.
+    """
+
+    def __init__(self, core):
         super().__init__()
+        self.core = core
         self.setWindowTitle("VISION Robot Interface")
         self.setGeometry(100, 100, 1400, 900)
 
@@ -460,6 +548,11 @@ class MainWindow(QMainWindow):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
 
+        # События ядра -> сигналы Qt (вместо таймеров опроса в виджетах)
+        self.bridge = QtEventBridge(core.event_bus, self)
+        # Частота обновления в зависимости от видимости окна и активности пользователя
+        self.governor = RefreshGovernor(self)
+
         # Темная тема
         self.setStyleSheet("""
             QMainWindow {
@@ -498,10 +591,10 @@ class MainWindow(QMainWindow):
         camera_title.setAlignment(Qt.AlignCenter)
 
         # Камера
-        self.camera_widget = CameraWidget()
+        self.camera_widget = CameraWidget(self.bridge, self.governor)
 
         # Статус
-        self.status_widget = StatusWidget()
+        self.status_widget = StatusWidget(self.bridge)
 
         # Кнопки управления
         control_layout = QHBoxLayout()
@@ -550,12 +643,16 @@ class MainWindow(QMainWindow):
         left_layout.addStretch()
 
         # Правая панель (чат)
-        self.chat_widget = ChatWidget()
+        self.chat_widget = ChatWidget(self.bridge, core)
 
         # Добавляем панели в основной layout
         main_layout.addWidget(left_panel, 1)
         main_layout.addWidget(self.chat_widget, 2)
 
+    def get_refresh_rates(self):
+        """Текущая частота обновления интерфейса (для проверки регулятора)"""
+        return self.governor.get_refresh_rates()
+
     def emergency_stop(self):
         """Экстренная остановка"""
         reply = QMessageBox.question(self, 'Экстренная остановка',
@@ -598,27 +695,51 @@ class MainWindow(QMainWindow):
                                      QMessageBox.No)
 
         if reply == QMessageBox.Yes:
+            logging.info(f"GUI refresh stats: {self.get_refresh_rates()}")
+            self.governor.close()
+            self.bridge.close()
             event.accept()
         else:
             event.ignore()
 
 
-def main():
-    """Главная функция запуска интерфейса"""
-    app = QApplication(sys.argv)
+def create_window(core):
+    """Создать приложение Qt и главное окно (вызывать в главном потоке)"""
+    app = QApplication.instance() or QApplication(sys.argv)
 
     # Устанавливаем иконку приложения (если есть)
     app.setApplicationName("VISION Robot Interface")
     app.setApplicationVersion("1.0")
 
     # Создаем главное окно
-    window = MainWindow()
-    window.show()
+    window = MainWindow(core)
+    return app, window
 
-    # Запускаем приложение
+
+def run_window(app, window):
+    """Показать окно и запустить цикл событий Qt"""
+    window.show()
     sys.exit(app.exec_())
 
 
+def main(core=None):
+    """Главная функция запуска интерфейса.
+
+    Без core ядро (модуль main) загружается в этом же процессе; тогда
+    интерфейс сам запускает и останавливает планировщик ходов ядра.
+    """
+    if core is not None:
+        run_window(*create_window(core))
+        return
+
+    import main as core
+    core.turn_scheduler.start()
+    try:
+        run_window(*create_window(core))
+    finally:
+        core.turn_scheduler.stop()
+
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,142 @@
+# ipc.py
+"""
+Протокол связи ядра и интерфейса, работающих в разных процессах.
+Сообщения - словари msgpack с префиксом длины (4 байта, big-endian) поверх
+локального сокета (Unix-сокет, на Windows - TCP на 127.0.0.1).
+Кадры камеры по сокету не передаются: ядро пишет их в кольцо слотов
+в разделяемой памяти, а по сокету отправляет только номер слота.
+"""
+
+import socket
+import struct
+import logging
+
+import msgpack
+import numpy as np
+from multiprocessing import shared_memory
+
+from config import CORE_SOCKET_PATH, CORE_PORT
+
+LENGTH = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+def core_address():
+    """Семейство и адрес сокета ядра"""
+    if hasattr(socket, "AF_UNIX"):
+        return socket.AF_UNIX, CORE_SOCKET_PATH
+    return socket.AF_INET, ("127.0.0.1", CORE_PORT)
+
+
+def _default(value):
+    # numpy-скаляры и массивы из детекций
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def pack_message(message):
+    body = msgpack.packb(message, use_bin_type=True, default=_default)
+    return LENGTH.pack(len(body)) + body
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        try:
+            count = sock.recv_into(view[received:])
+        except socket.timeout:
+            # Таймаут сокета задан для отправки; чтение ждёт дальше, не теряя начатое сообщение
+            continue
+        if count == 0:
+            raise ConnectionError("Connection closed")
+        received += count
+    return buffer
+
+
+def recv_message(sock):
+    """Прочитать одно сообщение (блокирует)"""
+    (size,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+    if size > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Message too large: {size} bytes")
+    return msgpack.unpackb(_recv_exact(sock, size), raw=False)
+
+
+class SharedFrames:
+    """Кольцо кадров в разделяемой памяти.
+
+    У каждого слота заголовок [seq, высота, ширина, каналы]. Писатель
+    сбрасывает seq перед записью и ставит новый после, читатель сверяет
+    seq до и после копирования - так недописанный кадр не будет показан.
+    """
+
+    HEADER_ITEMS = 4
+
+    def __init__(self, name=None, slots=3, slot_bytes=1920 * 1080 * 3):
+        header_bytes = self.HEADER_ITEMS * 8
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.stride = header_bytes + slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.stride)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self._untrack()
+        self.name = self.shm.name
+        buffer = self.shm.buf
+        self.headers = [np.ndarray((self.HEADER_ITEMS,), dtype=np.int64, buffer=buffer, offset=i * self.stride)
+                        for i in range(slots)]
+        self.data = [np.ndarray((slot_bytes,), dtype=np.uint8, buffer=buffer, offset=i * self.stride + header_bytes)
+                     for i in range(slots)]
+        self.next_slot = 0
+        self.seq = 0
+
+    def _untrack(self):
+        # До Python 3.13 подключившийся процесс регистрирует сегмент в resource_tracker,
+        # и тот удаляет его при выходе интерфейса, хотя владелец - ядро
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+
+    def write(self, frame):
+        """Записать кадр (uint8); возвращает (slot, seq) или None, если кадр не помещается"""
+        if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+            return None
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        self.seq += 1
+        header = self.headers[slot]
+        header[0] = 0
+        shape = frame.shape + (1,) * (3 - frame.ndim)
+        self.data[slot][:frame.nbytes] = np.ascontiguousarray(frame).reshape(-1)
+        header[1:] = shape
+        header[0] = self.seq
+        return slot, self.seq
+
+    def read(self, slot, seq):
+        """Копия кадра из слота или None, если его уже перезаписали"""
+        header = self.headers[slot]
+        if header[0] != seq:
+            return None
+        height, width, channels = (int(v) for v in header[1:])
+        frame = self.data[slot][:height * width * channels].copy()
+        if header[0] != seq:
+            return None
+        return frame.reshape(height, width, channels)
+
+    def close(self):
+        self.headers = []
+        self.data = []
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except (OSError, BufferError) as e:
+            logging.debug(f"Shared frames close: {e}")
@@ -0,0 +1,157 @@
+# llm_cache.py
+"""
+Кэш ответов LLM: LRU в памяти + SQLite на диске, TTL на каждую запись.
+Ключ - дайджест модели, параметров, системного промпта и хвоста сообщений
+с нормализованным текстом (регистр, пунктуация, пробелы).
+"""
+
+import re
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+_punctuation_re = re.compile(r"[^\w\s]+")
+_spaces_re = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """Нормализовать текст для ключа кэша"""
+    text = text.lower().replace("ё", "е")
+    text = _punctuation_re.sub(" ", text)
+    return _spaces_re.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """Двухуровневый кэш ответов LLM"""
+
+    def __init__(self, db_path="llm_cache.sqlite3", max_memory_entries=256,
+                 default_ttl=3600, context_messages=1):
+        self.max_memory_entries = max_memory_entries
+        self.default_ttl = default_ttl
+        self.context_messages = context_messages
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+
+        # База открывается при первом обращении: импорт main не создаёт файлов
+        self.db_path = db_path
+        self.db = None
+
+    def _open(self):
+        """Открыть базу (вызывается под self.lock)"""
+        path, self.db_path = self.db_path, None
+        if not path:
+            return
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"LLM cache database error: {e}")
+            self.db = None
+
+    def make_key(self, model, params, messages):
+        """Построить ключ по модели, параметрам, системному промпту и хвосту диалога"""
+        system = [m['content'] for m in messages if m['role'] == 'system']
+        dialog = [m for m in messages if m['role'] != 'system'][-self.context_messages:]
+        payload = {
+            "model": model,
+            "params": sorted(params.items()),
+            "system": system,
+            "tail": [(m['role'], normalize_prompt(m['content'])) for m in dialog]
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Найти ответ в кэше; None, если нет или устарел"""
+        return self.get_any([key])
+
+    def get_any(self, keys):
+        """Первый найденный ответ по одному из ключей (один поиск в статистике)"""
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                response = self._lookup(key, now)
+                if response is not None:
+                    return response
+            self.stats["misses"] += 1
+            return None
+
+    def _lookup(self, key, now):
+        """Поиск по ключу в памяти, затем на диске (вызывается под self.lock)"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at >= now:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return response
+            del self.memory[key]
+
+        if self.db_path:
+            self._open()
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] >= now:
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+
+        return None
+
+    def put(self, key, response, ttl=None):
+        """Сохранить ответ с TTL (секунд)"""
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        with self.lock:
+            self._remember(key, response, expires_at)
+            self.stats["stores"] += 1
+            if self.db_path:
+                self._open()
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                        (key, response, expires_at)
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"LLM cache write error: {e}")
+
+    def bypass(self):
+        """Учесть запрос, который намеренно не кэшируется"""
+        with self.lock:
+            self.stats["bypassed"] += 1
+
+    def _remember(self, key, response, expires_at):
+        self.memory[key] = (response, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_stats(self):
+        """Статистика попаданий"""
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.db_path = None
+            if self.db is not None:
+                self.db.close()
+                self.db = None
@@ -0,0 +1,328 @@
+# llm_client.py
+"""
+Асинхронный клиент LLM (OpenAI-совместимый API) с ограничением параллелизма,
+дедлайнами запросов, токенами отмены и синхронным фасадом для старого кода.
+"""
+
+import time
+import json
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+from prompt_prefix import content_text
+
+
+def _client_error():
+    import aiohttp
+    return aiohttp.ClientError
+
+
+class LLMError(Exception):
+    """Базовая ошибка запроса к LLM"""
+
+
+class LLMCancelled(LLMError):
+    """Запрос отменён (перебит новым запросом или пользователем)"""
+
+
+class LLMTimeout(LLMError):
+    """Истёк дедлайн запроса"""
+
+
+class LLMHTTPError(LLMError):
+    """Сервер вернул код ошибки"""
+
+    def __init__(self, status, text=""):
+        super().__init__(f"HTTP {status}: {text[:200]}")
+        self.status = status
+        self.text = text
+
+
+class LLMResult:
+    """Результат запроса к LLM"""
+
+    __slots__ = ("text", "usage", "model", "latency", "provider")
+
+    def __init__(self, text, usage=None, model=None, latency=0.0, provider=None):
+        self.text = text
+        self.usage = usage or {}
+        self.model = model
+        self.latency = latency
+        # Имя провайдера маршрутизатора, давшего ответ
+        self.provider = provider
+
+
+class CancelToken:
+    """Токен отмены, который можно передать в несколько запросов"""
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """Отменить все запросы, связанные с токеном"""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Cancel callback error: {e}")
+
+    def add_callback(self, callback):
+        """Зарегистрировать функцию, вызываемую при отмене"""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class AsyncLLMClient:
+    """Асинхронный клиент для /chat/completions"""
+
+    def __init__(self, base_url, api_key, model, max_concurrency=2, timeout=30.0,
+                 extra_headers=None, default_params=None, prompt_prefix=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.extra_headers = extra_headers or {}
+        self.default_params = default_params or {}
+        # Заранее сериализованный системный префикс (PromptPrefix)
+        self.prompt_prefix = prompt_prefix
+        self._semaphore = None
+        self._session = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _headers(self):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        headers.update(self.extra_headers)
+        return headers
+
+    def _get_session(self):
+        # Сессия и семафор создаются внутри работающего цикла событий
+        if self._session is None or self._session.closed:
+            # aiohttp грузится при первом запросе, а не при импорте main
+            import aiohttp
+            self._session = aiohttp.ClientSession(headers=self._headers())
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _remaining(self, deadline):
+        """Сколько секунд осталось до дедлайна (не больше общего таймаута)"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeout("Deadline exceeded before request started")
+        return min(remaining, self.timeout)
+
+    async def complete(self, messages, *, token=None, deadline=None, **params):
+        """Выполнить запрос и вернуть LLMResult"""
+        if token is not None and token.cancelled:
+            raise LLMCancelled("Request cancelled before start")
+
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+
+        def on_cancel():
+            loop.call_soon_threadsafe(task.cancel)
+
+        if token is not None:
+            token.add_callback(on_cancel)
+        try:
+            return await asyncio.wait_for(
+                self._complete(messages, params),
+                timeout=self._remaining(deadline)
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeout("LLM request deadline exceeded") from None
+        except asyncio.CancelledError:
+            if token is not None and token.cancelled:
+                raise LLMCancelled("LLM request cancelled") from None
+            raise
+        finally:
+            if token is not None:
+                token.remove_callback(on_cancel)
+
+    async def _complete(self, messages, params):
+        session = self._get_session()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await self._request(session, messages, params)
+            result.latency = time.monotonic() - started
+            return result
+        except (_client_error(), json.JSONDecodeError, KeyError, IndexError) as e:
+            raise LLMError(f"LLM request failed: {e}") from e
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _request(self, session, messages, params):
+        """Запрос к OpenAI-совместимому /chat/completions"""
+        data = {"model": self.model, "messages": messages}
+        data.update(self.default_params)
+        data.update(params)
+
+        if self.prompt_prefix is not None:
+            body = self.prompt_prefix.encode_body(data)
+        else:
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+        async with session.post(f"{self.base_url}/chat/completions", data=body) as response:
+            if response.status != 200:
+                raise LLMHTTPError(response.status, await response.text())
+            result = await response.json(content_type=None)
+
+        return LLMResult(
+            text=result['choices'][0]['message']['content'],
+            usage=result.get('usage'),
+            model=result.get('model', self.model)
+        )
+
+    async def warm_up(self):
+        """Открыть соединение с провайдером заранее (DNS, TCP, TLS) - первый запрос его переиспользует"""
+        session = self._get_session()
+        async with session.get(f"{self.base_url}/models") as response:
+            # Статус не важен: после чтения ответа соединение остаётся в пуле
+            await response.read()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class GeminiClient(AsyncLLMClient):
+    """Асинхронный клиент Gemini (generateContent) с тем же интерфейсом"""
+
+    def _headers(self):
+        # Ключ Gemini передаётся параметром запроса, а не заголовком Authorization
+        headers = {"Content-Type": "application/json"}
+        headers.update(self.extra_headers)
+        return headers
+
+    @staticmethod
+    def _convert(messages):
+        """Перевести сообщения OpenAI-формата в формат Gemini"""
+        system = "\n".join(content_text(m['content']) for m in messages if m['role'] == 'system')
+        contents = [
+            {"role": "model" if m['role'] == 'assistant' else "user", "parts": [{"text": content_text(m['content'])}]}
+            for m in messages if m['role'] != 'system'
+        ]
+        body = {"contents": contents}
+        if system:
+            body["systemInstruction"] = {"parts": [{"text": system}]}
+        return body
+
+    async def _request(self, session, messages, params):
+        body = self._convert(messages)
+        merged = dict(self.default_params)
+        merged.update(params)
+        generation_config = {}
+        if "temperature" in merged:
+            generation_config["temperature"] = merged["temperature"]
+        if "max_tokens" in merged:
+            generation_config["maxOutputTokens"] = merged["max_tokens"]
+        if generation_config:
+            body["generationConfig"] = generation_config
+
+        url = f"{self.base_url}/models/{self.model}:generateContent"
+        async with session.post(url, params={"key": self.api_key}, json=body) as response:
+            if response.status != 200:
+                raise LLMHTTPError(response.status, await response.text())
+            result = await response.json(content_type=None)
+
+        usage = result.get("usageMetadata", {})
+        return LLMResult(
+            text="".join(p.get("text", "") for p in result['candidates'][0]['content']['parts']),
+            usage={
+                "prompt_tokens": usage.get("promptTokenCount", 0),
+                "completion_tokens": usage.get("candidatesTokenCount", 0),
+                "prompt_tokens_details": {"cached_tokens": usage.get("cachedContentTokenCount", 0)}
+            },
+            model=self.model
+        )
+
+
+class LLMClient:
+    """Синхронный фасад: цикл событий работает в отдельном потоке"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._loop = asyncio.new_event_loop()
+        # Поток цикла запускается первым запросом - импорт main не создаёт потоков
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, name="llm-client", daemon=True)
+                self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, messages, token=None, deadline=None, **params):
+        """Отправить запрос, не блокируясь; возвращает concurrent.futures.Future"""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self.backend.complete(messages, token=token, deadline=deadline, **params),
+            self._loop
+        )
+
+    def complete(self, messages, token=None, timeout=None, **params):
+        """Выполнить запрос синхронно и вернуть LLMResult"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        future = self.submit(messages, token=token, deadline=deadline, **params)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise LLMCancelled("LLM request cancelled") from None
+
+    def warm_up(self, timeout=None):
+        """Прогреть соединения бэкенда (блокирует до timeout секунд)"""
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.backend.warm_up(), self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise LLMTimeout("LLM warm-up timed out") from None
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.backend.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
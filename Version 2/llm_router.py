@@ -0,0 +1,330 @@
+# llm_router.py
+"""
+Маршрутизатор запросов между несколькими провайдерами LLM.
+Выбирает самого быстрого здорового провайдера по скользящей гистограмме
+задержек, дублирует запрос (hedging), если основной отвечает дольше своего p90,
+и быстро отказывает через circuit breaker вместо ожидания полного таймаута.
+
+Демонстрация на локальных моках: python llm_router.py
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+
+from llm_client import AsyncLLMClient, GeminiClient, LLMError, LLMCancelled, LLMTimeout
+
+
+class LatencyHistogram:
+    """Скользящее окно задержек и частоты ошибок провайдера"""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record(self, latency, ok):
+        if ok:
+            self.latencies.append(latency)
+        self.outcomes.append(ok)
+
+    def percentile(self, p):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+
+class CircuitBreaker:
+    """Автомат защиты: closed -> open после серии ошибок -> half_open через паузу.
+
+    В half_open пропускается ровно один пробный запрос; остальные ждут его исхода.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+
+    def available(self):
+        """Можно ли сейчас отправить запрос (без смены состояния - для сортировки)"""
+        if self.state == "closed":
+            return True
+        if self.probing:
+            return False
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def allow(self):
+        """Занять право на запрос перед его отправкой; после паузы - единственный пробный"""
+        if self.state == "closed":
+            return True
+        if not self.available():
+            return False
+        self.state = "half_open"
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def record_cancel(self):
+        """Запрос отменён до ответа: пробный запрос ничего не показал, пробуем снова"""
+        if self.probing:
+            self.probing = False
+            self.state = "open"
+
+
+class Provider:
+    """Провайдер LLM со своей статистикой"""
+
+    def __init__(self, name, backend, window=50, failure_threshold=3, reset_timeout=30.0,
+                 fallback_only=False):
+        self.name = name
+        self.backend = backend
+        # Резервный провайдер (например, локальная модель) - только когда остальные недоступны
+        self.fallback_only = fallback_only
+        self.histogram = LatencyHistogram(window)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.requests = 0
+        self.hedges = 0
+
+    def score(self):
+        """Оценка для сортировки: медианная задержка со штрафом за ошибки"""
+        p50 = self.histogram.percentile(50)
+        if p50 is None:
+            # Неизмеренного провайдера пробуем в первую очередь
+            return 0.0
+        return p50 * (1.0 + 4.0 * self.histogram.error_rate)
+
+    def stats(self):
+        return {
+            "p50": self.histogram.percentile(50),
+            "p90": self.histogram.percentile(90),
+            "error_rate": self.histogram.error_rate,
+            "state": self.breaker.state,
+            "requests": self.requests,
+            "hedges": self.hedges
+        }
+
+
+def create_backend(config, max_concurrency=2, timeout=30.0, default_params=None, extra_headers=None,
+                   prompt_prefix=None):
+    """Создать клиента по описанию провайдера из config.LLM_PROVIDERS"""
+    kind = config.get("type", "openai")
+    if kind == "openai":
+        return AsyncLLMClient(config["base_url"], config["api_key"], config["model"],
+                              max_concurrency=max_concurrency, timeout=timeout,
+                              extra_headers=extra_headers, default_params=default_params,
+                              prompt_prefix=prompt_prefix)
+    if kind == "gemini":
+        return GeminiClient(config["base_url"], config["api_key"], config["model"],
+                            max_concurrency=max_concurrency, timeout=timeout,
+                            default_params=default_params)
+    if kind == "local":
+        from local_llm import LocalLLMEngine
+        return LocalLLMEngine(config["model_path"], n_threads=config.get("n_threads", 4),
+                              n_ctx=config.get("n_ctx", 2048),
+                              prefix_cache_mb=config.get("prefix_cache_mb", 256),
+                              default_params=default_params,
+                              prefix_messages=prompt_prefix.messages if prompt_prefix else None)
+    raise ValueError(f"Unknown LLM provider type: {kind}")
+
+
+class LLMRouter:
+    """Маршрутизатор с интерфейсом AsyncLLMClient.complete"""
+
+    def __init__(self, providers, hedging=True, hedge_min_samples=10, timeout=None):
+        self.providers = providers
+        self.hedging = hedging
+        self.hedge_min_samples = hedge_min_samples
+        # Общий бюджет запроса на все попытки, включая переключение и дубли
+        self.timeout = timeout
+
+    def ranked(self):
+        """Здоровые провайдеры, от самого быстрого"""
+        healthy = [p for p in self.providers if p.breaker.available()]
+        return sorted(healthy, key=lambda p: (p.fallback_only, p.score()))
+
+    def hedge_delay(self, provider):
+        """Через сколько секунд дублировать запрос (p90 основного провайдера)"""
+        if not self.hedging or len(provider.histogram.latencies) < self.hedge_min_samples:
+            return None
+        return provider.histogram.percentile(90)
+
+    async def _attempt(self, provider, messages, deadline, params):
+        if deadline is not None and deadline <= time.monotonic():
+            # Время запроса вышло - провайдера не пробуем и ошибку ему не засчитываем
+            raise LLMTimeout("LLM request deadline exceeded")
+        if not provider.breaker.allow():
+            # Пробный запрос к этому провайдеру уже отправлен параллельным ходом
+            raise LLMError(f"LLM provider '{provider.name}' is unavailable (circuit open)")
+        provider.requests += 1
+        started = time.monotonic()
+        try:
+            result = await provider.backend.complete(messages, deadline=deadline, **params)
+        except asyncio.CancelledError:
+            # Проигравший дубль отменён - не считаем это ошибкой провайдера
+            provider.breaker.record_cancel()
+            raise
+        except LLMError as e:
+            provider.histogram.record(time.monotonic() - started, False)
+            provider.breaker.record_failure()
+            logging.warning(f"LLM provider '{provider.name}' failed: {e}")
+            raise
+        except Exception:
+            # Непредвиденная ошибка не должна оставить пробный слот занятым
+            provider.breaker.record_failure()
+            raise
+        provider.histogram.record(time.monotonic() - started, True)
+        provider.breaker.record_success()
+        result.provider = provider.name
+        return result
+
+    async def complete(self, messages, *, token=None, deadline=None, **params):
+        """Выполнить запрос через самого быстрого провайдера с переключением при ошибках"""
+        if token is not None and token.cancelled:
+            raise LLMCancelled("Request cancelled before start")
+
+        # Один дедлайн на весь запрос: каждая попытка и дубль получают только
+        # оставшееся время, а медленный провайдер получает ошибку по таймауту
+        if self.timeout is not None:
+            budget = time.monotonic() + self.timeout
+            deadline = budget if deadline is None else min(deadline, budget)
+
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+
+        def on_cancel():
+            loop.call_soon_threadsafe(task.cancel)
+
+        if token is not None:
+            token.add_callback(on_cancel)
+        try:
+            return await self._route(messages, deadline, params)
+        except asyncio.CancelledError:
+            if token is not None and token.cancelled:
+                raise LLMCancelled("LLM request cancelled") from None
+            raise
+        finally:
+            if token is not None:
+                token.remove_callback(on_cancel)
+
+    async def _route(self, messages, deadline, params):
+        candidates = self.ranked()
+        if not candidates:
+            raise LLMError("All LLM providers are unavailable (circuit open)")
+
+        last_error = None
+        pending = set()
+        try:
+            while candidates or pending:
+                if not pending:
+                    primary = candidates.pop(0)
+                    pending.add(asyncio.ensure_future(self._attempt(primary, messages, deadline, params)))
+                    # Резервный провайдер дублем не нагружаем
+                    hedge_allowed = candidates and not candidates[0].fallback_only
+                    wait_time = self.hedge_delay(primary) if hedge_allowed else None
+                else:
+                    wait_time = None
+
+                done, pending = await asyncio.wait(pending, timeout=wait_time,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Основной провайдер медленнее своего p90 - дублируем запрос
+                    backup = candidates.pop(0)
+                    backup.hedges += 1
+                    logging.info(f"Hedging LLM request to '{backup.name}'")
+                    pending.add(asyncio.ensure_future(self._attempt(backup, messages, deadline, params)))
+                    continue
+
+                for finished in done:
+                    try:
+                        return finished.result()
+                    except LLMError as e:
+                        last_error = e
+        finally:
+            for leftover in pending:
+                leftover.cancel()
+
+        raise last_error or LLMError("LLM request failed")
+
+    async def warm_up(self):
+        """Прогреть соединения всех сетевых провайдеров параллельно; возвращает число прогретых"""
+        backends = [p.backend for p in self.providers if hasattr(p.backend, "warm_up")]
+        results = await asyncio.gather(*(backend.warm_up() for backend in backends), return_exceptions=True)
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                logging.warning(f"LLM warm-up failed for {backend.base_url}: {result}")
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    def get_stats(self):
+        return {p.name: p.stats() for p in self.providers}
+
+    async def close(self):
+        for provider in self.providers:
+            await provider.backend.close()
+
+
+def main():
+    """Демонстрация: быстрый, медленный и нестабильный моки"""
+    from mock_llm_server import MockLLMServer
+    from llm_client import LLMClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    servers = [
+        MockLLMServer(port=8801, delay=0.2, jitter=0.15, name="fast").start(),
+        MockLLMServer(port=8802, delay=0.6, jitter=0.1, name="slow").start(),
+        MockLLMServer(port=8803, delay=0.1, fail_rate=0.7, name="flaky").start(),
+    ]
+    providers = [
+        Provider(s.name, AsyncLLMClient(s.base_url, "mock", "mock-model", timeout=5), reset_timeout=5)
+        for s in servers
+    ]
+    client = LLMClient(LLMRouter(providers, hedge_min_samples=5, timeout=5))
+
+    messages = [{"role": "user", "content": "Привет"}]
+    winners = {}
+    started = time.monotonic()
+    for _ in range(40):
+        try:
+            result = client.complete(messages)
+            winner = result.text.split("]")[0].strip("[")
+            winners[winner] = winners.get(winner, 0) + 1
+        except LLMError as e:
+            winners["error"] = winners.get("error", 0) + 1
+            logging.error(f"Request failed: {e}")
+    elapsed = time.monotonic() - started
+
+    print(f"\n40 запросов за {elapsed:.1f} с, ответили: {winners}")
+    for name, stats in client.backend.get_stats().items():
+        p50 = f"{stats['p50'] * 1000:.0f}" if stats['p50'] is not None else "-"
+        p90 = f"{stats['p90'] * 1000:.0f}" if stats['p90'] is not None else "-"
+        print(f"  {name:6s} p50={p50} мс p90={p90} мс errors={stats['error_rate']:.0%} "
+              f"state={stats['state']} requests={stats['requests']} hedges={stats['hedges']}")
+
+    client.close()
+    for server in servers:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# load_test.py
+"""
+Нагрузочный тест пути LLM на локальном моке (без расхода API-кредитов).
+N параллельных сессий по очереди отправляют запросы; в конце выводятся
+пропускная способность, перцентили задержки, переиспользование соединений
+и исходы запросов (успех, 429, 500, таймаут, отмена).
+
+Режимы:
+  client   - сессии вызывают LLMClient.complete напрямую
+             (--api gemini - через GeminiClient и маршрут generateContent)
+  pipeline - сессии отправляют ввод через main.submit_user_input, как интерфейс:
+             ходы идут по одному через планировщик, одновременный ввод
+             объединяется (синтез речи отключён)
+  stream   - потоковые запросы (stream=true), время до первого чанка
+
+Запуск: python load_test.py --mode client --sessions 8 --turns 20
+        python load_test.py --mode client --api gemini
+        python load_test.py --mode pipeline --sessions 4 --max-rps 10
+        python load_test.py --mode stream --distribution lognormal --jitter 0.5
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from mock_llm_server import MockLLMServer, DISTRIBUTIONS
+from llm_client import AsyncLLMClient, GeminiClient, LLMClient, LLMCancelled, LLMTimeout, LLMHTTPError
+
+# Ответы-заглушки call_deepseek_api при ошибке API
+FALLBACK_PREFIX = "Извините"
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadStats:
+    """Задержки и исходы запросов из всех сессий"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.first_chunk = []
+        self.outcomes = {}
+
+    def record(self, outcome, latency, first_chunk=None):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if outcome == "ok":
+                self.latencies.append(latency)
+                if first_chunk is not None:
+                    self.first_chunk.append(first_chunk)
+
+    def report(self, elapsed, server_stats):
+        total = sum(self.outcomes.values())
+        ok = self.outcomes.get("ok", 0)
+        lines = [
+            f"Запросов: {total} за {elapsed:.1f} с, успешных {ok} "
+            f"({ok / elapsed:.1f} ответов/с)",
+            "Задержка, мс: " + " ".join(
+                f"p{p}={percentile(self.latencies, p) * 1000:.0f}" if self.latencies else f"p{p}=-"
+                for p in (50, 90, 99)
+            )
+        ]
+        if self.first_chunk:
+            lines.append("Первый чанк, мс: " + " ".join(
+                f"p{p}={percentile(self.first_chunk, p) * 1000:.0f}" for p in (50, 90, 99)
+            ))
+        lines.append(f"Исходы: {self.outcomes}")
+
+        requests = server_stats["requests"]
+        connections = server_stats["connections"]
+        reuse = 1.0 - connections / requests if requests else 0.0
+        lines.append(f"Сервер: {requests} запросов, {connections} TCP-соединений "
+                     f"(переиспользование {reuse:.0%}), коды ответов {server_stats['statuses']}")
+        return "\n".join(lines)
+
+
+def classify_error(error):
+    if isinstance(error, LLMHTTPError):
+        return f"http_{error.status}"
+    if isinstance(error, LLMTimeout):
+        return "timeout"
+    if isinstance(error, LLMCancelled):
+        return "cancelled"
+    if isinstance(error, queue.Full):
+        return "queue_full"
+    return "error"
+
+
+def run_sessions(session_fn, sessions, turns, stats):
+    """Запустить session_fn(session_id, turn) в N потоках, по turns раз каждую"""
+
+    def run(session_id):
+        for turn in range(turns):
+            session_fn(session_id, turn, stats)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(run, range(sessions)))
+    return time.monotonic() - started
+
+
+def client_mode(args, server, stats):
+    """LLMClient.complete из N потоков"""
+    if args.api == "gemini":
+        backend = GeminiClient(server.gemini_base_url, "mock", "mock-model",
+                               max_concurrency=args.concurrency, timeout=args.timeout)
+    else:
+        backend = AsyncLLMClient(server.base_url, "mock", "mock-model",
+                                 max_concurrency=args.concurrency, timeout=args.timeout)
+    client = LLMClient(backend)
+
+    def session(session_id, turn, stats):
+        messages = [
+            {"role": "system", "content": "Ты робот ВИЖН."},
+            {"role": "user", "content": f"Сессия {session_id}, вопрос {turn}"}
+        ]
+        started = time.monotonic()
+        try:
+            client.complete(messages)
+        except Exception as e:
+            stats.record(classify_error(e), time.monotonic() - started)
+        else:
+            stats.record("ok", time.monotonic() - started)
+
+    try:
+        return run_sessions(session, args.sessions, args.turns, stats)
+    finally:
+        client.close()
+
+
+def pipeline_mode(args, server, stats):
+    """Ввод N сессий через планировщик ходов main (кэш, намерения и речь отключены)"""
+    # Провайдеры main читаются из окружения при импорте config
+    os.environ["LLM_PROVIDERS_JSON"] = json.dumps([{
+        "name": server.name, "type": "openai", "base_url": server.base_url,
+        "api_key": "mock", "model": "mock-model"
+    }])
+    import main
+    main.speak = lambda text: None
+    main.response_cache = None
+    main.intent_router = None
+    main.turn_scheduler.start()
+
+    def session(session_id, turn, stats):
+        started = time.monotonic()
+        try:
+            # Тот же путь, что у интерфейса: очередь ходов, а не прямой вызов из потока
+            response = main.submit_user_input(f"Сессия {session_id}, вопрос {turn}").result()
+        except Exception as e:
+            stats.record(classify_error(e), time.monotonic() - started)
+            return
+        if response is None:
+            # Запрос перебит (например, пользователь заговорил)
+            stats.record("cancelled", time.monotonic() - started)
+        elif response.startswith(FALLBACK_PREFIX):
+            stats.record("fallback_reply", time.monotonic() - started)
+        else:
+            stats.record("ok", time.monotonic() - started)
+
+    try:
+        return run_sessions(session, args.sessions, args.turns, stats)
+    finally:
+        main.turn_scheduler.stop()
+        print(f"Планировщик ходов: {main.get_turn_stats()}")
+        main.llm_client.close()
+
+
+def stream_mode(args, server, stats):
+    """Потоковые запросы по одной сессии aiohttp: полное время и время до первого чанка"""
+
+    async def session(http, session_id):
+        for turn in range(args.turns):
+            data = {
+                "model": "mock-model",
+                "stream": True,
+                "messages": [{"role": "user", "content": f"Сессия {session_id}, вопрос {turn}"}]
+            }
+            started = time.monotonic()
+            first_chunk = None
+            try:
+                async with http.post(f"{server.base_url}/chat/completions", json=data) as response:
+                    if response.status != 200:
+                        stats.record(f"http_{response.status}", time.monotonic() - started)
+                        await response.read()
+                        continue
+                    async for line in response.content:
+                        if first_chunk is None and line.startswith(b"data:"):
+                            first_chunk = time.monotonic() - started
+                        if line.strip() == b"data: [DONE]":
+                            break
+            except asyncio.TimeoutError:
+                stats.record("timeout", time.monotonic() - started)
+            except aiohttp.ClientError:
+                stats.record("error", time.monotonic() - started)
+            else:
+                stats.record("ok", time.monotonic() - started, first_chunk)
+
+    async def run():
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+            await asyncio.gather(*(session(http, i) for i in range(args.sessions)))
+
+    started = time.monotonic()
+    asyncio.run(run())
+    return time.monotonic() - started
+
+
+MODES = {
+    "client": client_mode,
+    "pipeline": pipeline_mode,
+    "stream": stream_mode
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест пути LLM на локальном моке")
+    parser.add_argument("--mode", choices=MODES, default="client")
+    parser.add_argument("--api", choices=("openai", "gemini"), default="openai",
+                        help="API клиента в режиме client")
+    parser.add_argument("--sessions", type=int, default=8, help="число параллельных сессий")
+    parser.add_argument("--turns", type=int, default=10, help="запросов на сессию")
+    parser.add_argument("--concurrency", type=int, default=4, help="лимит параллельных запросов клиента")
+    parser.add_argument("--timeout", type=float, default=10.0, help="таймаут запроса, сек")
+    parser.add_argument("--port", type=int, default=8810)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="доля ответов 429 (инъекция отказов: Retry-After не выполняется)")
+    parser.add_argument("--max-rps", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockLLMServer(port=args.port, delay=args.delay, jitter=args.jitter, fail_rate=args.fail_rate,
+                           name="load", distribution=args.distribution,
+                           rate_limit_rate=args.rate_limit_rate, max_rps=args.max_rps).start()
+    stats = LoadStats()
+    try:
+        elapsed = MODES[args.mode](args, server, stats)
+        print(f"\nРежим {args.mode}: {args.sessions} сессий x {args.turns} запросов")
+        print(stats.report(elapsed, server.get_stats()))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# local_llm.py
+"""
+Локальный CPU-бэкенд LLM на llama.cpp (модели GGUF) для работы без сети.
+Модель загружается один раз и остаётся в памяти; состояние после фиксированного
+системного префикса кэшируется (KV-cache), поэтому каждый ход досчитывает только хвост.
+
+Интерфейс совпадает с AsyncLLMClient.complete, поэтому движок подключается
+к LLMRouter как обычный провайдер.
+
+Бенчмарк: python local_llm.py path/to/model.gguf --threads 4
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import LLMError, LLMCancelled, LLMTimeout, LLMResult
+from prompt_prefix import content_text
+
+try:
+    from llama_cpp import Llama, LlamaRAMCache
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+
+
+class LocalLLMEngine:
+    """Резидентная локальная модель с потоковой генерацией"""
+
+    def __init__(self, model_path, n_threads=4, n_ctx=2048, prefix_cache_mb=256,
+                 default_params=None, prefix_messages=None):
+        self.model_path = model_path
+        self.n_threads = n_threads
+        self.n_ctx = n_ctx
+        self.prefix_cache_mb = prefix_cache_mb
+        self.default_params = default_params or {}
+        self.prefix_messages = list(prefix_messages or [])
+        self.model = None
+        self.load_lock = threading.Lock()
+        # Модель не потокобезопасна: генерация строго по одному запросу
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-llm")
+
+    def load(self):
+        """Загрузить модель (один раз) и прогреть кэш системного префикса"""
+        with self.load_lock:
+            if self.model is not None:
+                return self.model
+            if not LLAMA_CPP_AVAILABLE:
+                raise LLMError("llama-cpp-python is not installed")
+
+            started = time.monotonic()
+            try:
+                model = Llama(
+                    model_path=self.model_path,
+                    n_ctx=self.n_ctx,
+                    n_threads=self.n_threads,
+                    verbose=False
+                )
+            except Exception as e:
+                raise LLMError(f"Failed to load local model {self.model_path}: {e}") from e
+            model.set_cache(LlamaRAMCache(capacity_bytes=self.prefix_cache_mb * 1024 * 1024))
+            logging.info(f"Local LLM loaded in {time.monotonic() - started:.1f}s "
+                         f"({self.model_path}, {self.n_threads} threads)")
+
+            if self.prefix_messages:
+                # Прогон префикса кладёт его KV-состояние в кэш; дальше совпадающий
+                # префикс промпта не пересчитывается
+                started = time.monotonic()
+                prefix = [{"role": m['role'], "content": content_text(m['content'])}
+                          for m in self.prefix_messages]
+                model.create_chat_completion(
+                    messages=prefix + [{"role": "user", "content": ""}],
+                    max_tokens=1
+                )
+                logging.info(f"Local LLM prefix cached in {time.monotonic() - started:.1f}s")
+
+            self.model = model
+            return model
+
+    def stream(self, messages, cancel_event=None, deadline=None, **params):
+        """Синхронный генератор фрагментов текста (вызывать из рабочего потока)"""
+        model = self.load()
+        merged = dict(self.default_params)
+        merged.update(params)
+
+        # Шаблоны чата llama.cpp ожидают текст, а не список частей
+        messages = [{"role": m['role'], "content": content_text(m['content'])} for m in messages]
+        chunks = model.create_chat_completion(
+            messages=messages,
+            stream=True,
+            temperature=merged.get("temperature", 0.7),
+            max_tokens=merged.get("max_tokens", 256)
+        )
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelled("Local generation cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                raise LLMTimeout("Local generation deadline exceeded")
+            delta = chunk['choices'][0].get('delta', {}).get('content')
+            if delta:
+                yield delta
+
+    def _generate(self, messages, cancel_event, deadline, params):
+        if cancel_event is not None and cancel_event.is_set():
+            raise LLMCancelled("Local generation cancelled before start")
+        started = time.monotonic()
+        first_token_at = None
+        parts = []
+        for delta in self.stream(messages, cancel_event, deadline, **params):
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            parts.append(delta)
+
+        finished = time.monotonic()
+        return LLMResult(
+            text="".join(parts).strip(),
+            usage={
+                "completion_tokens": len(parts),
+                "time_to_first_token": (first_token_at or finished) - started
+            },
+            model=self.model_path,
+            latency=finished - started
+        )
+
+    async def complete(self, messages, *, token=None, deadline=None, **params):
+        """Асинхронный вызов с тем же интерфейсом, что у AsyncLLMClient"""
+        if token is not None and token.cancelled:
+            raise LLMCancelled("Request cancelled before start")
+
+        cancel_event = threading.Event()
+        if token is not None:
+            token.add_callback(cancel_event.set)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, self._generate, messages, cancel_event, deadline, params
+            )
+        except asyncio.CancelledError:
+            # Останавливаем генерацию в рабочем потоке (проигравший дубль, отмена)
+            cancel_event.set()
+            raise
+        finally:
+            if token is not None:
+                token.remove_callback(cancel_event.set)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    """Бенчмарк: время до первого токена и скорость генерации"""
+    parser = argparse.ArgumentParser(description="Бенчмарк локальной LLM")
+    parser.add_argument("model_path")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ctx", type=int, default=2048)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from config import SYSTEM_PROMPTS
+
+    prefix = [{"role": "system", "content": SYSTEM_PROMPTS["main"]}]
+    engine = LocalLLMEngine(args.model_path, n_threads=args.threads, n_ctx=args.ctx, prefix_messages=prefix)
+    engine.load()
+
+    questions = ["Привет! Как дела?", "Расскажи что-нибудь интересное.", "Что ты умеешь?",
+                 "Какая сегодня погода?", "Посоветуй книгу."]
+    ttfts = []
+    speeds = []
+    for i in range(args.runs):
+        messages = prefix + [{"role": "user", "content": questions[i % len(questions)]}]
+        result = engine._generate(messages, None, None, {"max_tokens": args.max_tokens})
+        ttft = result.usage["time_to_first_token"]
+        generation_time = max(result.latency - ttft, 1e-6)
+        speed = result.usage["completion_tokens"] / generation_time
+        ttfts.append(ttft)
+        speeds.append(speed)
+        print(f"run {i + 1}: TTFT {ttft * 1000:.0f} мс, {result.usage['completion_tokens']} токенов, "
+              f"{speed:.1f} ток/с")
+
+    print(f"\nСреднее: TTFT {sum(ttfts) / len(ttfts) * 1000:.0f} мс, "
+          f"{sum(speeds) / len(speeds):.1f} ток/с ({args.threads} потоков)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# long_term_memory.py
+"""
+Долговременная память ассистента: прошлые реплики и факты о пользователе
+хранятся как векторы в одной непрерывной матрице NumPy (на диске - memmap)
+и извлекаются по косинусной близости к текущему запросу.
+
+Эмбеддинги считает небольшая локальная модель sentence-transformers, если она
+установлена, иначе - хэширование символьных n-грамм (без зависимостей).
+Для больших объёмов есть приближённый индекс IVF (k-means по центроидам).
+
+Бенчмарк: python long_term_memory.py --items 100000 --dim 384
+"""
+
+import os
+import json
+import time
+import zlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+from llm_cache import normalize_prompt
+
+KINDS = {"turn": 0, "fact": 1}
+
+
+class HashingEmbedder:
+    """Эмбеддинг хэшированием слов и символьных триграмм (детерминированный)"""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        normalized = normalize_prompt(text)
+        padded = f" {normalized} "
+        features = normalized.split()
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+
+class SentenceEmbedder:
+    """Локальная модель sentence-transformers на CPU"""
+
+    def __init__(self, model_name):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+def create_embedder(model_name=None, dim=256):
+    """Модель эмбеддингов, если доступна, иначе хэширующий эмбеддер"""
+    if model_name and SENTENCE_TRANSFORMERS_AVAILABLE:
+        try:
+            return SentenceEmbedder(model_name)
+        except Exception as e:
+            logging.error(f"Failed to load embedding model {model_name}: {e}")
+    elif model_name:
+        logging.warning("sentence-transformers not installed, using hashing embeddings")
+    return HashingEmbedder(dim)
+
+
+class IVFIndex:
+    """Приближённый поиск: векторы разбиты на списки по ближайшему центроиду"""
+
+    def __init__(self, nprobe=8, iterations=8, sample_size=20000):
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.centroids = None
+        self.lists = []
+
+    def build(self, vectors):
+        count = len(vectors)
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(count, min(count, self.sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        # Сферический k-means на выборке
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-9)
+        self.centroids = centroids
+
+        assignment = self._assign(vectors)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    def _assign(self, vectors, batch=8192):
+        return np.concatenate([np.argmax(vectors[i:i + batch] @ self.centroids.T, axis=1)
+                               for i in range(0, len(vectors), batch)])
+
+    def add(self, index, vector):
+        c = int(np.argmax(self.centroids @ vector))
+        self.lists[c] = np.append(self.lists[c], index)
+
+    def candidates(self, query):
+        probe = np.argpartition(-(self.centroids @ query), min(self.nprobe, len(self.centroids)) - 1)
+        return np.concatenate([self.lists[c] for c in probe[:self.nprobe]])
+
+
+class LongTermMemory:
+    """Векторная память с точным поиском и опциональным IVF-индексом"""
+
+    def __init__(self, embedder, path=None, initial_capacity=1024, ann_min_items=20000, nprobe=8):
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.path = path
+        self.ann_min_items = ann_min_items
+        self.nprobe = nprobe
+        self.lock = threading.Lock()
+        self.count = 0
+        self.items = []
+        self.facts = set()
+        self.kinds = np.zeros(initial_capacity, dtype=np.uint8)
+        self.vectors = None
+        self.index = None
+        # Эмбеддинг новых записей - в фоне, вне хода диалога
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+        self.stats = {"searches": 0, "search_time": 0.0, "ann_searches": 0}
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load(initial_capacity)
+        else:
+            self.vectors = np.zeros((initial_capacity, self.dim), dtype=np.float32)
+
+    # --- хранение ---
+
+    def _files(self):
+        return (os.path.join(self.path, "vectors.f32"), os.path.join(self.path, "items.jsonl"),
+                os.path.join(self.path, "meta.json"))
+
+    def _load(self, initial_capacity):
+        vectors_file, items_file, meta_file = self._files()
+        meta = {}
+        if os.path.exists(meta_file):
+            with open(meta_file, encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.dim:
+            if meta:
+                logging.warning("Embedding model changed, long-term memory is reset")
+            for file in (vectors_file, items_file):
+                if os.path.exists(file):
+                    os.remove(file)
+            with open(meta_file, "w", encoding="utf-8") as f:
+                json.dump({"embedder": self.embedder.name, "dim": self.dim}, f)
+
+        if os.path.exists(items_file):
+            with open(items_file, encoding="utf-8") as f:
+                self.items = [json.loads(line) for line in f if line.strip()]
+        self.count = len(self.items)
+        self.facts = {item["text"] for item in self.items if item.get("kind") == "fact"}
+
+        capacity = max(initial_capacity, self.count)
+        self.vectors = self._open_memmap(capacity)
+        self.kinds = np.zeros(capacity, dtype=np.uint8)
+        for i, item in enumerate(self.items):
+            self.kinds[i] = KINDS.get(item.get("kind"), 0)
+        if self.count >= self.ann_min_items:
+            self._build_index()
+
+    def _open_memmap(self, capacity):
+        vectors_file = self._files()[0]
+        needed = capacity * self.dim * 4
+        if not os.path.exists(vectors_file) or os.path.getsize(vectors_file) < needed:
+            with open(vectors_file, "ab") as f:
+                f.truncate(needed)
+        return np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _grow(self):
+        """Удвоить ёмкость матрицы (амортизированно O(1) на запись)"""
+        capacity = len(self.vectors) * 2
+        if self.path:
+            self.vectors.flush()
+            self.vectors = self._open_memmap(capacity)
+        else:
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+        kinds = np.zeros(capacity, dtype=np.uint8)
+        kinds[:self.count] = self.kinds[:self.count]
+        self.kinds = kinds
+
+    def _build_index(self):
+        started = time.perf_counter()
+        index = IVFIndex(nprobe=self.nprobe)
+        index.build(self.vectors[:self.count])
+        self.index = index
+        logging.info(f"Memory IVF index built for {self.count} items in {time.perf_counter() - started:.1f}s")
+
+    # --- запись ---
+
+    def add(self, text, kind="turn"):
+        """Добавить запись (эмбеддинг считается в этом потоке)"""
+        self.add_vectors(self.embedder.encode([text]), [{"text": text, "kind": kind, "time": time.time()}])
+
+    def add_async(self, text, kind="turn"):
+        """Добавить запись в фоне"""
+        return self.executor.submit(self.add, text, kind)
+
+    def add_vectors(self, vectors, items):
+        with self.lock:
+            for vector, item in zip(vectors, items):
+                if self.count >= len(self.vectors):
+                    self._grow()
+                self.vectors[self.count] = vector
+                self.kinds[self.count] = KINDS.get(item["kind"], 0)
+                self.items.append(item)
+                if item["kind"] == "fact":
+                    self.facts.add(item["text"])
+                if self.index is not None:
+                    self.index.add(self.count, vector)
+                self.count += 1
+            if self.path:
+                with open(self._files()[1], "a", encoding="utf-8") as f:
+                    for item in items:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            if self.index is None and self.count >= self.ann_min_items:
+                self._build_index()
+
+    def has_fact(self, text):
+        with self.lock:
+            return text in self.facts
+
+    # --- поиск ---
+
+    def search(self, text, k=3, min_score=0.35, exclude_recent_turns=0):
+        """Top-k записей по косинусной близости: [(score, text, kind), ...]"""
+        query = self.embedder.encode([text])[0]
+        return self.search_vector(query, k, min_score, exclude_recent_turns)
+
+    def search_vector(self, query, k=3, min_score=0.35, exclude_recent_turns=0):
+        started = time.perf_counter()
+        with self.lock:
+            count = self.count
+            if count == 0:
+                return []
+            if self.index is not None:
+                ids = self.index.candidates(query)
+                scores = self.vectors[ids] @ query
+                self.stats["ann_searches"] += 1
+            else:
+                ids = None
+                scores = self.vectors[:count] @ query
+
+            if exclude_recent_turns:
+                # Последние реплики и так есть в контексте
+                positions = ids if ids is not None else np.arange(count)
+                recent = (positions >= count - exclude_recent_turns) & (self.kinds[positions] == KINDS["turn"])
+                scores = np.where(recent, -1.0, scores)
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for position in top:
+                if scores[position] < min_score:
+                    break
+                item = self.items[int(ids[position]) if ids is not None else int(position)]
+                results.append((float(scores[position]), item["text"], item["kind"]))
+
+        elapsed = time.perf_counter() - started
+        self.stats["searches"] += 1
+        self.stats["search_time"] += elapsed
+        return results
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["items"] = self.count
+        stats["ann"] = self.index is not None
+        stats["avg_search_ms"] = stats["search_time"] / stats["searches"] * 1000 if stats["searches"] else 0.0
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.path and isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+
+def main():
+    """Бенчмарк поиска: точный и IVF на синтетических кластеризованных векторах"""
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска в долговременной памяти")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((500, args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), args.items)] + \
+        0.5 * rng.standard_normal((args.items, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.items, args.queries)] + \
+        0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    memory = LongTermMemory(HashingEmbedder(args.dim), initial_capacity=args.items,
+                            ann_min_items=args.items + 1, nprobe=args.nprobe)
+    memory.add_vectors(vectors, [{"text": str(i), "kind": "turn", "time": 0.0} for i in range(args.items)])
+
+    def run():
+        latencies, results = [], []
+        for query in queries:
+            started = time.perf_counter()
+            hits = memory.search_vector(query, k=args.k, min_score=-1.0)
+            latencies.append(time.perf_counter() - started)
+            results.append({text for _, text, _ in hits})
+        latencies.sort()
+        return latencies, results
+
+    exact_latencies, exact_results = run()
+    memory._build_index()
+    ann_latencies, ann_results = run()
+    recall = np.mean([len(a & e) / len(e) for a, e in zip(ann_results, exact_results)])
+
+    size_mb = args.items * args.dim * 4 / 1e6
+    print(f"\n{args.items} записей x {args.dim} (float32, {size_mb:.0f} МБ), top-{args.k}, {args.queries} запросов")
+    for name, latencies in (("точный", exact_latencies), (f"IVF nprobe={args.nprobe}", ann_latencies)):
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"  {name:16s} p50={p50:.2f} мс p99={p99:.2f} мс")
+    print(f"  recall@{args.k} IVF относительно точного поиска: {recall:.1%}")
+    memory.close()
+
+
+if __name__ == "__main__":
+    main()
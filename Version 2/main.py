@@ -1,35 +1,113 @@
 import os
-import cv2
 import time
 import json
 import logging
-import requests
 import threading
-import numpy as np
-import speech_recognition as sr
 from multiprocessing import Process, Value, Queue
 from datetime import datetime
-from ultralytics import YOLO
 import subprocess
 import random
 from config import (
-    OPENROUTER_API_KEY,
+    LLM_PROVIDERS,
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUEST_TIMEOUT,
+    LLM_TEMPERATURE,
+    LLM_MAX_TOKENS,
+    LLM_PROMPT_CACHE_CONTROL,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_TTL,
+    LLM_CACHE_TIME_SENSITIVE_TTL,
+    LLM_CACHE_CONTEXT_MESSAGES,
+    TIME_SENSITIVE_KEYWORDS,
+    CONTEXT_MAX_TOKENS,
+    CONTEXT_MAX_MESSAGES,
+    SUMMARY_ENABLED,
+    SUMMARY_TRIGGER_MESSAGES,
+    SUMMARY_KEEP_RECENT,
+    SUMMARY_MAX_TOKENS,
+    CONVERSATION_STORE_ENABLED,
+    CONVERSATION_DB_PATH,
+    CONVERSATION_PERSON,
+    CONVERSATION_RESUME_WINDOW,
+    CONVERSATION_TAIL_MESSAGES,
+    CONVERSATION_RECALL_LIMIT,
+    MEMORY_ENABLED,
+    MEMORY_DIR,
+    MEMORY_EMBEDDING_MODEL,
+    MEMORY_TOP_K,
+    MEMORY_MIN_SCORE,
+    MEMORY_ANN_MIN_ITEMS,
+    MEMORY_FACTS,
+    SYSTEM_PROMPTS,
+    SPEECH_PHRASE_TIME_LIMIT,
+    SPECULATIVE_PREFETCH_ENABLED,
+    VOSK_MODEL_PATH,
+    SPECULATIVE_STABLE_UPDATES,
+    SPECULATIVE_MIN_CHARS,
+    SPECULATIVE_MATCH_THRESHOLD,
+    SPEECH_RATE,
+    SPEECH_VOLUME,
+    INTENTS_ENABLED,
+    INTENT_MIN_CONFIDENCE,
+    DEFAULT_LLM_LATENCY,
+    APP_COMMANDS,
+    URL_COMMANDS,
+    TURN_QUEUE_SIZE,
     CAMERA_INDEX,
+    SCENE_APPEAR_FRAMES,
+    SCENE_DISAPPEAR_FRAMES,
+    SCENE_NEAR_AREA,
+    SCENE_MAX_TOKENS,
+    MULTIMODAL_ENABLED,
+    FRAME_WINDOW,
+    FRAME_MAX_SIDE,
+    FRAME_MAX_BYTES,
+    FRAME_MIN_QUALITY,
+    FRAME_MAX_QUALITY,
     YOLO_MODEL_PATH,
     ACTIVATION_WORDS,
     EXIT_WORDS,
-    PROACTIVE_CONVERSATION_TIMEOUT
+    PROACTIVE_CONVERSATION_TIMEOUT,
+    STARTUP_WORKERS,
+    STARTUP_CAMERA_TIMEOUT,
+    STARTUP_LLM_WARMUP_TIMEOUT
 )
 from vision_processor import VisionProcessor
+from scene_state import SceneState
+from conversation_log import ConversationLog
+from event_bus import EventBus, UTTERANCE_RECOGNIZED, TURN_STARTED, TURN_FINISHED, MESSAGE_ADDED
+from conversation_store import ConversationStore
+from frame_attachments import FrameAttacher
+from llm_client import LLMClient, CancelToken, LLMCancelled, LLMHTTPError
+from llm_router import LLMRouter, Provider, create_backend
+from llm_cache import ResponseCache
+from context_manager import ContextBuilder, message_tokens
+from prompt_prefix import PromptPrefix
+from summarizer import RollingSummarizer, ROLE_NAMES
+from speculative import Speculation, SpeculativePrefetcher
+from intents import IntentRouter, handle_time, handle_date, make_open_handler
+from turn_scheduler import TurnScheduler
+from startup import StartupOrchestrator
+from utils import warm_up_yolo_model
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# OpenRouter API Configuration
-OPENROUTER_API_KEY = "put_your_api_key_here"  # Замените на ваш ключ
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
-
 # Global variables
+# События для интерфейса (вместо опроса геттеров по таймеру)
+event_bus = EventBus()
 conversation_history = []
+# Журнал всех сообщений с номерами - для интерфейса (история выше сворачивается)
+conversation_log = ConversationLog()
+# Постоянное хранилище: запись в фоне, поиск старых реплик по ключевым словам
+conversation_store = ConversationStore(CONVERSATION_DB_PATH) if CONVERSATION_STORE_ENABLED else None
+# Векторная долговременная память (загружается в фоне вместе с локальными моделями)
+long_term_memory = None
 last_user_input = None
 last_ai_response = None
 running_flag = Value('b', True)
@@ -37,24 +115,94 @@ camera_active = Value('b', True)
 last_activity_time = time.time()
 proactive_conversation_enabled = Value('b', True)
 
-vision_processor = VisionProcessor(
-    camera_index=CAMERA_INDEX,
-    model_path=YOLO_MODEL_PATH,
-    update_interval=0.5
+# Настройки синтеза речи (меняются голосовыми командами)
+speech_settings = {
+    "rate": SPEECH_RATE,
+    "volume": SPEECH_VOLUME
+}
+
+# Неизменный префикс промпта (персона) - одинаковые байты в каждом запросе
+prompt_prefix = PromptPrefix(SYSTEM_PROMPTS["main"], cache_control=LLM_PROMPT_CACHE_CONTROL)
+
+# Сборка промпта в пределах бюджета токенов
+context_builder = ContextBuilder(
+    prompt_prefix,
+    max_tokens=CONTEXT_MAX_TOKENS,
+    max_messages=CONTEXT_MAX_MESSAGES
 )
 
-# Initialize YOLO model
-try:
-    yolo_model = YOLO('yolov8n.pt')  # Используем YOLOv8 (более современная версия)
-    logging.info("YOLO model loaded successfully")
-except Exception as e:
-    logging.error(f"Failed to load YOLO model: {e}")
-    yolo_model = None
+# LLM client: маршрутизация между провайдерами, общий лимит параллельных запросов
+# и отмена перебитых запросов
+llm_router = LLMRouter(
+    [
+        Provider(
+            provider["name"],
+            create_backend(
+                provider,
+                max_concurrency=LLM_MAX_CONCURRENCY,
+                timeout=LLM_REQUEST_TIMEOUT,
+                default_params={
+                    "temperature": LLM_TEMPERATURE,
+                    "max_tokens": LLM_MAX_TOKENS
+                },
+                extra_headers={
+                    "HTTP-Referer": "http://localhost:3000",
+                    "X-Title": "VISION Robot"
+                },
+                prompt_prefix=prompt_prefix
+            ),
+            failure_threshold=LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=LLM_CIRCUIT_RESET_TIMEOUT,
+            fallback_only=provider.get("fallback_only", False)
+        )
+        for provider in LLM_PROVIDERS
+    ],
+    hedging=LLM_HEDGING_ENABLED,
+    hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+    timeout=LLM_REQUEST_TIMEOUT
+)
+llm_client = LLMClient(llm_router)
+current_request_token = None
+request_token_lock = threading.Lock()
+
+# Спекулятивные запросы по частичной расшифровке речи
+vosk_model = None
+prefetcher = None
+
+# Локальные намерения (инициализируются в setup_intents)
+intent_router = None
+
+# Состояние сцены по детекциям камеры; scene_seq - последнее событие, учтённое в диалоге
+scene_state = SceneState(
+    appear_frames=SCENE_APPEAR_FRAMES,
+    disappear_frames=SCENE_DISAPPEAR_FRAMES,
+    near_area=SCENE_NEAR_AREA
+)
+scene_seq = 0
+
+# Кадры для мультимодальных запросов
+frame_attacher = FrameAttacher(
+    max_side=FRAME_MAX_SIDE,
+    max_bytes=FRAME_MAX_BYTES,
+    min_quality=FRAME_MIN_QUALITY,
+    max_quality=FRAME_MAX_QUALITY
+) if MULTIMODAL_ENABLED else None
+
+# Кэш ответов LLM
+response_cache = ResponseCache(
+    db_path=LLM_CACHE_PATH,
+    max_memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+    default_ttl=LLM_CACHE_TTL,
+    context_messages=LLM_CACHE_CONTEXT_MESSAGES
+) if LLM_CACHE_ENABLED else None
 
 vision_processor = VisionProcessor(
     camera_index=CAMERA_INDEX,
     model_path=YOLO_MODEL_PATH,
-    update_interval=0.5
+    update_interval=0.5,
+    scene_state=scene_state,
+    frame_window=FRAME_WINDOW,
+    event_bus=event_bus
 )
 
 # Greetings and conversation starters
@@ -94,6 +242,82 @@ def get_conversation_history():
     return conversation_history.copy()
 
 
+def get_conversation_since(seq):
+    """Получить сообщения журнала с номером больше seq"""
+    return conversation_log.read_since(seq)
+
+
+def wait_for_conversation(seq, timeout=None):
+    """Дождаться сообщений журнала новее seq"""
+    return conversation_log.wait(seq, timeout)
+
+
+def add_to_history(role, content, timestamp=None):
+    """Добавить реплику в историю для промпта и в журнал"""
+    timestamp = timestamp or datetime.now().isoformat()
+    conversation_history.append({'role': role, 'content': content, 'timestamp': timestamp})
+    message = conversation_log.append(role, content, timestamp)
+    event_bus.publish(MESSAGE_ADDED, message=message)
+    if conversation_store is not None:
+        conversation_store.append(role, content, timestamp)
+
+
+def restore_conversation():
+    """Открыть сессию текущего человека; если она продолжается - загрузить её хвост"""
+    if conversation_store is None:
+        return
+    conversation_store.start()
+    if not conversation_store.open_session(CONVERSATION_PERSON, resume_window=CONVERSATION_RESUME_WINDOW):
+        return
+    tail = conversation_store.load_tail(CONVERSATION_TAIL_MESSAGES)
+    for message in tail:
+        conversation_history.append(message)
+        restored = conversation_log.append(message['role'], message['content'], message['timestamp'])
+        event_bus.publish(MESSAGE_ADDED, message=restored)
+    logging.info(f"Restored {len(tail)} messages of the previous session")
+
+
+def recall_past_conversations(text):
+    """Воспоминания и старые реплики этого человека, связанные с текстом, для промпта"""
+    recalled = []
+    if long_term_memory is not None:
+        # Последние реплики уже есть в контексте
+        hits = long_term_memory.search(text, k=MEMORY_TOP_K, min_score=MEMORY_MIN_SCORE,
+                                       exclude_recent_turns=CONTEXT_MAX_MESSAGES // 2)
+        recalled += [memory_text for _, memory_text, _ in hits]
+    if conversation_store is not None and CONVERSATION_RECALL_LIMIT > 0:
+        for hit in conversation_store.recall(text, limit=CONVERSATION_RECALL_LIMIT):
+            line = f"{ROLE_NAMES.get(hit['role'], hit['role'])}: {hit['content'][:200]}"
+            if not any(hit['content'] in memory_text for memory_text in recalled):
+                recalled.append(line)
+    return "; ".join(recalled) or None
+
+
+def load_long_term_memory():
+    """Загрузить модель эмбеддингов и память; факты из конфигурации добавляются один раз"""
+    global long_term_memory
+    # numpy и модель эмбеддингов нужны только здесь - не на пути импорта main
+    from long_term_memory import LongTermMemory, create_embedder
+    memory = LongTermMemory(create_embedder(MEMORY_EMBEDDING_MODEL), path=MEMORY_DIR,
+                            ann_min_items=MEMORY_ANN_MIN_ITEMS)
+    for fact in MEMORY_FACTS:
+        if not memory.has_fact(fact):
+            memory.add(fact, kind="fact")
+    long_term_memory = memory
+    logging.info(f"Long-term memory loaded: {memory.count} items")
+
+
+def remember_exchange(user_input, ai_response):
+    """Запомнить обмен репликами (эмбеддинг считается в фоне)"""
+    if long_term_memory is not None:
+        long_term_memory.add_async(f"{ROLE_NAMES['user']}: {user_input}\n{ROLE_NAMES['assistant']}: {ai_response}")
+
+
+def get_conversation_summary():
+    """Получить краткое содержание старой части разговора"""
+    return summarizer.get_summary()
+
+
 def is_running():
     """Проверить, работает ли робот"""
     return running_flag.value
@@ -101,51 +325,134 @@ def is_running():
 
 def speak(text):
     """Произнести текст"""
+    event_bus.set_status("speech", "speaking")
     try:
-        subprocess.run(['say', text], check=True)
+        subprocess.run(
+            ['say', '-r', str(speech_settings["rate"]), f'[[volm {speech_settings["volume"]:.1f}]] {text}'],
+            check=True
+        )
         logging.info(f"Speaking: {text}")
     except Exception as e:
         logging.error(f"Speech error: {e}")
+    finally:
+        event_bus.set_status("speech", "idle")
 
 
-def call_deepseek_api(messages):
+def call_deepseek_api(messages, token=None, cacheable=True):
     """Вызов API DeepSeek через OpenRouter"""
+    cache_keys = None
+    if response_cache is not None:
+        if cacheable:
+            cache_keys = get_cache_keys(messages)
+            cached = response_cache.get_any(cache_keys.values())
+            if cached is not None:
+                logging.info(f"LLM cache hit (hit rate {response_cache.get_stats()['hit_rate']:.0%})")
+                return cached
+        else:
+            response_cache.bypass()
+
     try:
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:3000",
-            "X-Title": "VISION Robot"
-        }
+        result = llm_client.complete(messages, token=token)
+        ai_response = result.text
+    except LLMCancelled:
+        logging.info("DeepSeek request cancelled")
+        return None
+    except LLMHTTPError as e:
+        logging.error(f"API Error: {e.status} - {e.text}")
+        return "Извините, произошла ошибка при обработке запроса."
+    except Exception as e:
+        logging.error(f"DeepSeek API error: {e}")
+        return "Извините, не могу подключиться к серверу."
 
-        data = {
-            "model": "deepseek/deepseek-chat",
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 500
+    prompt_prefix.record_usage(result.usage)
+    if cache_keys is not None and result.provider in cache_keys:
+        # Ответ резервного провайдера хранится под его ключом, а не под ключом основного
+        response_cache.put(cache_keys[result.provider], ai_response, ttl=get_cache_ttl(messages))
+    return ai_response
+
+
+def summarize_conversation(previous_summary, turns_text):
+    """Свернуть старые реплики в краткое содержание (вызывается в фоновом потоке)"""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPTS["summary"]},
+        {
+            "role": "user",
+            "content": (
+                f"Текущее краткое содержание:\n{previous_summary or '(пусто)'}\n\n"
+                f"Новые реплики:\n{turns_text}"
+            )
         }
+    ]
+    try:
+        return llm_client.complete(messages, timeout=60, max_tokens=SUMMARY_MAX_TOKENS, temperature=0.3).text
+    except Exception as e:
+        logging.error(f"Summarization error: {e}")
+        return None
+
 
-        response = requests.post(
-            f"{OPENROUTER_BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30
+def preload_local_models():
+    """Загрузить локальные модели заранее, чтобы первый офлайн-ответ не ждал загрузки"""
+    if MEMORY_ENABLED:
+        try:
+            load_long_term_memory()
+        except Exception as e:
+            logging.error(f"Long-term memory load error: {e}")
+    for provider in llm_router.providers:
+        if hasattr(provider.backend, "load"):
+            try:
+                provider.backend.load()
+            except Exception as e:
+                logging.error(f"Local LLM '{provider.name}' preload error: {e}")
+
+
+def get_cache_keys(messages):
+    """Ключи кэша для каждого провайдера (в порядке конфигурации)"""
+    params = {"temperature": LLM_TEMPERATURE, "max_tokens": LLM_MAX_TOKENS}
+    return {
+        provider["name"]: response_cache.make_key(
+            f'{provider["name"]}/{provider.get("model") or provider.get("model_path")}', params, messages
         )
+        for provider in LLM_PROVIDERS
+    }
 
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        else:
-            logging.error(f"API Error: {response.status_code} - {response.text}")
-            return "Извините, произошла ошибка при обработке запроса."
 
-    except Exception as e:
-        logging.error(f"DeepSeek API error: {e}")
-        return "Извините, не могу подключиться к серверу."
+def get_cache_ttl(messages):
+    """TTL ответа в кэше: вопросы о времени и дате устаревают быстро"""
+    last_user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), "")
+    if any(keyword in last_user.lower() for keyword in TIME_SENSITIVE_KEYWORDS):
+        return LLM_CACHE_TIME_SENSITIVE_TTL
+    return LLM_CACHE_TTL
+
+
+def get_llm_cache_stats():
+    """Получить статистику кэша ответов LLM"""
+    if response_cache is None:
+        return {}
+    return response_cache.get_stats()
+
+
+def start_request():
+    """Создать токен для нового запроса, отменив предыдущий (он больше не нужен)"""
+    global current_request_token
+
+    token = CancelToken()
+    with request_token_lock:
+        if current_request_token is not None:
+            current_request_token.cancel()
+        current_request_token = token
+    return token
+
+
+def cancel_current_request():
+    """Прервать текущий запрос к LLM (например, когда пользователь перебил робота)"""
+    with request_token_lock:
+        if current_request_token is not None:
+            current_request_token.cancel()
 
 
 def recognize_speech():
     """Распознавание речи"""
+    import speech_recognition as sr
     recognizer = sr.Recognizer()
     with sr.Microphone() as source:
         logging.info("Listening for speech...")
@@ -162,12 +469,61 @@ def recognize_speech():
             logging.error(f"Speech recognition error: {e}")
             return None
 
+def recognize_speech_streaming(on_partial):
+    """Потоковое распознавание речи (Vosk): частичные результаты передаются в on_partial"""
+    global vosk_model
+
+    try:
+        import pyaudio
+        from vosk import Model, KaldiRecognizer
+    except ImportError as e:
+        logging.error(f"Streaming recognition unavailable: {e}")
+        return recognize_speech()
+
+    if vosk_model is None:
+        vosk_model = Model(VOSK_MODEL_PATH)
+
+    recognizer = KaldiRecognizer(vosk_model, 16000)
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=4000)
+    logging.info("Listening for speech (streaming)...")
+    try:
+        deadline = time.time() + SPEECH_PHRASE_TIME_LIMIT + 1
+        while time.time() < deadline:
+            data = stream.read(4000, exception_on_overflow=False)
+            if recognizer.AcceptWaveform(data):
+                break
+            partial = json.loads(recognizer.PartialResult()).get("partial", "")
+            if partial:
+                on_partial(partial)
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+    except Exception as e:
+        logging.error(f"Streaming speech recognition error: {e}")
+        return None
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+    if not text:
+        return None
+    logging.info(f"Recognized: {text}")
+    return text.lower()
+
+
 def get_vision_description():
     """Получить описание того, что видит робот"""
     if vision_processor.running:
         return vision_processor.get_detection_description()
     return "Система зрения не активна"
 
+def get_scene_context():
+    """Сводка сцены для промпта: что в кадре и что изменилось с прошлой реплики"""
+    if not vision_processor.running:
+        return "Система зрения не активна"
+    return scene_state.describe(since_seq=scene_seq, max_tokens=SCENE_MAX_TOKENS)
+
+
 def get_last_vision_result():
     """Получить последний результат компьютерного зрения"""
     if vision_processor.running:
@@ -176,10 +532,7 @@ def get_last_vision_result():
 
 
 def camera_monitor():
-    """Мониторинг камеры"""
-    vision_processor.start()
-    logging.info("Vision processor started")
-
+    """Остановить камеру при завершении (запускает её оркестратор)"""
     while running_flag.value:
         time.sleep(1)
 
@@ -189,8 +542,6 @@ def camera_monitor():
 
 def proactive_conversation():
     """Проактивный диалог"""
-    global last_activity_time, last_ai_response
-
     while running_flag.value:
         try:
             current_time = time.time()
@@ -198,24 +549,12 @@ def proactive_conversation():
             # Проверяем, прошло ли достаточно времени с последней активности
             if (proactive_conversation_enabled.value and
                     current_time - last_activity_time > 35 and  # 35 секунд
-                    len(conversation_history) > 0):  # Есть история диалога
+                    len(conversation_history) > 0 and  # Есть история диалога
+                    turn_scheduler.is_idle()):  # Никто не ждёт ответа
 
                 # Запускаем проактивный диалог
                 starter = random.choice(proactive_starters)
-                logging.info(f"Proactive conversation: {starter}")
-
-                # Добавляем в историю
-                conversation_history.append({
-                    'role': 'assistant',
-                    'content': starter,
-                    'timestamp': datetime.now().isoformat()
-                })
-
-                last_ai_response = starter
-                speak(starter)
-
-                # Обновляем время последней активности
-                last_activity_time = current_time
+                turn_scheduler.submit(starter, source="proactive", kind="proactive")
 
             time.sleep(5)  # Проверяем каждые 5 секунд
 
@@ -224,64 +563,271 @@ def proactive_conversation():
             time.sleep(10)
 
 
-def process_user_input(user_input):
-    """Обработка ввода пользователя"""
-    global last_user_input, last_ai_response, last_activity_time
+def deliver_proactive_message(starter):
+    """Произнести проактивную реплику (выполняется планировщиком ходов)"""
+    global last_activity_time, last_ai_response
 
-    last_user_input = user_input
+    # Пока реплика ждала в очереди, пользователь мог заговорить сам
+    if time.time() - last_activity_time <= 35:
+        return None
+
+    logging.info(f"Proactive conversation: {starter}")
+
+    # Добавляем в историю
+    add_to_history('assistant', starter)
+
+    last_ai_response = starter
+    speak(starter)
+
+    # Обновляем время последней активности
     last_activity_time = time.time()
+    return starter
 
-    # Добавляем пользовательский ввод в историю
-    conversation_history.append({
-        'role': 'user',
-        'content': user_input,
-        'timestamp': datetime.now().isoformat()
-    })
 
+def record_activation(command):
+    """Записать фразу активации в историю (выполняется планировщиком ходов)"""
+    add_to_history('user', command)
+
+
+def run_turn(turn):
+    """Выполнить ход из очереди; все изменения истории идут через этот поток"""
+    if turn.kind == "proactive":
+        return deliver_proactive_message(turn.text)
+    if turn.kind == "activation":
+        return record_activation(turn.text)
+
+    event_bus.publish(TURN_STARTED, text=turn.text, source=turn.source)
+    event_bus.set_status("assistant", "thinking")
+    response = None
+    try:
+        response = process_user_input(turn.text, prefetched=turn.options.get("prefetched"))
+        return response
+    finally:
+        event_bus.set_status("assistant", "ready")
+        event_bus.publish(TURN_FINISHED, text=turn.text, response=response)
+
+
+def submit_user_input(text, source="typed"):
+    """Поставить ввод пользователя в очередь ходов; возвращает Future с ответом"""
+    return turn_scheduler.submit(text, source=source)
+
+
+def get_turn_stats():
+    """Получить глубину очереди ходов и время ожидания"""
+    return turn_scheduler.get_stats()
+
+
+def estimate_llm_latency():
+    """Текущая оценка задержки LLM: медиана самого быстрого провайдера"""
+    latencies = [p.histogram.percentile(50) for p in llm_router.providers]
+    latencies = [latency for latency in latencies if latency is not None]
+    return min(latencies) if latencies else DEFAULT_LLM_LATENCY
+
+
+def handle_vision_intent(text):
+    """Что видит камера - прямо из результатов детектора"""
+    if not vision_processor.running:
+        return None
+    return vision_processor.get_detection_description() or None
+
+
+def make_speech_setting_handler(name, step, low, high, message):
+    """Обработчик изменения громкости или темпа речи"""
+    def handler(text):
+        speech_settings[name] = min(high, max(low, speech_settings[name] + step))
+        return message
+    return handler
+
+
+def setup_intents():
+    """Зарегистрировать локальные намерения"""
+    router = IntentRouter(min_confidence=INTENT_MIN_CONFIDENCE, llm_latency_fn=estimate_llm_latency)
+    router.register(
+        "time", handle_time,
+        patterns=[r"(скажи )?(который (сейчас )?час|сколько (сейчас )?времени)( сейчас)?"],
+        examples=["который час", "сколько сейчас времени", "подскажи время", "скажи который сейчас час"]
+    )
+    router.register(
+        "date", handle_date,
+        patterns=[r"(скажи )?(какое (сегодня )?число|какая (сегодня )?дата|какой (сегодня )?день( недели)?)( сегодня)?"],
+        examples=["какое сегодня число", "какая сегодня дата", "какой сегодня день недели", "подскажи дату"]
+    )
+    router.register(
+        "vision", handle_vision_intent,
+        patterns=[r"(что ты видишь|что видишь|что перед тобой)( сейчас)?"],
+        examples=["что ты сейчас видишь", "что ты там видишь", "что находится перед тобой"]
+    )
+    router.register(
+        "louder", make_speech_setting_handler("volume", 0.2, 0.1, 1.0, "Хорошо, говорю громче."),
+        patterns=[r"(говори |сделай )?громче( пожалуйста)?"],
+        examples=["говори погромче", "сделай звук громче"],
+        keywords=["громч", "погромч"]
+    )
+    router.register(
+        "quieter", make_speech_setting_handler("volume", -0.2, 0.1, 1.0, "Хорошо, говорю тише."),
+        patterns=[r"(говори |сделай )?тише( пожалуйста)?"],
+        examples=["говори потише", "сделай звук тише"],
+        keywords=["тиш", "потиш"]
+    )
+    router.register(
+        "faster", make_speech_setting_handler("rate", 40, 100, 300, "Хорошо, говорю быстрее."),
+        patterns=[r"(говори )?быстрее( пожалуйста)?"],
+        examples=["говори побыстрее"],
+        keywords=["быстр", "побыстр"]
+    )
+    router.register(
+        "slower", make_speech_setting_handler("rate", -40, 100, 300, "Хорошо, говорю медленнее."),
+        patterns=[r"(говори )?медленнее( пожалуйста)?"],
+        examples=["говори помедленнее"],
+        keywords=["медлен", "помедлен"]
+    )
+    router.register(
+        "open", make_open_handler(APP_COMMANDS, URL_COMMANDS),
+        patterns=[r"открой .+"]
+    )
+    return router
+
+
+def get_intent_stats():
+    """Получить статистику локальных намерений"""
+    if intent_router is None:
+        return {}
+    return intent_router.get_stats()
+
+
+def build_turn_messages(user_input, history):
+    """Собрать промпт для хода; возвращает (сообщения, нужны ли данные камеры)"""
     # Проверяем, спрашивает ли пользователь о том, что видит робот
     vision_keywords = ['что ты видишь', 'что видишь', 'что я показываю', 'что это', 'посмотри', 'что на экране']
 
     should_analyze_vision = any(keyword in user_input.lower() for keyword in vision_keywords)
 
-    # Формируем сообщения для API
-    messages = [
-        {
+    # Закреплённый контекст: краткое содержание старого разговора и данные камеры
+    pinned = []
+    summary = summarizer.get_summary()
+    if summary:
+        pinned.append({
             "role": "system",
-            "content": (
-                "Ты робот ВИЖН - дружелюбный помощник с компьютерным зрением. "
-                "Ты можешь видеть окружающий мир через камеру и анализировать объекты. "
-                "Отвечай естественно и дружелюбно, как живой собеседник. "
-                "Не упоминай, что ты ИИ. Ты просто ВИЖН - робот с камерой."
-            )
-        }
-    ]
-
-    # Добавляем последние сообщения из истории (максимум 10)
-    recent_messages = conversation_history[-10:]
-    for msg in recent_messages:
-        messages.append({
-            "role": msg['role'],
-            "content": msg['content']
+            "content": f"Краткое содержание предыдущего разговора: {summary}"
+        })
+    recalled = recall_past_conversations(user_input)
+    if recalled:
+        pinned.append({
+            "role": "system",
+            "content": f"Из памяти о прошлых разговорах с этим человеком: {recalled}"
         })
-
-    # Если пользователь спрашивает о том, что видит робот
     if should_analyze_vision:
-        vision_description = get_vision_description()
-        enhanced_input = f"{user_input}\n\n[Информация с камеры: {vision_description}]"
-        messages[-1]['content'] = enhanced_input
+        pinned.append({
+            "role": "system",
+            "content": f"[Информация с камеры: {get_scene_context()}]"
+        })
+
+    # Формируем сообщения для API в пределах бюджета токенов
+    messages = context_builder.build(history, pinned=pinned)
+    if should_analyze_vision and frame_attacher is not None:
+        attach_frame(messages)
+    return messages, should_analyze_vision
+
+
+def attach_frame(messages):
+    """Приложить лучший из последних кадров к последней реплике пользователя"""
+    if not vision_processor.running:
+        return
+    image = frame_attacher.attachment(vision_processor.get_recent_frames())
+    if image is None:
+        return
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i]['role'] == 'user':
+            # Копия: сообщение в истории остаётся текстовым
+            messages[i] = {
+                'role': 'user',
+                'content': [{"type": "text", "text": messages[i]['content']}, image]
+            }
+            return
+
+
+def start_speculative_request(partial_text):
+    """Запустить предварительный запрос по частичной расшифровке"""
+    if any(phrase in partial_text for phrase in ACTIVATION_WORDS + EXIT_WORDS):
+        return None
+    if intent_router is not None:
+        intent, confidence = intent_router.classify(partial_text)
+        if intent is not None and confidence >= INTENT_MIN_CONFIDENCE:
+            # Скорее всего ответим локально - LLM не понадобится
+            return None
 
-    # Получаем ответ от DeepSeek
-    ai_response = call_deepseek_api(messages)
+    provisional = {'role': 'user', 'content': partial_text}
+    messages, should_analyze_vision = build_turn_messages(partial_text, conversation_history + [provisional])
+    token = CancelToken()
+    future = llm_client.submit(messages, token=token)
+    prompt_tokens = sum(message_tokens(m) for m in messages)
+    return Speculation(partial_text, future, token, prompt_tokens)
 
-    # Сохраняем ответ
+
+def resolve_prefetched(speculation):
+    """Дождаться предварительного запроса; None - если он не удался"""
+    global current_request_token
+
+    # Предварительный запрос становится текущим, чтобы его можно было перебить
+    with request_token_lock:
+        if current_request_token is not None and current_request_token is not speculation.token:
+            current_request_token.cancel()
+        current_request_token = speculation.token
+    try:
+        result = speculation.future.result()
+    except Exception as e:
+        logging.warning(f"Speculative request failed, retrying normally: {e}")
+        return None
+    prompt_prefix.record_usage(result.usage)
+    return result.text
+
+
+def get_speculation_stats():
+    """Получить статистику спекулятивных запросов"""
+    if prefetcher is None:
+        return {}
+    return prefetcher.get_stats()
+
+
+def process_user_input(user_input, prefetched=None):
+    """Обработка ввода пользователя"""
+    global last_user_input, last_ai_response, last_activity_time, scene_seq
+
+    last_user_input = user_input
+    last_activity_time = time.time()
+    turn_scene_seq = scene_state.event_seq
+
+    # Реплика пользователя попадёт в историю вместе с ответом: перебитый ход
+    # не должен оставлять в истории, журнале и хранилище вопрос без ответа
+    user_timestamp = datetime.now().isoformat()
+    pending = {'role': 'user', 'content': user_input, 'timestamp': user_timestamp}
+
+    # Простые запросы отвечаем локально, без LLM
+    ai_response = intent_router.handle(user_input) if intent_router is not None else None
+    if ai_response is not None and prefetched is not None:
+        prefetched.token.cancel()
+    elif prefetched is not None:
+        ai_response = resolve_prefetched(prefetched)
+
+    if ai_response is None:
+        messages, should_analyze_vision = build_turn_messages(user_input, conversation_history + [pending])
+
+        # Получаем ответ от DeepSeek
+        # Ответы с данными камеры зависят от текущей сцены - их не кэшируем
+        ai_response = call_deepseek_api(messages, token=start_request(), cacheable=not should_analyze_vision)
+        if ai_response is None:
+            # Запрос перебит более новым вводом
+            return None
+
+    # Сохраняем ответ; изменения сцены до этого хода уже учтены
     last_ai_response = ai_response
+    scene_seq = turn_scene_seq
 
-    # Добавляем ответ в историю
-    conversation_history.append({
-        'role': 'assistant',
-        'content': ai_response,
-        'timestamp': datetime.now().isoformat()
-    })
+    # Добавляем ввод и ответ в историю
+    add_to_history('user', user_input, user_timestamp)
+    add_to_history('assistant', ai_response)
+    summarizer.notify()
+    remember_exchange(user_input, ai_response)
 
     # Произносим ответ
     speak(ai_response)
@@ -289,60 +835,128 @@ def process_user_input(user_input):
     return ai_response
 
 
+# Фоновое сворачивание старых реплик
+summarizer = RollingSummarizer(
+    conversation_history,
+    summarize_conversation,
+    trigger_messages=SUMMARY_TRIGGER_MESSAGES,
+    keep_recent=SUMMARY_KEEP_RECENT
+)
+
+# Все ходы диалога выполняются по одному
+turn_scheduler = TurnScheduler(run_turn, max_queue=TURN_QUEUE_SIZE)
+
+
+def greet():
+    """Приветствие; после восстановленного хвоста сессии, поэтому зависит от него"""
+    greeting = random.choice(greetings)
+    speak(greeting)
+    add_to_history('assistant', greeting)
+
+
+def start_vision():
+    """Запустить обработку кадров; готовность - первый обработанный кадр, а не пауза"""
+    vision_processor.start()
+    return vision_processor.wait_ready(STARTUP_CAMERA_TIMEOUT)
+
+
+def probe_microphone():
+    """Открыть микрофон один раз: ошибка драйвера видна до первого прослушивания"""
+    import speech_recognition as sr
+    with sr.Microphone():
+        pass
+    return True
+
+
+def probe_tts():
+    """Есть ли команда синтеза речи"""
+    import shutil
+    if shutil.which("say") is None:
+        logging.warning("Команда 'say' не найдена. Синтез речи может не работать.")
+        return False
+    return True
+
+
+def build_startup():
+    """Граф задач инициализации основного процесса"""
+    startup = StartupOrchestrator("startup", max_workers=STARTUP_WORKERS)
+    startup.add("vision_model", lambda: warm_up_yolo_model(YOLO_MODEL_PATH), required=False)
+    startup.add("camera", vision_processor.open_camera, required=False)
+    # Не зависит от vision_model, чтобы камера работала и без модели: первый кадр
+    # ждёт загрузку в load_yolo_model, а прогрев - на общей блокировке инференса
+    startup.add("vision", start_vision, deps=("camera",), required=False)
+    startup.add("microphone", probe_microphone, required=False)
+    startup.add("tts", probe_tts, required=False)
+    startup.add("llm", lambda: llm_client.warm_up(STARTUP_LLM_WARMUP_TIMEOUT), required=False)
+    startup.add("conversation", restore_conversation)
+    startup.add("greeting", greet, deps=("conversation",))
+    if INTENTS_ENABLED:
+        startup.add("intents", setup_intents)
+    return startup
+
+
 def main_loop():
     """Основной цикл программы"""
-    global running_flag, last_activity_time
+    global running_flag, last_activity_time, prefetcher, intent_router
+
+    # Загружаем локальную модель в фоне (не задерживает начало диалога)
+    threading.Thread(target=preload_local_models, daemon=True).start()
+
+    # Камера, модели, микрофон и соединение с LLM готовятся параллельно
+    startup = build_startup()
+    startup.run()
+    logging.info(startup.format_timeline())
+    intent_router = startup.result("intents")
 
-    # Запускаем мониторинг камеры в отдельном потоке
     camera_thread = threading.Thread(target=camera_monitor)
     camera_thread.daemon = True
     camera_thread.start()
 
-    # Даем время на инициализацию камеры
-    time.sleep(2.0)
-
-    # Запускаем мониторинг камеры в отдельном потоке
-    vision_processor.start()
-    logging.info("Vision processor started")
+    # Запускаем фоновое сворачивание истории
+    if SUMMARY_ENABLED:
+        summarizer.start()
 
     # Запускаем проактивный диалог в отдельном потоке
     proactive_thread = threading.Thread(target=proactive_conversation)
     proactive_thread.daemon = True
     proactive_thread.start()
 
-    # Приветствие
-    greeting = random.choice(greetings)
-    speak(greeting)
+    if SPECULATIVE_PREFETCH_ENABLED:
+        prefetcher = SpeculativePrefetcher(
+            start_speculative_request,
+            stable_updates=SPECULATIVE_STABLE_UPDATES,
+            min_chars=SPECULATIVE_MIN_CHARS,
+            match_threshold=SPECULATIVE_MATCH_THRESHOLD
+        )
 
-    # Добавляем приветствие в историю
-    conversation_history.append({
-        'role': 'assistant',
-        'content': greeting,
-        'timestamp': datetime.now().isoformat()
-    })
+    # Запускаем планировщик ходов (голос, интерфейс, проактивные реплики)
+    turn_scheduler.start()
 
     logging.info("VISION Robot started. Listening for commands...")
+    event_bus.set_status("system", "running")
+    event_bus.set_status("assistant", "ready")
 
     active_session = False  # Флаг активной сессии
 
     while running_flag.value:
         try:
-            # Ожидаем активацию
-            command = recognize_speech()
+            # Ожидаем активацию; в активной сессии можно начать запрос до конца фразы
+            event_bus.set_status("speech", "listening")
+            if prefetcher is not None and active_session:
+                command = recognize_speech_streaming(prefetcher.on_partial)
+            else:
+                command = recognize_speech()
 
             if command:
                 logging.info(f"Распознано: {command}")
+                event_bus.publish(UTTERANCE_RECOGNIZED, text=command)
 
                 if any(phrase in command for phrase in ACTIVATION_WORDS):
                     active_session = True
                     speak("Да, я вас слушаю!")
 
                     # Добавляем активацию в историю
-                    conversation_history.append({
-                        'role': 'user',
-                        'content': command,
-                        'timestamp': datetime.now().isoformat()
-                    })
+                    turn_scheduler.submit(command, source="voice", kind="activation")
 
                 elif active_session:
                     if any(phrase in command for phrase in EXIT_WORDS):
@@ -351,7 +965,9 @@ def main_loop():
                         running_flag.value = False
                         break
                     else:
-                        process_user_input(command)
+                        prefetched = prefetcher.on_final(command) if prefetcher is not None else None
+                        # Ждём ответа, чтобы не слушать собственную речь робота
+                        turn_scheduler.submit(command, source="voice", prefetched=prefetched).result()
 
                 last_activity_time = time.time()
 
@@ -374,6 +990,31 @@ def main():
     finally:
         running_flag.value = False
         camera_active.value = False
+        event_bus.set_status("system", "stopped")
+        turn_scheduler.stop()
+        logging.info(f"Turn scheduler stats: {turn_scheduler.get_stats()}")
+        summarizer.stop()
+        if prefetcher is not None:
+            prefetcher.reset()
+            logging.info(f"Speculative prefetch stats: {prefetcher.get_stats()}")
+        if intent_router is not None:
+            logging.info(f"Local intent stats: {intent_router.get_stats()}")
+        logging.info(f"LLM provider stats: {llm_router.get_stats()}")
+        logging.info(f"Provider prompt cache stats: {prompt_prefix.get_stats()}")
+        logging.info(f"Event bus stats: {event_bus.get_stats()}")
+        logging.info(f"Scene state stats: {scene_state.get_stats()}")
+        if frame_attacher is not None:
+            logging.info(f"Frame attachment stats: {frame_attacher.get_stats()}")
+        llm_client.close()
+        if response_cache is not None:
+            logging.info(f"LLM cache stats: {response_cache.get_stats()}")
+            response_cache.close()
+        if long_term_memory is not None:
+            long_term_memory.close()
+            logging.info(f"Long-term memory stats: {long_term_memory.get_stats()}")
+        if conversation_store is not None:
+            conversation_store.close()
+            logging.info(f"Conversation store stats: {conversation_store.get_stats()}")
         logging.info("VISION Robot shutdown complete")
 
 
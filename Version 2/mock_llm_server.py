@@ -0,0 +1,274 @@
+# mock_llm_server.py
+"""
+Локальный мок OpenAI-совместимого API (и Gemini generateContent) для тестов
+и бенчмарков без расхода реальных API-кредитов.
+Поддерживает распределения задержки (uniform, normal, lognormal), потоковые
+ответы (stream=true, SSE), ошибки 500 и ограничение частоты (429).
+
+429 и 500 - это инъекция отказов: клиент не выполняет Retry-After, а
+маршрутизатор считает такой ответ ошибкой провайдера (размыкатель цепи,
+переключение на другого провайдера). Так проверяется переключение, а не
+ожидание и повтор.
+
+Запуск: python mock_llm_server.py --port 8800 --delay 0.5 --jitter 0.2
+        python mock_llm_server.py --distribution lognormal --jitter 0.5 --max-rps 20
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+
+from aiohttp import web
+
+# Распределения задержки; jitter - разброс (uniform), стандартное отклонение
+# (normal) или sigma логнормального распределения с медианой delay (lognormal)
+DISTRIBUTIONS = ("uniform", "normal", "lognormal")
+
+
+class MockLLMServer:
+    """Мок-сервер LLM с искусственной задержкой и ошибками"""
+
+    def __init__(self, host="127.0.0.1", port=8800, delay=0.3, jitter=0.0, fail_rate=0.0, name="mock",
+                 distribution="uniform", rate_limit_rate=0.0, max_rps=None, token_delay=0.02):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.name = name
+        self.distribution = distribution
+        # Доля случайных ответов 429 и жёсткий лимит запросов в секунду
+        self.rate_limit_rate = rate_limit_rate
+        self.max_rps = max_rps
+        # Пауза между чанками потокового ответа
+        self.token_delay = token_delay
+        self.requests = 0
+        self.statuses = {}
+        # Клиентские сокеты (адрес:порт) - для оценки переиспользования соединений
+        self.connections = set()
+        self._window = []
+        # Уже встречавшиеся системные префиксы - имитация кэша префикса провайдера
+        self._seen_prefixes = set()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def gemini_base_url(self):
+        """base_url для GeminiClient: маршрут generateContent лежит под /v1beta"""
+        return f"http://{self.host}:{self.port}/v1beta"
+
+    def _make_app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_chat)
+        app.router.add_post("/v1beta/models/{model}:generateContent", self.handle_gemini)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    def _reply_text(self, messages):
+        last = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        images = []
+        if isinstance(last, list):
+            # Мультимодальное сообщение: текст и изображения (data URL)
+            images = [part['image_url'].get('url', '') for part in last
+                      if isinstance(part, dict) and part.get('type') == 'image_url']
+            last = " ".join(part['text'] for part in last if isinstance(part, dict) and 'text' in part)
+        reply = f"[{self.name}] Ответ на: {last[:80]}"
+        if images:
+            sizes = ", ".join(f"{len(url.split(',', 1)[-1]) * 3 // 4} байт" for url in images)
+            reply += f" (изображения: {sizes})"
+        return reply
+
+    def sample_delay(self):
+        """Задержка ответа по выбранному распределению"""
+        if self.distribution == "normal":
+            return max(0.0, random.gauss(self.delay, self.jitter))
+        if self.distribution == "lognormal":
+            return self.delay * random.lognormvariate(0.0, self.jitter)
+        return max(0.0, self.delay + random.uniform(-self.jitter, self.jitter))
+
+    def _rate_limited(self):
+        """Превышен ли лимит запросов за последнюю секунду"""
+        if random.random() < self.rate_limit_rate:
+            return True
+        if self.max_rps is None:
+            return False
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 1.0]
+        if len(self._window) >= self.max_rps:
+            return True
+        self._window.append(now)
+        return False
+
+    def _error(self, status, message, headers=None):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        return web.json_response({"error": {"message": message}}, status=status, headers=headers)
+
+    async def _simulate(self, request):
+        """Задержка и случайная ошибка; возвращает ответ с ошибкой или None"""
+        self.requests += 1
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer:
+            self.connections.add(peer[:2])
+        if self._rate_limited():
+            return self._error(429, "Rate limit exceeded", headers={"Retry-After": "1"})
+        await asyncio.sleep(self.sample_delay())
+        if random.random() < self.fail_rate:
+            return self._error(500, "Injected failure")
+        return None
+
+    async def handle_chat(self, request):
+        data = await request.json()
+        error = await self._simulate(request)
+        if error is not None:
+            return error
+        messages = data.get("messages", [])
+        text = self._reply_text(messages)
+        if data.get("stream"):
+            return await self._stream_chat(request, data, text)
+        self.statuses[200] = self.statuses.get(200, 0) + 1
+        prompt_tokens = max(1, len(json.dumps(messages, ensure_ascii=False)) // 4)
+        return web.json_response({
+            "id": f"mock-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": data.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(text.split()),
+                "total_tokens": prompt_tokens + len(text.split()),
+                "prompt_tokens_details": {"cached_tokens": self._cached_tokens(messages)}
+            }
+        })
+
+    async def _stream_chat(self, request, data, text):
+        """Потоковый ответ в формате SSE: по слову в чанке, затем [DONE]"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": f"mock-{self.requests}",
+                "object": "chat.completion.chunk",
+                "model": data.get("model", "mock"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                             "finish_reason": "stop" if i == len(words) - 1 else None}]
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        self.statuses[200] = self.statuses.get(200, 0) + 1
+        return response
+
+    def _cached_tokens(self, messages):
+        """Системные сообщения в начале запроса считаются закэшированными со второго раза"""
+        prefix = []
+        for message in messages:
+            if message.get("role") != "system":
+                break
+            prefix.append(message)
+        if not prefix:
+            return 0
+        key = json.dumps(prefix, ensure_ascii=False)
+        if key in self._seen_prefixes:
+            return len(key) // 4
+        self._seen_prefixes.add(key)
+        return 0
+
+    async def handle_gemini(self, request):
+        data = await request.json()
+        error = await self._simulate(request)
+        if error is not None:
+            return error
+        self.statuses[200] = self.statuses.get(200, 0) + 1
+        messages = [
+            {"role": c.get("role"), "content": " ".join(p.get("text", "") for p in c.get("parts", []))}
+            for c in data.get("contents", [])
+        ]
+        text = self._reply_text(messages)
+        return web.json_response({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": len(text.split())}
+        })
+
+    async def handle_stats(self, request):
+        return web.json_response(self.get_stats())
+
+    def get_stats(self):
+        """Число запросов, соединений и ответов по кодам"""
+        return {
+            "requests": self.requests,
+            "connections": len(self.connections),
+            "statuses": {str(status): count for status, count in self.statuses.items()}
+        }
+
+    def reset_stats(self):
+        self.requests = 0
+        self.statuses = {}
+        self.connections = set()
+
+    def start(self):
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self._run, name=f"mock-llm-{self.port}", daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=5)
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self._make_app())
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port).start())
+        logging.info(f"Mock LLM server '{self.name}' listening on {self.base_url}")
+        self._started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Мок OpenAI-совместимого LLM API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--delay", type=float, default=0.3, help="средняя задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, сек")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="доля ответов с ошибкой 500")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform",
+                        help="распределение задержки")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля случайных ответов 429")
+    parser.add_argument("--max-rps", type=int, default=None, help="лимит запросов в секунду (сверх - 429)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="пауза между чанками stream, сек")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockLLMServer(args.host, args.port, args.delay, args.jitter, args.fail_rate,
+                           distribution=args.distribution, rate_limit_rate=args.rate_limit_rate,
+                           max_rps=args.max_rps, token_delay=args.token_delay).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# prompt_prefix.py
+"""
+Неизменный префикс промпта (персона из config.SYSTEM_PROMPTS).
+Собирается один раз, заранее сериализуется в JSON и всегда передаётся
+побайтно одинаковым, чтобы провайдеры с кэшированием префикса (DeepSeek,
+OpenAI, Anthropic/Gemini через OpenRouter) могли его переиспользовать.
+"""
+
+import json
+import logging
+import threading
+
+
+def content_text(content):
+    """Текст сообщения: строка или список частей с полем text"""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+def cached_tokens(usage):
+    """Число закэшированных провайдером токенов промпта из поля usage ответа"""
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details") or {}
+    return (details.get("cached_tokens") or
+            usage.get("prompt_cache_hit_tokens") or  # DeepSeek
+            usage.get("cache_read_input_tokens") or  # Anthropic
+            0)
+
+
+class PromptPrefix:
+    """Байт-стабильный системный префикс с заранее сериализованным JSON"""
+
+    def __init__(self, system_prompt, cache_control=False):
+        if cache_control:
+            # Явная отметка для провайдеров, которые кэшируют только помеченные блоки
+            content = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        else:
+            content = system_prompt
+        self.system_prompt = system_prompt
+        self.messages = ({"role": "system", "content": content},)
+        # '[{...}' без закрывающей скобки - дальше дописываются остальные сообщения
+        self._encoded_head = json.dumps(list(self.messages), ensure_ascii=False)[:-1]
+
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    def starts(self, messages):
+        """Начинается ли список сообщений именно с этого префикса"""
+        n = len(self.messages)
+        return len(messages) >= n and all(messages[i] is self.messages[i] for i in range(n))
+
+    def encode_body(self, data):
+        """Сериализовать тело запроса, подставив готовый JSON префикса"""
+        messages = data["messages"]
+        if not self.starts(messages):
+            return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+        rest = [json.dumps(m, ensure_ascii=False) for m in messages[len(self.messages):]]
+        encoded_messages = self._encoded_head + "".join(", " + part for part in rest) + "]"
+        fields = [f'"messages": {encoded_messages}']
+        fields += [f"{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}"
+                   for k, v in data.items() if k != "messages"]
+        return ("{" + ", ".join(fields) + "}").encode("utf-8")
+
+    def record_usage(self, usage):
+        """Учесть usage ответа; возвращает число закэшированных токенов"""
+        cached = cached_tokens(usage)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += (usage or {}).get("prompt_tokens", 0)
+            self.stats["cached_tokens"] += cached
+        if cached:
+            logging.info(f"Provider prompt cache: {cached}/{usage.get('prompt_tokens', 0)} prompt tokens cached")
+        return cached
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["cached_ratio"] = (stats["cached_tokens"] / stats["prompt_tokens"]
+                                 if stats["prompt_tokens"] else 0.0)
+        return stats
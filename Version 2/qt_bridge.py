@@ -0,0 +1,64 @@
+# qt_bridge.py
+"""
+Мост между шиной событий и Qt: события из любых потоков ядра превращаются
+в сигналы, которые Qt доставляет в поток интерфейса через очередь.
+Кадры камеры не копятся: пока интерфейс не забрал прошлый кадр, новый
+сигнал не отправляется - виджет получает самый свежий.
+"""
+
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import event_bus
+
+
+class QtEventBridge(QObject):
+    """Сигналы Qt для событий шины"""
+
+    utterance_recognized = pyqtSignal(str)
+    turn_started = pyqtSignal(str, str)
+    turn_finished = pyqtSignal(str, object)
+    tokens_streamed = pyqtSignal(str)
+    message_added = pyqtSignal(object)
+    detections_updated = pyqtSignal(object, str)
+    frame_updated = pyqtSignal()
+    status_changed = pyqtSignal(str, str)
+
+    def __init__(self, bus, parent=None):
+        super().__init__(parent)
+        self.bus = bus
+        self._frame_lock = threading.Lock()
+        self._latest_frame = None
+        self._frame_pending = False
+
+        handlers = {
+            event_bus.UTTERANCE_RECOGNIZED: lambda e: self.utterance_recognized.emit(e.payload["text"]),
+            event_bus.TURN_STARTED: lambda e: self.turn_started.emit(e.payload["text"], e.payload["source"]),
+            event_bus.TURN_FINISHED: lambda e: self.turn_finished.emit(e.payload["text"], e.payload["response"]),
+            event_bus.TOKENS_STREAMED: lambda e: self.tokens_streamed.emit(e.payload["text"]),
+            event_bus.MESSAGE_ADDED: lambda e: self.message_added.emit(e.payload["message"]),
+            event_bus.DETECTIONS_UPDATED: lambda e: self.detections_updated.emit(
+                e.payload["detections"], e.payload["description"]),
+            event_bus.FRAME_UPDATED: self._on_frame,
+            event_bus.STATUS_CHANGED: lambda e: self.status_changed.emit(e.payload["component"], e.payload["state"]),
+        }
+        self._unsubscribe = [bus.subscribe(event_type, handler) for event_type, handler in handlers.items()]
+
+    def _on_frame(self, event):
+        with self._frame_lock:
+            self._latest_frame = event.payload["frame"]
+            if self._frame_pending:
+                return
+            self._frame_pending = True
+        self.frame_updated.emit()
+
+    def take_frame(self):
+        """Забрать самый свежий кадр (вызывается из слота frame_updated)"""
+        with self._frame_lock:
+            self._frame_pending = False
+            return self._latest_frame
+
+    def close(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
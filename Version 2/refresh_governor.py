@@ -0,0 +1,112 @@
+# refresh_governor.py
+"""
+Регулятор частоты обновления интерфейса.
+Следит за состоянием главного окна (свёрнуто, скрыто, перекрыто, не в фокусе)
+и за активностью пользователя и решает, как часто виджетам перерисовываться.
+Пока окно не видно, превью камеры не конвертируется вовсе; при возврате
+окна режим меняется сразу, по событию.
+"""
+
+import time
+import logging
+from collections import deque
+
+from PyQt5.QtCore import QObject, QEvent, QTimer, Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication
+
+from config import GUI_REFRESH_RATES, GUI_IDLE_TIMEOUT
+
+MODES = ("active", "background", "idle", "suspended")
+
+
+class RefreshGovernor(QObject):
+    """Режим обновления интерфейса: active, background, idle или suspended"""
+
+    mode_changed = pyqtSignal(str)
+
+    INPUT_EVENTS = frozenset((QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.KeyPress,
+                              QEvent.Wheel, QEvent.TouchBegin))
+    WINDOW_EVENTS = frozenset((QEvent.WindowStateChange, QEvent.ActivationChange, QEvent.Show,
+                               QEvent.Hide, QEvent.Expose))
+
+    def __init__(self, window, rates=GUI_REFRESH_RATES, idle_timeout=GUI_IDLE_TIMEOUT):
+        super().__init__(window)
+        self.window = window
+        self.rates = dict(rates)
+        self.idle_timeout = idle_timeout
+        self.mode = "active"
+        self.last_input = time.monotonic()
+        self.last_allowed = {}
+        self.rendered = {}
+        self.stats = {"transitions": 0, "allowed": 0, "skipped": 0}
+
+        app = QApplication.instance()
+        app.installEventFilter(self)
+        app.applicationStateChanged.connect(self.evaluate)
+
+        # Перекрытие окна и простой пользователя событий не дают - проверяем раз в секунду
+        self.check_timer = QTimer(self)
+        self.check_timer.timeout.connect(self.evaluate)
+        self.check_timer.start(1000)
+
+    def eventFilter(self, obj, event):
+        event_type = event.type()
+        if event_type in self.INPUT_EVENTS:
+            self.last_input = time.monotonic()
+            if self.mode == "idle":
+                self.evaluate()
+        elif obj is self.window and event_type in self.WINDOW_EVENTS:
+            # Отложенно: состояние окна обновляется после обработки события
+            QTimer.singleShot(0, self.evaluate)
+        return False
+
+    def current_mode(self):
+        window = self.window
+        state = QApplication.applicationState()
+        handle = window.windowHandle()
+        if (not window.isVisible() or window.isMinimized()
+                or state in (Qt.ApplicationHidden, Qt.ApplicationSuspended)
+                or (handle is not None and not handle.isExposed())):
+            return "suspended"
+        if time.monotonic() - self.last_input > self.idle_timeout:
+            return "idle"
+        if not window.isActiveWindow() or state != Qt.ApplicationActive:
+            return "background"
+        return "active"
+
+    def evaluate(self, *args):
+        mode = self.current_mode()
+        if mode == self.mode:
+            return
+        previous, self.mode = self.mode, mode
+        self.stats["transitions"] += 1
+        logging.info(f"GUI refresh mode: {previous} -> {mode} (camera {self.rates[mode]} fps)")
+        self.mode_changed.emit(mode)
+
+    def is_suspended(self):
+        return self.mode == "suspended"
+
+    def allow(self, component):
+        """Можно ли сейчас обновить компонент (ограничение частоты текущего режима)"""
+        fps = self.rates.get(self.mode, 0)
+        now = time.monotonic()
+        # Небольшой допуск, чтобы кадры источника с той же частотой не отбрасывались из-за дрожания
+        if fps <= 0 or now - self.last_allowed.get(component, 0.0) < 0.9 / fps:
+            self.stats["skipped"] += 1
+            return False
+        self.last_allowed[component] = now
+        self.rendered.setdefault(component, deque(maxlen=256)).append(now)
+        self.stats["allowed"] += 1
+        return True
+
+    def get_refresh_rates(self):
+        """Текущий режим, лимиты и фактическая частота обновления за последнюю секунду"""
+        now = time.monotonic()
+        measured = {component: sum(1 for t in times if now - t <= 1.0)
+                    for component, times in self.rendered.items()}
+        return {"mode": self.mode, "limit_fps": self.rates.get(self.mode, 0),
+                "measured_fps": measured, **self.stats}
+
+    def close(self):
+        self.check_timer.stop()
+        QApplication.instance().removeEventFilter(self)
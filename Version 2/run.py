@@ -6,81 +6,109 @@ import threading
 import subprocess
 from multiprocessing import Process
 import signal
+import shutil
 import platform
+import importlib.util
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('vision_robot.log'),
+        logging.FileHandler('vision_robot.log', delay=True),
         logging.StreamHandler()
     ]
 )
 
 logger = logging.getLogger(__name__)
-def check_dependencies():
-    required_packages = [
-        'cv2', 'numpy', 'speech_recognition', 'requests',
-        'ultralytics', 'PyQt5'
-    ]
-
-    missing_packages = []
-
-    for package in required_packages:
-        try:
-            if package == 'cv2':
-                import cv2
-            elif package == 'PyQt5':
-                import PyQt5
-            else:
-                __import__(package)
-        except ImportError:
-            missing_packages.append(package)
+# Модуль -> пакет pip
+REQUIRED_PACKAGES = {
+    'cv2': 'opencv-python',
+    'numpy': 'numpy',
+    'speech_recognition': 'SpeechRecognition',
+    'requests': 'requests',
+    'ultralytics': 'ultralytics',
+    'aiohttp': 'aiohttp',
+    'msgpack': 'msgpack',
+}
+
+
+def check_dependencies(gui=True):
+    required_packages = dict(REQUIRED_PACKAGES)
+    if gui:
+        required_packages['PyQt5'] = 'PyQt5'
+
+    # find_spec только ищет модуль, не импортируя его: ultralytics с torch
+    # грузятся секундами, а здесь нужно лишь знать, что они установлены
+    missing_packages = [module for module in required_packages
+                        if importlib.util.find_spec(module) is None]
 
     if missing_packages:
         logger.error(f"Отсутствуют зависимости: {', '.join(missing_packages)}")
         logger.info("Установите зависимости командой:")
-        logger.info("pip install opencv-python numpy SpeechRecognition requests ultralytics PyQt5")
+        logger.info("pip install " + " ".join(required_packages[module] for module in missing_packages))
         return False
 
     return True
 
 
-def check_system_requirements():
-    logger.info("Проверка системных требований...")
-
-    # Проверка камеры
+def check_camera():
     import cv2
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         logger.warning("Камера не найдена или недоступна")
         return False
     cap.release()
+    return True
 
-    # Проверка микрофона (базовая проверка)
+
+def check_microphone():
+    # Базовая проверка: микрофон открывается
     try:
         import speech_recognition as sr
-        r = sr.Recognizer()
-        with sr.Microphone() as source:
+        with sr.Microphone():
             pass
         logger.info("Микрофон доступен")
     except Exception as e:
         logger.warning(f"Проблема с микрофоном: {e}")
+        return False
+    return True
+
 
+def check_tts():
     # Проверка системы синтеза речи
     if sys.platform == "darwin":  # macOS
-        result = subprocess.run(['which', 'say'], capture_output=True)
-        if result.returncode != 0:
+        if shutil.which('say') is None:
             logger.warning("Команда 'say' не найдена. Синтез речи может не работать.")
+            return False
     elif sys.platform == "win32":  # Windows
         logger.info("На Windows используется встроенный синтез речи")
     else:  # Linux
-        result = subprocess.run(['which', 'espeak'], capture_output=True)
-        if result.returncode != 0:
+        if shutil.which('espeak') is None:
             logger.warning("Команда 'espeak' не найдена. Установите espeak для синтеза речи.")
-
+            return False
     return True
 
 
+def run_checks(gui=True):
+    """Проверки перед запуском: зависимости, камера, микрофон, синтез речи и конфигурация.
+
+    Независимые проверки идут параллельно; камера и микрофон ждут только
+    проверки зависимостей. Без камеры или конфигурации запуск невозможен.
+    """
+    from startup import StartupOrchestrator
+    from config import STARTUP_WORKERS
+
+    logger.info("Проверка зависимостей и системных требований...")
+    checks = StartupOrchestrator("checks", max_workers=STARTUP_WORKERS)
+    checks.add("dependencies", lambda: check_dependencies(gui=gui))
+    checks.add("camera", check_camera, deps=("dependencies",))
+    checks.add("microphone", check_microphone, deps=("dependencies",), required=False)
+    checks.add("tts", check_tts, required=False)
+    checks.add("config", check_config)
+    passed = checks.run()
+    logger.info(checks.format_timeline())
+    return passed
+
+
 def check_config():
     logger.info("Проверка конфигурации...")
 
@@ -104,6 +132,8 @@ def install_requirements():
         'numpy',
         'SpeechRecognition',
         'requests',
+        'aiohttp',
+        'msgpack',
         'ultralytics',
         'PyQt5'
     ]
@@ -167,6 +197,126 @@ def run_main_process():
         logger.error(f"Ошибка в основном процессе: {e}")
 
 
+def run_headless():
+    """Запуск основного процесса с веб-панелью вместо Qt-интерфейса (PyQt5 не загружается)"""
+    logger.info("Запуск основного процесса с веб-панелью...")
+    dashboard = None
+    try:
+        import main
+        from web_dashboard import WebDashboard
+        from config import (DASHBOARD_HOST, DASHBOARD_PORT, DASHBOARD_MAX_FPS, DASHBOARD_JPEG_QUALITY,
+                            DASHBOARD_MAX_WIDTH, DASHBOARD_HISTORY, DASHBOARD_ALLOWED_ORIGINS)
+        dashboard = WebDashboard(
+            main.event_bus,
+            get_conversation_since=main.get_conversation_since,
+            submit_user_input=main.submit_user_input,
+            host=DASHBOARD_HOST,
+            port=DASHBOARD_PORT,
+            max_fps=DASHBOARD_MAX_FPS,
+            jpeg_quality=DASHBOARD_JPEG_QUALITY,
+            max_width=DASHBOARD_MAX_WIDTH,
+            history=DASHBOARD_HISTORY,
+            allowed_origins=DASHBOARD_ALLOWED_ORIGINS
+        ).start()
+        logger.info(f"Веб-панель: {dashboard.url}")
+        main.main()
+    except Exception as e:
+        logger.error(f"Ошибка в основном процессе: {e}")
+    finally:
+        if dashboard is not None:
+            logger.info(f"Web dashboard stats: {dashboard.get_stats()}")
+            dashboard.stop()
+
+
+def start_headless():
+    """Проверки и запуск режима без графического интерфейса"""
+    logger.info("Режим: Без интерфейса (веб-панель)")
+
+    if not run_checks(gui=False):
+        logger.error("Проверки перед запуском не пройдены!")
+        return False
+
+    logger.info("Все проверки пройдены. Запуск без интерфейса...")
+    run_headless()
+    return True
+
+
+def run_core_server():
+    """Запуск ядра как отдельного процесса: интерфейсы подключаются к нему через локальный сокет"""
+    logger.info("Запуск ядра VISION Robot с сервером для интерфейса...")
+    server = None
+    try:
+        import main
+        from core_server import CoreServer
+        from config import (CORE_CLIENT_QUEUE_SIZE, CORE_SEND_TIMEOUT, CORE_FRAME_SLOTS, CORE_FRAME_MAX_BYTES,
+                            CORE_HISTORY)
+        server = CoreServer(
+            main,
+            queue_size=CORE_CLIENT_QUEUE_SIZE,
+            send_timeout=CORE_SEND_TIMEOUT,
+            frame_slots=CORE_FRAME_SLOTS,
+            frame_max_bytes=CORE_FRAME_MAX_BYTES,
+            history=CORE_HISTORY
+        ).start()
+        main.main()
+    except Exception as e:
+        logger.error(f"Ошибка в основном процессе: {e}")
+    finally:
+        if server is not None:
+            logger.info(f"Core server stats: {server.get_stats()}")
+            server.close()
+
+
+def run_remote_interface():
+    """Запуск интерфейса, подключённого к ядру в другом процессе (main не импортируется).
+
+    Окно строится, пока ядро загружает модели: ожидание подключения идёт
+    в пуле оркестратора, а Qt - в главном потоке.
+    """
+    logger.info("Подключение интерфейса к ядру...")
+    client = None
+    try:
+        from core_client import CoreClient
+        from startup import StartupOrchestrator
+        from config import CORE_CONNECT_TIMEOUT, STARTUP_WORKERS
+        client = CoreClient()
+        startup = StartupOrchestrator("interface", max_workers=STARTUP_WORKERS)
+        startup.add("core", lambda: client.connect(timeout=CORE_CONNECT_TIMEOUT))
+        startup.add("qt", lambda: importlib.import_module("interface"))
+        startup.add("gui", lambda: startup.result("qt").create_window(client), deps=("qt",), main_thread=True)
+        passed = startup.run()
+        logger.info(startup.format_timeline())
+        if not passed:
+            logger.error("Интерфейс не запущен: ядро или окно не готовы")
+            return
+        startup.result("qt").run_window(*startup.result("gui"))
+    except Exception as e:
+        logger.error(f"Ошибка в интерфейсе: {e}")
+    finally:
+        if client is not None:
+            client.close()
+
+
+def run_split_system():
+    """Ядро в отдельном процессе, интерфейс - в этом.
+
+    Зависание или падение интерфейса не останавливает голосовой цикл;
+    при закрытии интерфейса ядро завершается.
+    """
+    core_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--core"])
+    try:
+        # Интерфейс сам дождётся готовности сокета ядра
+        run_remote_interface()
+    finally:
+        if core_process.poll() is None:
+            logger.info("Останавливаем ядро...")
+            core_process.terminate()
+            try:
+                core_process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                core_process.kill()
+
+
 def run_interface():
     """Запуск интерфейса"""
     logger.info("Запуск интерфейса...")
@@ -191,10 +341,11 @@ def show_menu():
     print("Выберите режим запуска:")
     print("1. 🎤 Только основной процесс (голосовое управление)")
     print("2. 🖥️  Только интерфейс (GUI)")
-    print("3. 🚀 Полная система (основной процесс + интерфейс)")
-    print("4. 🛠️  Установить зависимости")
-    print("5. 🔧 Настроить систему")
-    print("6. ❌ Выход")
+    print("3. 🚀 Полная система (ядро и интерфейс в отдельных процессах)")
+    print("4. 🌐 Без интерфейса (основной процесс + веб-панель)")
+    print("5. 🛠️  Установить зависимости")
+    print("6. 🔧 Настроить систему")
+    print("7. ❌ Выход")
     print("=" * 60)
 
 
@@ -233,26 +384,34 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    # Встраиваемые системы без экрана: python run.py --headless
+    if "--headless" in sys.argv:
+        start_headless()
+        logger.info("VISION Robot - Завершение работы")
+        return 0
+
+    # Раздельные процессы: python run.py --core и python run.py --gui
+    if "--core" in sys.argv:
+        if check_dependencies(gui=False):
+            run_core_server()
+        logger.info("VISION Robot - Завершение работы")
+        return 0
+    if "--gui" in sys.argv:
+        if check_dependencies():
+            run_remote_interface()
+        logger.info("VISION Robot - Завершение работы")
+        return 0
+
     while True:
         show_menu()
-        choice = input("\nВведите номер (1-6): ").strip()
+        choice = input("\nВведите номер (1-7): ").strip()
 
         if choice == "1":
             logger.info("Режим: Только основной процесс")
 
-            # Проверяем зависимости
-            if not check_dependencies():
-                logger.error("Проверка зависимостей не пройдена!")
-                continue
-
-            # Проверяем системные требования
-            if not check_system_requirements():
-                logger.error("Проверка системных требований не пройдена!")
-                continue
-
-            # Проверяем конфигурацию
-            if not check_config():
-                logger.error("Проверка конфигурации не пройдена!")
+            # Проверяем зависимости, системные требования и конфигурацию
+            if not run_checks():
+                logger.error("Проверки перед запуском не пройдены!")
                 continue
 
             logger.info("Все проверки пройдены. Запуск основного процесса...")
@@ -274,49 +433,36 @@ def main():
         elif choice == "3":
             logger.info("Режим: Полная система")
 
-            # Проверяем зависимости
-            if not check_dependencies():
-                logger.error("Проверка зависимостей не пройдена!")
-                continue
-
-            # Проверяем системные требования
-            if not check_system_requirements():
-                logger.error("Проверка системных требований не пройдена!")
-                continue
-
-            # Проверяем конфигурацию
-            if not check_config():
-                logger.error("Проверка конфигурации не пройдена!")
+            # Проверяем зависимости, системные требования и конфигурацию
+            if not run_checks():
+                logger.error("Проверки перед запуском не пройдены!")
                 continue
 
             logger.info("Все проверки пройдены. Запуск полной системы...")
 
-            # Запускаем основной процесс в отдельном потоке
-            main_thread = threading.Thread(target=run_main_process, daemon=True)
-            main_thread.start()
-
-            # Даем время на инициализацию
-            time.sleep(2)
-
-            # Запускаем интерфейс в основном потоке
-            run_interface()
+            # Ядро и интерфейс - отдельные процессы, связанные локальным сокетом
+            run_split_system()
             break
 
         elif choice == "4":
+            if start_headless():
+                break
+
+        elif choice == "5":
             logger.info("Режим: Установка зависимостей")
             if install_requirements():
                 logger.info("Зависимости успешно установлены!")
             else:
                 logger.error("Ошибка установки зависимостей")
 
-        elif choice == "5":
+        elif choice == "6":
             logger.info("Режим: Настройка системы")
             if setup_system():
                 logger.info("Система успешно настроена!")
             else:
                 logger.error("Ошибка настройки системы")
 
-        elif choice == "6":
+        elif choice == "7":
             logger.info("Выход из программы")
             break
 
@@ -0,0 +1,177 @@
+# scene_state.py
+"""
+Инкрементальное состояние сцены по детекциям VisionProcessor.
+Для каждого класса хранится устойчивое число объектов (с гистерезисом, чтобы
+единичные пропуски детектора не давали ложных событий), грубое положение
+(слева/в центре/справа, близко/далеко) и события появления/исчезновения.
+Для промпта строится короткая сводка в пределах бюджета токенов и список
+изменений с прошлого хода.
+"""
+
+import time
+import threading
+from collections import deque
+
+from context_manager import estimate_tokens
+
+COLUMNS = ("слева", "в центре", "справа")
+
+
+class TrackedClass:
+    """Устойчивое состояние одного класса объектов"""
+
+    __slots__ = ("name", "count", "candidate", "streak", "column", "near", "area", "last_seen")
+
+    def __init__(self, name):
+        self.name = name
+        # Подтверждённое число объектов
+        self.count = 0
+        # Наблюдаемое число, ожидающее подтверждения, и сколько кадров подряд оно держится
+        self.candidate = 0
+        self.streak = 0
+        self.column = None
+        self.near = False
+        self.area = 0.0
+        self.last_seen = 0.0
+
+    def position(self):
+        if self.column is None:
+            return ""
+        return f"{COLUMNS[self.column]}, {'близко' if self.near else 'далеко'}"
+
+
+class SceneEvent:
+    """Изменение сцены: появление, исчезновение или смена числа объектов"""
+
+    __slots__ = ("seq", "timestamp", "kind", "name", "count", "previous")
+
+    def __init__(self, seq, kind, name, count, previous):
+        self.seq = seq
+        self.timestamp = time.time()
+        self.kind = kind
+        self.name = name
+        self.count = count
+        self.previous = previous
+
+    def describe(self):
+        if self.kind == "appeared":
+            return f"появился {self.name}" + (f" x{self.count}" if self.count > 1 else "")
+        if self.kind == "disappeared":
+            return f"исчез {self.name}"
+        return f"{self.name}: {self.previous} -> {self.count}"
+
+
+class SceneState:
+    """Состояние сцены, обновляемое за O(детекций) на кадр"""
+
+    def __init__(self, appear_frames=2, disappear_frames=4, near_area=0.1, max_events=100):
+        # Сколько кадров подряд новое число объектов должно держаться, чтобы его принять
+        self.appear_frames = appear_frames
+        self.disappear_frames = disappear_frames
+        # Доля площади кадра, начиная с которой объект считается близким
+        self.near_area = near_area
+        self.lock = threading.Lock()
+        self.classes = {}
+        self.events = deque(maxlen=max_events)
+        self.event_seq = 0
+        self.frames = 0
+
+    def update(self, detections, frame_shape):
+        """Учесть детекции очередного кадра"""
+        height, width = frame_shape[:2]
+        frame_area = float(width * height) or 1.0
+
+        # Число объектов и самый крупный объект каждого класса на этом кадре
+        observed = {}
+        for detection in detections:
+            x1, y1, x2, y2 = detection['bbox']
+            area = max(0, x2 - x1) * max(0, y2 - y1) / frame_area
+            entry = observed.get(detection['class'])
+            if entry is None:
+                observed[detection['class']] = [1, area, (x1 + x2) / 2.0]
+            else:
+                entry[0] += 1
+                if area > entry[1]:
+                    entry[1], entry[2] = area, (x1 + x2) / 2.0
+
+        now = time.time()
+        with self.lock:
+            self.frames += 1
+            for name in observed.keys() - self.classes.keys():
+                self.classes[name] = TrackedClass(name)
+
+            for name, tracked in self.classes.items():
+                count, area, center_x = observed.get(name, (0, 0.0, None))
+                if count:
+                    tracked.column = min(2, int(3 * center_x / width)) if width else 1
+                    tracked.near = area >= self.near_area
+                    tracked.area = area
+                    tracked.last_seen = now
+                self._apply(tracked, count)
+
+            # Давно исчезнувшие классы больше не нужны
+            for name in [n for n, t in self.classes.items() if not t.count and not t.candidate]:
+                del self.classes[name]
+
+    def _apply(self, tracked, count):
+        """Гистерезис: новое число принимается после нескольких кадров подряд"""
+        if count == tracked.count:
+            tracked.candidate, tracked.streak = count, 0
+            return
+        if count == tracked.candidate:
+            tracked.streak += 1
+        else:
+            tracked.candidate, tracked.streak = count, 1
+
+        needed = self.disappear_frames if count < tracked.count else self.appear_frames
+        if tracked.streak < needed:
+            return
+
+        previous, tracked.count = tracked.count, count
+        tracked.streak = 0
+        if previous == 0:
+            kind = "appeared"
+        elif count == 0:
+            kind = "disappeared"
+            tracked.column = None
+        else:
+            kind = "count"
+        self.event_seq += 1
+        self.events.append(SceneEvent(self.event_seq, kind, tracked.name, count, previous))
+
+    def changes_since(self, seq):
+        """События после номера seq"""
+        with self.lock:
+            return [event for event in self.events if event.seq > seq]
+
+    def summary(self, max_tokens=60):
+        """Текущая сцена: самые заметные объекты в пределах бюджета токенов"""
+        with self.lock:
+            visible = sorted((t for t in self.classes.values() if t.count),
+                             key=lambda t: (t.near, t.area, t.count), reverse=True)
+            items = [f"{t.name}" + (f" x{t.count}" if t.count > 1 else "") + f" ({t.position()})"
+                     for t in visible]
+        if not items:
+            return "в кадре никого и ничего не видно"
+
+        text = ""
+        for i, item in enumerate(items):
+            candidate = f"{text}, {item}" if text else item
+            if text and estimate_tokens(candidate) > max_tokens:
+                return f"{text} и ещё {len(items) - i}"
+            text = candidate
+        return text
+
+    def describe(self, since_seq=None, max_tokens=80):
+        """Сводка для промпта: сцена сейчас и изменения с прошлого хода"""
+        text = f"Сейчас в кадре: {self.summary(max_tokens)}"
+        if since_seq is not None:
+            changes = self.changes_since(since_seq)
+            if changes:
+                described = "; ".join(event.describe() for event in changes[-5:])
+                text += f". С прошлой реплики: {described}"
+        return text
+
+    def get_stats(self):
+        with self.lock:
+            return {"frames": self.frames, "tracked_classes": len(self.classes), "events": self.event_seq}
@@ -0,0 +1,123 @@
+# speculative.py
+"""
+Спекулятивный запрос к LLM по промежуточным результатам распознавания речи.
+Пока пользователь договаривает, стабильная частичная расшифровка запускает
+предварительный запрос. Если финальная расшифровка достаточно похожа - ответ
+используется, иначе запрос отменяется.
+"""
+
+import logging
+import threading
+from difflib import SequenceMatcher
+
+from llm_cache import normalize_prompt
+
+
+class Speculation:
+    """Запущенный предварительный запрос"""
+
+    __slots__ = ("text", "normalized", "future", "token", "prompt_tokens")
+
+    def __init__(self, text, future, token, prompt_tokens):
+        self.text = text
+        self.normalized = normalize_prompt(text)
+        self.future = future
+        self.token = token
+        self.prompt_tokens = prompt_tokens
+
+
+class SpeculativePrefetcher:
+    """Следит за частичными расшифровками и управляет предварительными запросами"""
+
+    def __init__(self, start_fn, stable_updates=2, min_chars=10, match_threshold=0.9):
+        # start_fn(text) -> Speculation или None, если запрос не нужен
+        self.start_fn = start_fn
+        self.stable_updates = stable_updates
+        self.min_chars = min_chars
+        self.match_threshold = match_threshold
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.current = None
+        self._last_partial = None
+        self._repeats = 0
+        self.stats = {
+            "started": 0,
+            "hits": 0,
+            "misses": 0,
+            "wasted_prompt_tokens": 0,
+            "wasted_completion_tokens": 0
+        }
+
+    def on_partial(self, text):
+        """Новая частичная расшифровка от потокового распознавателя"""
+        normalized = normalize_prompt(text or "")
+        with self.lock:
+            if normalized == self._last_partial:
+                self._repeats += 1
+            else:
+                self._last_partial = normalized
+                self._repeats = 1
+
+            stable = self._repeats >= self.stable_updates
+            if (not self.enabled or not stable or len(normalized) < self.min_chars or
+                    (self.current is not None and self.current.normalized == normalized)):
+                return
+
+            # Гипотеза изменилась - старый запрос больше не нужен
+            self._discard(self.current)
+            self.current = None
+
+        speculation = self.start_fn(text)
+        if speculation is None:
+            return
+        with self.lock:
+            self.current = speculation
+            self.stats["started"] += 1
+        logging.info(f"Speculative LLM request for partial: {text}")
+
+    def on_final(self, text):
+        """Финальная расшифровка: вернуть подходящий запрос или None"""
+        with self.lock:
+            speculation, self.current = self.current, None
+            self._last_partial = None
+            self._repeats = 0
+            if speculation is None:
+                return None
+
+            similarity = SequenceMatcher(None, speculation.normalized, normalize_prompt(text)).ratio()
+            if similarity >= self.match_threshold:
+                self.stats["hits"] += 1
+                logging.info(f"Speculative request hit (similarity {similarity:.2f})")
+                return speculation
+
+            self.stats["misses"] += 1
+            logging.info(f"Speculative request miss (similarity {similarity:.2f})")
+            self._discard(speculation)
+            return None
+
+    def reset(self):
+        """Отменить текущий предварительный запрос (например, при завершении сессии)"""
+        with self.lock:
+            self._discard(self.current)
+            self.current = None
+            self._last_partial = None
+            self._repeats = 0
+
+    def _discard(self, speculation):
+        if speculation is None:
+            return
+        speculation.token.cancel()
+        self.stats["wasted_prompt_tokens"] += speculation.prompt_tokens
+        if speculation.future.done() and not speculation.future.cancelled():
+            try:
+                result = speculation.future.result()
+                self.stats["wasted_completion_tokens"] += result.usage.get("completion_tokens", 0)
+            except Exception:
+                pass
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        finished = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / finished if finished else 0.0
+        return stats
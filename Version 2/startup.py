@@ -0,0 +1,168 @@
+# startup.py
+"""
+Оркестратор запуска: задачи инициализации (загрузка моделей, камера,
+микрофон, синтез речи, соединение с LLM, интерфейс) описываются графом
+зависимостей. Независимые задачи выполняются параллельно в пуле потоков,
+зависимые - сразу, как только готовы все их зависимости, без фиксированных
+пауз. После запуска выводится таймлайн задач с критическим путём.
+
+Задача считается неудачной, если функция бросила исключение или вернула
+False; зависящие от неё задачи пропускаются. Задачи с main_thread=True
+(создание окна Qt) выполняются в потоке, вызвавшем run().
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class StartupTask:
+    """Задача инициализации и её результат"""
+
+    def __init__(self, name, func, deps=(), required=True, main_thread=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.required = required
+        self.main_thread = main_thread
+        self.status = None
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.thread = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class StartupOrchestrator:
+    """Запуск графа задач инициализации"""
+
+    def __init__(self, name="startup", max_workers=4):
+        self.name = name
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, name, func, deps=(), required=True, main_thread=False):
+        """Добавить задачу; required=False - её неудача не срывает запуск"""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate startup task: {name}")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Unknown dependency '{dep}' of startup task '{name}'")
+        self.tasks[name] = StartupTask(name, func, deps, required, main_thread)
+        return self
+
+    def result(self, name, default=None):
+        """Результат выполненной задачи (default, если она не выполнилась)"""
+        task = self.tasks.get(name)
+        if task is None or task.status != OK:
+            return default
+        return task.result
+
+    def _execute(self, task):
+        task.thread = threading.current_thread().name
+        task.started = time.perf_counter()
+        try:
+            task.result = task.func()
+            task.status = FAILED if task.result is False else OK
+        except Exception as e:
+            task.error = e
+            task.status = FAILED
+        task.finished = time.perf_counter()
+        if task.status == FAILED:
+            log = logging.error if task.required else logging.warning
+            log(f"Startup task '{task.name}' failed" + (f": {task.error}" if task.error else ""))
+        return task
+
+    def run(self):
+        """Выполнить все задачи; True, если не сорвалась ни одна обязательная"""
+        self.started = time.perf_counter()
+        done = queue.Queue()
+        pending = dict(self.tasks)
+        running = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as pool:
+            while pending or running:
+                main_ready = []
+                scheduled = True
+                while scheduled:
+                    # Пропуск тоже завершает задачу, поэтому проверяем зависимые ещё раз
+                    scheduled = False
+                    for task in list(pending.values()):
+                        if any(self.tasks[dep].status is None for dep in task.deps):
+                            continue
+                        del pending[task.name]
+                        scheduled = True
+                        failed = [dep for dep in task.deps if self.tasks[dep].status != OK]
+                        if failed:
+                            task.status = SKIPPED
+                            logging.warning(f"Startup task '{task.name}' skipped: {', '.join(failed)} not ready")
+                        elif task.main_thread:
+                            main_ready.append(task)
+                        else:
+                            running += 1
+                            pool.submit(self._execute, task).add_done_callback(lambda future: done.put(None))
+                for task in main_ready:
+                    self._execute(task)
+                if main_ready:
+                    continue
+                if running:
+                    done.get()
+                    running -= 1
+        self.finished = time.perf_counter()
+        return all(task.status == OK for task in self.tasks.values() if task.required)
+
+    def critical_path(self):
+        """Цепочка задач, определившая общее время запуска"""
+        finished = [task for task in self.tasks.values() if task.finished is not None]
+        if not finished:
+            return []
+        task = max(finished, key=lambda t: t.finished)
+        path = [task]
+        while True:
+            deps = [self.tasks[dep] for dep in task.deps if self.tasks[dep].finished is not None]
+            if not deps:
+                break
+            task = max(deps, key=lambda t: t.finished)
+            path.append(task)
+        return [task.name for task in reversed(path)]
+
+    def format_timeline(self, width=40):
+        """Таймлайн задач: смещение начала, длительность, статус и полоса"""
+        if self.started is None:
+            return f"{self.name}: not started"
+        total = (self.finished or time.perf_counter()) - self.started
+        scale = width / total if total > 0 else 0.0
+        name_width = max(len(name) for name in self.tasks) if self.tasks else 0
+        lines = [f"{self.name} timeline: {total * 1000:.0f} ms, "
+                 f"critical path: {' -> '.join(self.critical_path()) or '-'}"]
+        for task in sorted(self.tasks.values(), key=lambda t: (t.started is None, t.started or 0.0)):
+            if task.started is None:
+                lines.append(f"  {task.name:<{name_width}}  {'':{width}}  {'':>18}  {task.status}")
+                continue
+            begin = task.started - self.started
+            end = task.finished - self.started
+            start_col = int(begin * scale)
+            bar_len = max(1, int(end * scale) - start_col)
+            bar = (" " * start_col + "#" * bar_len)[:width]
+            lines.append(f"  {task.name:<{name_width}}  {bar:<{width}}  "
+                         f"{begin * 1000:6.0f} +{task.duration * 1000:7.0f} ms  {task.status}")
+        return "\n".join(lines)
+
+    def get_stats(self):
+        """Длительность и статус каждой задачи"""
+        return {name: {"status": task.status, "duration": task.duration, "thread": task.thread}
+                for name, task in self.tasks.items()}
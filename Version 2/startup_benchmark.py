@@ -0,0 +1,108 @@
+# startup_benchmark.py
+"""
+Замер времени запуска: импорт run и main (python -X importtime) и время
+до появления меню run.py. Печатает самые дорогие модули и сравнивает
+результат с бюджетами STARTUP_* из config.py; при превышении код выхода 1.
+
+Каждый замер - отдельный свежий интерпретатор, берётся медиана.
+
+Запуск: python startup_benchmark.py
+        python startup_benchmark.py --runs 5 --top 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+from config import STARTUP_IMPORT_RUN_BUDGET, STARTUP_IMPORT_MAIN_BUDGET, STARTUP_MENU_BUDGET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MENU_MARKER = "Выберите режим запуска"
+
+
+def import_times(module):
+    """Накопленное время импорта (мкс) по модулям для одного свежего процесса"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure_import(module, runs):
+    """Медиана времени импорта (с) и модули последнего замера"""
+    totals = []
+    times = {}
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(times.get(module, 0) / 1e6)
+    return statistics.median(totals), times
+
+
+def time_to_menu():
+    """Секунды от запуска run.py до вывода меню"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", "run.py"], cwd=HERE, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        for line in process.stdout:
+            if MENU_MARKER in line:
+                elapsed = time.perf_counter() - started
+                process.communicate("7\n", timeout=10)
+                return elapsed
+        raise RuntimeError("run.py exited before showing the menu")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def print_top(module, times, top):
+    print(f"  самые дорогие модули при import {module}:")
+    # Пакеты верхнего уровня, без повторного счёта вложенных модулей
+    roots = {name: us for name, us in times.items() if "." not in name and name != module}
+    for name, us in sorted(roots.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска VISION Robot")
+    parser.add_argument("--runs", type=int, default=3, help="замеров на каждую метрику")
+    parser.add_argument("--top", type=int, default=10, help="сколько модулей показать")
+    args = parser.parse_args()
+
+    results = []
+    for module, budget in (("run", STARTUP_IMPORT_RUN_BUDGET), ("main", STARTUP_IMPORT_MAIN_BUDGET)):
+        elapsed, times = measure_import(module, args.runs)
+        results.append((f"import {module}", elapsed, budget))
+        print(f"import {module}: {elapsed * 1000:.1f} ms (бюджет {budget * 1000:.0f} ms)")
+        print_top(module, times, args.top)
+
+    elapsed = statistics.median(time_to_menu() for _ in range(args.runs))
+    results.append(("menu", elapsed, STARTUP_MENU_BUDGET))
+    print(f"меню run.py: {elapsed * 1000:.1f} ms (бюджет {STARTUP_MENU_BUDGET * 1000:.0f} ms)")
+
+    over = [name for name, elapsed, budget in results if elapsed > budget]
+    if over:
+        print(f"Превышен бюджет: {', '.join(over)}")
+        return 1
+    print("Все замеры в пределах бюджета")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
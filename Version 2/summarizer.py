@@ -0,0 +1,99 @@
+# summarizer.py
+"""
+Фоновое сворачивание старых реплик диалога в краткое содержание.
+Работает в отдельном потоке и никогда не задерживает ответ пользователю.
+"""
+
+import logging
+import threading
+
+ROLE_NAMES = {
+    "user": "Пользователь",
+    "assistant": "ВИЖН"
+}
+
+
+def format_turns(turns):
+    """Представить реплики в виде текста для суммаризации"""
+    return "\n".join(f"{ROLE_NAMES.get(t['role'], t['role'])}: {t['content']}" for t in turns)
+
+
+class RollingSummarizer:
+    """Сворачивает старую часть истории в бегущее краткое содержание"""
+
+    def __init__(self, history, summarize_fn, trigger_messages=30, keep_recent=12, check_interval=5.0):
+        self.history = history
+        self.summarize_fn = summarize_fn
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.check_interval = check_interval
+        self.summary = ""
+        self.archived_count = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="summarizer", daemon=True)
+        self.thread.start()
+        logging.info("Conversation summarizer started")
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+
+    def notify(self):
+        """Сообщить, что история изменилась (дешево, можно вызывать на каждом ходе)"""
+        if len(self.history) > self.trigger_messages:
+            self._wakeup.set()
+
+    def get_summary(self):
+        with self.lock:
+            return self.summary
+
+    def snapshot(self):
+        """Согласованная пара: число свёрнутых сообщений и копия оставшейся истории"""
+        with self.lock:
+            return self.archived_count, self.history.copy()
+
+    def _loop(self):
+        while self.running:
+            self._wakeup.wait(self.check_interval)
+            self._wakeup.clear()
+            if not self.running:
+                break
+            try:
+                if len(self.history) > self.trigger_messages:
+                    self._fold()
+            except Exception as e:
+                logging.error(f"Summarizer error: {e}")
+
+    def _fold(self):
+        """Свернуть всё, кроме последних keep_recent реплик"""
+        count = len(self.history) - self.keep_recent
+        if count <= 0:
+            return
+        old_turns = self.history[:count]
+
+        # Долгий вызов LLM - вне блокировки
+        new_summary = self.summarize_fn(self.get_summary(), format_turns(old_turns))
+        if not new_summary:
+            return
+
+        with self.lock:
+            # В историю только дописывают в конец, но проверим, что начало не изменилось
+            if self.history[:count] != old_turns:
+                logging.warning("History changed during summarization, skipping trim")
+                return
+            del self.history[:count]
+            self.archived_count += count
+            self.summary = new_summary
+
+        logging.info(f"Summarized {count} old messages ({self.archived_count} total), "
+                     f"summary length {len(new_summary)} chars")
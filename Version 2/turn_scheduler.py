@@ -0,0 +1,183 @@
+# turn_scheduler.py
+"""
+Последовательный планировщик ходов диалога.
+Все ходы (голос, текст из интерфейса, проактивные реплики) выполняются
+по одному в отдельном потоке, поэтому история и глобальное состояние не
+перемешиваются. Очередь ограничена и упорядочена по приоритету
+(голос > текст > проактивные); одинаковые запросы объединяются.
+"""
+
+import time
+import queue
+import heapq
+import logging
+import threading
+import concurrent.futures
+
+from llm_cache import normalize_prompt
+
+# Приоритеты источников: меньше - важнее
+PRIORITIES = {
+    "voice": 0,
+    "typed": 1,
+    "proactive": 2
+}
+
+
+class Turn:
+    """Ход в очереди"""
+
+    __slots__ = ("priority", "seq", "source", "kind", "text", "keys", "options", "future", "enqueued_at")
+
+    def __init__(self, priority, seq, source, kind, text, options):
+        self.priority = priority
+        self.seq = seq
+        self.source = source
+        # "input" - ввод пользователя для LLM; другие виды только записываются в историю
+        self.kind = kind
+        self.text = text
+        # Нормализованные тексты всех объединённых в ход сообщений
+        self.keys = {normalize_prompt(text)}
+        self.options = options
+        self.future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TurnScheduler:
+    """Приоритетная ограниченная очередь ходов с одним исполнителем"""
+
+    def __init__(self, handler, max_queue=8):
+        # handler(turn) -> ответ; вызывается только из потока планировщика
+        self.handler = handler
+        self.max_queue = max_queue
+        self.condition = threading.Condition()
+        self.heap = []
+        self.in_flight = None
+        self.running = False
+        self.thread = None
+        self._seq = 0
+        self.stats = {"processed": 0, "deduplicated": 0, "coalesced": 0, "dropped": 0}
+        self.wait_stats = {}
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="turn-scheduler", daemon=True)
+        self.thread.start()
+        logging.info("Turn scheduler started")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            for turn in self.heap:
+                turn.future.cancel()
+            self.heap = []
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+
+    def submit(self, text, source="typed", kind="input", **options):
+        """Поставить ход в очередь; возвращает concurrent.futures.Future с ответом"""
+        priority = PRIORITIES.get(source, PRIORITIES["typed"])
+        with self.condition:
+            self._seq += 1
+            turn = Turn(priority, self._seq, source, kind, text, options)
+
+            # Такой же запрос ещё ждёт в очереди - не дублируем. С уже начатым
+            # ходом не сравниваем: повтор после его начала - новый ход
+            for existing in self.heap:
+                if (turn.keys <= existing.keys and existing.source == turn.source and
+                        existing.kind == turn.kind):
+                    self.stats["deduplicated"] += 1
+                    self._cancel_options(turn)
+                    return existing.future
+
+            # Несколько сообщений от одного источника, пришедших во время хода, - один ход
+            if kind == "input":
+                for existing in self.heap:
+                    if existing.source == source and existing.kind == kind:
+                        existing.text = f"{existing.text}\n{text}"
+                        existing.keys |= turn.keys
+                        self._cancel_options(existing)
+                        self._cancel_options(turn)
+                        self.stats["coalesced"] += 1
+                        return existing.future
+
+            if len(self.heap) >= self.max_queue:
+                worst = max(self.heap)
+                if turn < worst:
+                    # Вытесняем наименее важный ход
+                    self.heap.remove(worst)
+                    heapq.heapify(self.heap)
+                    self._cancel_options(worst)
+                    worst.future.set_exception(queue.Full("Turn dropped: queue is full"))
+                else:
+                    self.stats["dropped"] += 1
+                    self._cancel_options(turn)
+                    turn.future.set_exception(queue.Full("Turn rejected: queue is full"))
+                    return turn.future
+                self.stats["dropped"] += 1
+
+            heapq.heappush(self.heap, turn)
+            self.condition.notify()
+            return turn.future
+
+    @staticmethod
+    def _cancel_options(turn):
+        """Ход объединён с другим - его предварительный запрос не понадобится"""
+        prefetched = turn.options.pop("prefetched", None)
+        if prefetched is not None:
+            prefetched.token.cancel()
+
+    def is_idle(self):
+        with self.condition:
+            return self.in_flight is None and not self.heap
+
+    def _loop(self):
+        while True:
+            with self.condition:
+                while self.running and not self.heap:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                turn = heapq.heappop(self.heap)
+                self.in_flight = turn
+                self._record_wait(turn)
+
+            if turn.future.set_running_or_notify_cancel():
+                try:
+                    turn.future.set_result(self.handler(turn))
+                except Exception as e:
+                    logging.error(f"Turn processing error: {e}")
+                    turn.future.set_exception(e)
+
+            with self.condition:
+                self.in_flight = None
+                self.stats["processed"] += 1
+
+    def _record_wait(self, turn):
+        wait = time.monotonic() - turn.enqueued_at
+        entry = self.wait_stats.setdefault(turn.source, {"count": 0, "total_wait": 0.0, "max_wait": 0.0})
+        entry["count"] += 1
+        entry["total_wait"] += wait
+        entry["max_wait"] = max(entry["max_wait"], wait)
+
+    def get_stats(self):
+        """Глубина очереди, время ожидания по источникам и счётчики"""
+        with self.condition:
+            stats = dict(self.stats)
+            stats["queue_depth"] = len(self.heap)
+            stats["in_flight"] = self.in_flight.source if self.in_flight else None
+            stats["wait"] = {
+                source: {
+                    "count": entry["count"],
+                    "avg_wait": entry["total_wait"] / entry["count"],
+                    "max_wait": entry["max_wait"]
+                }
+                for source, entry in self.wait_stats.items()
+            }
+        return stats
@@ -4,10 +4,18 @@ import time
 import json
 import logging
 import platform
+import threading
 import subprocess
 from datetime import datetime
 from typing import List, Dict, Optional, Any
-import cv2
+
+# cv2 и ultralytics (torch) импортируются при первом использовании:
+# текстовым помощникам и меню запуска они не нужны
+_yolo_models = {}
+_yolo_lock = threading.Lock()
+# Модели ultralytics не потокобезопасны: прогрев и детекция идут по одной
+_yolo_inference_lock = threading.Lock()
+
 # Настройка логирования
 def setup_logging(log_level: str = "INFO", log_file: str = "vision_robot.log"):
     """Настройка системы логирования"""
@@ -197,6 +205,7 @@ def get_camera_info() -> Dict[str, Any]:
 
 def capture_frame(camera_index=0):
     """Захватить кадр с камеры"""
+    import cv2
     cap = cv2.VideoCapture(camera_index)
     if not cap.isOpened():
         return None
@@ -210,12 +219,39 @@ def capture_frame(camera_index=0):
     return frame
 
 
+def load_yolo_model(model_path="yolov8n.pt"):
+    """Модель YOLO, загружаемая один раз на путь; None, если загрузить не удалось"""
+    with _yolo_lock:
+        if model_path not in _yolo_models:
+            try:
+                from ultralytics import YOLO
+                _yolo_models[model_path] = YOLO(model_path)
+                logging.info(f"YOLO model loaded: {model_path}")
+            except Exception as e:
+                logging.error(f"Failed to load YOLO model: {e}")
+                _yolo_models[model_path] = None
+        return _yolo_models[model_path]
+
+
+def warm_up_yolo_model(model_path="yolov8n.pt", size=640):
+    """Загрузить модель и прогнать пустой кадр: первый настоящий кадр не ждёт инициализации"""
+    model = load_yolo_model(model_path)
+    if model is None:
+        return False
+    import numpy as np
+    with _yolo_inference_lock:
+        model(np.zeros((size, size, 3), dtype=np.uint8), verbose=False)
+    return True
+
+
 def detect_objects(frame, model_path="yolov8n.pt", confidence=0.5):
     """Обнаружение объектов на изображении с помощью YOLO"""
+    model = load_yolo_model(model_path)
+    if model is None:
+        return []
     try:
-        from ultralytics import YOLO
-        model = YOLO(model_path)
-        results = model(frame, conf=confidence)
+        with _yolo_inference_lock:
+            results = model(frame, conf=confidence)
 
         detections = []
         for result in results:
@@ -261,6 +297,7 @@ def format_detection_results(detections, max_objects=5):
 
 def draw_detections(frame, detections):
     """Отрисовать обнаруженные объекты на изображении"""
+    import cv2
     for obj in detections:
         x1, y1, x2, y2 = obj['bbox']
         class_name = obj['class']
@@ -1,34 +1,56 @@
 # vision_processor.py
-import cv2
 import time
 import logging
-from threading import Thread, Lock
+from collections import deque
+from threading import Thread, Lock, Event
+from event_bus import FRAME_UPDATED, DETECTIONS_UPDATED
 from utils import capture_frame, detect_objects, format_detection_results, draw_detections
 class VisionProcessor:
-    def __init__(self, camera_index=0, model_path="yolov8n.pt", update_interval=0.5):
+    def __init__(self, camera_index=0, model_path="yolov8n.pt", update_interval=0.5, scene_state=None,
+                 frame_window=5, event_bus=None):
         self.camera_index = camera_index
         self.model_path = model_path
         self.update_interval = update_interval
         self.latest_frame = None
         self.latest_detections = []
         self.latest_description = ""
+        # Накопленное состояние сцены (SceneState) для промптов
+        self.scene_state = scene_state
+        # Последние исходные кадры с номерами - для вложений в запросы к LLM
+        self.frame_seq = 0
+        self.recent_frames = deque(maxlen=frame_window)
+        # Шина событий: новые кадры, изменения детекций и статус камеры
+        self.event_bus = event_bus
         self.running = False
         self.lock = Lock()
         self.thread = None
         self.cap = None
+        # Сигнал готовности: первый кадр обработан
+        self.ready = Event()
 
-    def start(self):
-        if self.running:
-            return
+    def open_camera(self):
+        """Открыть камеру; True, если она доступна (повторно не открывает)"""
+        if self.cap is not None and self.cap.isOpened():
+            return True
 
         # Инициализируем камеру только один раз
         try:
+            import cv2
             self.cap = cv2.VideoCapture(self.camera_index)
             if not self.cap.isOpened():
                 logging.error(f"Cannot open camera at index {self.camera_index}")
-                return
+                self._set_status("unavailable")
+                return False
         except Exception as e:
             logging.error(f"Camera init error: {e}")
+            self._set_status("unavailable")
+            return False
+        return True
+
+    def start(self):
+        if self.running:
+            return
+        if not self.open_camera():
             return
 
         self.running = True
@@ -36,6 +58,12 @@ class VisionProcessor:
         self.thread.start()
         logging.info("Vision processor started")
 
+    def wait_ready(self, timeout=None):
+        """Дождаться первого обработанного кадра; False по таймауту или если камера не запущена"""
+        if not self.running:
+            return False
+        return self.ready.wait(timeout)
+
     def stop(self):
         self.running = False
         if self.thread and self.thread.is_alive():
@@ -44,8 +72,13 @@ class VisionProcessor:
         # Важно: освобождаем ресурсы камеры
         if self.cap and self.cap.isOpened():
             self.cap.release()
+        self._set_status("stopped")
         logging.info("Vision processor stopped")
 
+    def _set_status(self, state):
+        if self.event_bus is not None:
+            self.event_bus.set_status("camera", state)
+
     def _process_loop(self):
         while self.running:
             try:
@@ -54,12 +87,16 @@ class VisionProcessor:
                     ret, frame = self.cap.read()
                     if not ret:
                         logging.warning("Failed to capture frame")
+                        self._set_status("no_signal")
                         time.sleep(0.5)
                         continue
 
                     # Обнаружение объектов
                     detections = detect_objects(frame, self.model_path)
 
+                    if self.scene_state is not None:
+                        self.scene_state.update(detections, frame.shape)
+
                     # Форматируем описание
                     description = format_detection_results(detections)
 
@@ -68,9 +105,20 @@ class VisionProcessor:
 
                     # Обновляем данные
                     with self.lock:
+                        self.frame_seq += 1
+                        self.recent_frames.append((self.frame_seq, frame))
                         self.latest_frame = annotated_frame
                         self.latest_detections = detections
+                        changed = description != self.latest_description
                         self.latest_description = description
+                    self.ready.set()
+
+                    if self.event_bus is not None:
+                        self._set_status("active")
+                        self.event_bus.publish(FRAME_UPDATED, frame=annotated_frame, seq=self.frame_seq)
+                        if changed:
+                            self.event_bus.publish(DETECTIONS_UPDATED, detections=detections,
+                                                   description=description)
                 else:
                     time.sleep(1)
             except Exception as e:
@@ -84,6 +132,11 @@ class VisionProcessor:
         with self.lock:
             return self.latest_frame
 
+    def get_recent_frames(self):
+        """Окно последних исходных кадров [(номер, кадр), ...]"""
+        with self.lock:
+            return list(self.recent_frames)
+
     def get_detection_description(self):
         with self.lock:
             return self.latest_description
@@ -0,0 +1,353 @@
+# web_dashboard.py
+"""
+Лёгкая локальная веб-панель для режима без графического интерфейса.
+Камера отдаётся потоком MJPEG (multipart/x-mixed-replace), чат, статусы и
+частичные ответы - через WebSocket. PyQt5 не импортируется.
+
+Каждый кадр кодируется в JPEG не чаще max_fps и только пока есть зрители;
+все зрители получают одни и те же байты, поэтому новый зритель почти
+ничего не стоит. Медленный зритель просто пропускает кадры.
+
+Браузеры не применяют same-origin к WebSocket, поэтому подключение со
+страницы с чужим Origin отклоняется: иначе любой открытый сайт мог бы
+читать диалог и отправлять ввод.
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+
+import cv2
+from aiohttp import web, WSMsgType
+
+import event_bus as events
+
+# События шины, которые пересылаются в браузер
+FORWARDED_EVENTS = (events.UTTERANCE_RECOGNIZED, events.TURN_STARTED, events.TURN_FINISHED,
+                    events.TOKENS_STREAMED, events.MESSAGE_ADDED, events.DETECTIONS_UPDATED,
+                    events.STATUS_CHANGED)
+
+PAGE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>VISION Robot</title>
+<style>
+body { margin: 0; font-family: sans-serif; background: #0f1419; color: #fff; display: flex; gap: 20px; padding: 20px; }
+#left { flex: 1; } #right { flex: 2; display: flex; flex-direction: column; height: calc(100vh - 40px); }
+h2 { color: #00d4aa; margin: 0 0 10px; }
+img { width: 100%; max-width: 640px; border: 2px solid #00d4aa; border-radius: 15px; background: #1a1a1a; }
+#status div { font-size: 13px; padding: 2px 0; }
+#chat { flex: 1; overflow-y: auto; }
+.msg { border-radius: 15px; padding: 10px; margin: 5px 0; max-width: 600px; white-space: pre-wrap; }
+.user { background: rgba(0, 123, 255, 0.12); } .assistant { background: rgba(0, 212, 170, 0.12); }
+.time { font-size: 10px; color: rgba(255, 255, 255, 0.4); text-align: right; }
+#partial { color: rgba(255, 255, 255, 0.6); font-style: italic; min-height: 1.2em; }
+form { display: flex; gap: 10px; } input { flex: 1; padding: 10px; border-radius: 10px; border: 2px solid #00d4aa55; background: #282d37; color: #fff; }
+button { padding: 10px 20px; border: none; border-radius: 10px; background: #00d4aa88; color: #fff; font-weight: bold; }
+</style>
+</head>
+<body>
+<div id="left">
+<h2>Камера робота ВИЖН</h2>
+<img src="/video.mjpg" alt="Нет сигнала">
+<div id="scene"></div>
+<h2>Статус</h2>
+<div id="status"></div>
+</div>
+<div id="right">
+<h2>Диалог с роботом ВИЖН</h2>
+<div id="chat"></div>
+<div id="partial"></div>
+<form id="form"><input id="text" placeholder="Введите сообщение для ВИЖН..." autocomplete="off"><button>Отправить</button></form>
+</div>
+<script>
+const chat = document.getElementById("chat"), partial = document.getElementById("partial");
+const statusBox = document.getElementById("status"), scene = document.getElementById("scene");
+const status = {};
+let ws, lastSeq = 0;
+function addMessage(m) {
+  if (m.seq <= lastSeq) return;
+  lastSeq = m.seq;
+  const atBottom = chat.scrollTop + chat.clientHeight >= chat.scrollHeight - 5;
+  const div = document.createElement("div");
+  div.className = "msg " + (m.role === "user" ? "user" : "assistant");
+  div.textContent = (m.role === "user" ? "👤 Вы: " : "🤖 ВИЖН: ") + m.content;
+  const time = document.createElement("div");
+  time.className = "time"; time.textContent = (m.timestamp || "").slice(11, 19);
+  div.appendChild(time); chat.appendChild(div);
+  while (chat.childElementCount > 500) chat.removeChild(chat.firstChild);
+  if (atBottom) chat.scrollTop = chat.scrollHeight;
+}
+function renderStatus() {
+  statusBox.innerHTML = "";
+  for (const [k, v] of Object.entries(status)) {
+    const div = document.createElement("div"); div.textContent = k + ": " + v; statusBox.appendChild(div);
+  }
+}
+function connect() {
+  ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+  ws.onmessage = (e) => {
+    const ev = JSON.parse(e.data);
+    if (ev.type === "snapshot") { ev.messages.forEach(addMessage); Object.assign(status, ev.status); renderStatus(); }
+    else if (ev.type === "message_added") { addMessage(ev.message); partial.textContent = ""; }
+    else if (ev.type === "status_changed") { status[ev.component] = ev.state; renderStatus(); }
+    else if (ev.type === "utterance_recognized") { partial.textContent = "🎤 " + ev.text; }
+    else if (ev.type === "turn_started") { partial.textContent = "🎤 Обрабатываю..."; }
+    else if (ev.type === "tokens_streamed") { partial.textContent += ev.text; }
+    else if (ev.type === "turn_finished") { partial.textContent = ""; }
+    else if (ev.type === "detections_updated") { scene.textContent = ev.description; }
+  };
+  ws.onclose = () => setTimeout(connect, 1000);
+}
+document.getElementById("form").onsubmit = (e) => {
+  e.preventDefault();
+  const input = document.getElementById("text");
+  if (input.value.trim() && ws.readyState === 1) ws.send(JSON.stringify({type: "input", text: input.value.trim()}));
+  input.value = "";
+};
+connect();
+</script>
+</body>
+</html>
+"""
+
+
+def event_to_json(event):
+    """Событие шины в JSON для браузера (кадры и numpy-массивы не пересылаются)"""
+    payload = {"type": event.type}
+    for key, value in event.payload.items():
+        if key == "message":
+            value = value.to_dict()
+        elif key == "detections":
+            continue
+        payload[key] = value
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class WebDashboard:
+    """HTTP-панель: MJPEG-поток камеры и WebSocket с событиями"""
+
+    def __init__(self, bus, get_conversation_since=None, submit_user_input=None, host="127.0.0.1", port=8080,
+                 max_fps=10, jpeg_quality=70, max_width=640, history=50, client_queue_size=256,
+                 allowed_origins=()):
+        self.bus = bus
+        self.get_conversation_since = get_conversation_since
+        self.submit_user_input = submit_user_input
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.history = history
+        self.client_queue_size = client_queue_size
+        self.allowed_origins = self._own_origins() | {o.rstrip("/") for o in allowed_origins}
+
+        # Последний сырой кадр (кладёт поток камеры) и последний закодированный
+        self.frame_lock = threading.Lock()
+        self.raw_frame = None
+        self.raw_seq = 0
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.frame_ready = None
+        self.viewers = 0
+        self.clients = set()
+        self.stats = {"encoded": 0, "encode_time": 0.0, "frames_sent": 0, "events_sent": 0, "events_dropped": 0,
+                      "rejected": 0}
+
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+        self._unsubscribe = []
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def _own_origins(self):
+        """Origin страниц самой панели (локальный адрес доступен под обоими именами)"""
+        hosts = {self.host}
+        if self.host in ("127.0.0.1", "localhost", "0.0.0.0", "::", ""):
+            hosts |= {"127.0.0.1", "localhost"}
+        return {f"http://{host}:{self.port}" for host in hosts if host not in ("0.0.0.0", "::", "")}
+
+    def origin_allowed(self, request):
+        """Подключение со страницы панели или не из браузера (без заголовка Origin)"""
+        origin = request.headers.get("Origin")
+        return origin is None or origin in self.allowed_origins
+
+    def start(self):
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self._run, name="web-dashboard", daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=5)
+        self._unsubscribe.append(self.bus.subscribe(events.FRAME_UPDATED, self._on_frame))
+        for event_type in FORWARDED_EVENTS:
+            self._unsubscribe.append(self.bus.subscribe(event_type, self._on_event))
+        return self
+
+    def _make_app(self):
+        app = web.Application()
+        app.router.add_get("/", self._index)
+        app.router.add_get("/video.mjpg", self._video)
+        app.router.add_get("/ws", self._websocket)
+        app.router.add_get("/stats", self._stats)
+        return app
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self.frame_ready = asyncio.Condition()
+        self._runner = web.AppRunner(self._make_app())
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port).start())
+        encoder = self._loop.create_task(self._encode_loop())
+        logging.info(f"Web dashboard listening on {self.url}")
+        self._started.set()
+        self._loop.run_forever()
+        encoder.cancel()
+        self._loop.run_until_complete(self._runner.cleanup())
+
+    # --- Камера ---
+
+    def _on_frame(self, event):
+        # Поток камеры только сохраняет ссылку; кодирование - в цикле панели
+        with self.frame_lock:
+            self.raw_frame = event.payload["frame"]
+            self.raw_seq += 1
+
+    def encode(self, frame):
+        """Уменьшить до max_width и сжать в JPEG"""
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(height * self.max_width / width)),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        return buffer.tobytes() if ok else None
+
+    async def _encode_loop(self):
+        interval = 1.0 / self.max_fps
+        encoded_seq = 0
+        while True:
+            started = time.monotonic()
+            with self.frame_lock:
+                frame, seq = self.raw_frame, self.raw_seq
+            if self.viewers and frame is not None and seq != encoded_seq:
+                encoded_seq = seq
+                # imencode отпускает GIL - кодируем вне цикла событий
+                jpeg = await self._loop.run_in_executor(None, self.encode, frame)
+                self.stats["encode_time"] += time.monotonic() - started
+                if jpeg is not None:
+                    self.stats["encoded"] += 1
+                    async with self.frame_ready:
+                        self.jpeg = jpeg
+                        self.jpeg_seq += 1
+                        self.frame_ready.notify_all()
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def _video(self, request):
+        response = web.StreamResponse(headers={
+            "Content-Type": "multipart/x-mixed-replace; boundary=frame",
+            "Cache-Control": "no-cache, private",
+            "Pragma": "no-cache",
+        })
+        await response.prepare(request)
+        self.viewers += 1
+        sent_seq = 0
+        try:
+            while True:
+                async with self.frame_ready:
+                    await self.frame_ready.wait_for(lambda: self.jpeg_seq != sent_seq)
+                    jpeg, sent_seq = self.jpeg, self.jpeg_seq
+                # Пока кадр пишется медленному зрителю, промежуточные кадры пропускаются
+                await response.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                                     + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+                self.stats["frames_sent"] += 1
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.viewers -= 1
+        return response
+
+    # --- События и чат ---
+
+    def _on_event(self, event):
+        # Вызывается в потоке издателя; сериализуем один раз для всех клиентов
+        if not self.clients:
+            return
+        self._loop.call_soon_threadsafe(self._broadcast, event_to_json(event))
+
+    def _broadcast(self, data):
+        for queue in self.clients:
+            if queue.full():
+                # Отстающий клиент теряет самые старые события, а не тормозит остальных
+                queue.get_nowait()
+                self.stats["events_dropped"] += 1
+            queue.put_nowait(data)
+
+    def snapshot(self):
+        messages = []
+        if self.get_conversation_since is not None:
+            messages = [m.to_dict() for m in self.get_conversation_since(0)[-self.history:]]
+        return json.dumps({"type": "snapshot", "messages": messages, "status": self.bus.get_status()},
+                          ensure_ascii=False, default=str)
+
+    async def _websocket(self, request):
+        if not self.origin_allowed(request):
+            self.stats["rejected"] += 1
+            logging.warning(f"Web dashboard: rejected WebSocket from origin {request.headers.get('Origin')}")
+            raise web.HTTPForbidden(text="Origin not allowed")
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        queue = asyncio.Queue(maxsize=self.client_queue_size)
+        # Сначала подписка, потом снимок - дубли отсекаются в браузере по seq
+        self.clients.add(queue)
+        sender = asyncio.ensure_future(self._send_events(ws, queue))
+        try:
+            await ws.send_str(self.snapshot())
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except ValueError:
+                    continue
+                text = str(data.get("text", "")).strip()
+                if data.get("type") == "input" and text and self.submit_user_input is not None:
+                    self.submit_user_input(text, source="web")
+        finally:
+            self.clients.discard(queue)
+            sender.cancel()
+        return ws
+
+    async def _send_events(self, ws, queue):
+        try:
+            while True:
+                await ws.send_str(await queue.get())
+                self.stats["events_sent"] += 1
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+
+    async def _stats(self, request):
+        return web.json_response(self.get_stats())
+
+    async def _index(self, request):
+        return web.Response(text=PAGE, content_type="text/html")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["viewers"] = self.viewers
+        stats["clients"] = len(self.clients)
+        stats["avg_encode_ms"] = stats["encode_time"] / stats["encoded"] * 1000 if stats["encoded"] else 0.0
+        return stats
+
+    def stop(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)